@@ -1,6 +1,15 @@
 from django.apps import AppConfig
+from django.db.models.signals import post_save, pre_save
 
 
 class ApiConfig(AppConfig):
     default_auto_field = 'django.db.models.BigAutoField'
     name = 'api'
+
+    def ready(self):
+        from users.models import User
+
+        from .authentication import remember_auth_state, stamp_auth_state
+
+        pre_save.connect(remember_auth_state, sender=User)
+        post_save.connect(stamp_auth_state, sender=User)
@@ -0,0 +1,225 @@
+"""Аутентификация по JWT без запроса пользователя из базы на каждый вызов.
+
+В токен, выдаваемый `get_jwt_token`, кладутся `username`, `role`
+и `is_superuser`. По ним собирается облегчённый объект `User`, у которого
+остальные поля отложены и подгружаются из базы только при обращении.
+Роль и активность сверяются с кэшем состояния пользователя: если роль
+сменилась после выдачи токена, действует текущая. Когда save() меняет
+роль, права суперпользователя или активность — в API, админке или любом
+другом коде, — кэш сбрасывается, а в базе отмечается время изменения
+(`User.auth_changed_at`). Кэш может быть своим у каждого
+процесса, поэтому процессы раз в AUTH_STATE_REFRESH_SECONDS дочитывают
+эти отметки и сбрасывают состояние изменившихся пользователей.
+
+Уже проверенные токены хранятся в ограниченном LRU-кэше процесса, чтобы не
+разбирать и не проверять подпись одного и того же токена на каждый запрос.
+Отзыв токена (`users.revocation`) проверяется после кэша по снимку в памяти.
+"""
+import hashlib
+import threading
+import time
+from collections import OrderedDict
+
+from django.conf import settings
+from django.core.cache import cache
+from django.db import DEFAULT_DB_ALIAS
+from django.utils import timezone
+from rest_framework_simplejwt.authentication import JWTAuthentication
+from rest_framework_simplejwt.exceptions import AuthenticationFailed
+from rest_framework_simplejwt.settings import api_settings
+from rest_framework_simplejwt.tokens import AccessToken
+
+from users.models import User
+from users.refresh import PeriodicRefresh
+from users.revocation import is_revoked
+
+USER_CLAIMS = ('username', 'role', 'is_superuser')
+STATE_FIELDS = ('role', 'is_superuser', 'is_active')
+STATE_CACHE_KEY = 'auth-state:{}'
+STATE_CACHE_TIMEOUT = 300
+
+
+def token_for_user(user):
+    """Выдаёт токен доступа с данными, нужными для проверки прав."""
+    token = AccessToken.for_user(user)
+    for claim in USER_CLAIMS:
+        token[claim] = getattr(user, claim)
+    return token
+
+
+class AuthStateChanges(PeriodicRefresh):
+    """Сбрасывает кэш состояния пользователей, изменённых в других
+    процессах."""
+
+    def load(self, since, started):
+        if since is None:
+            return
+        changed = User.objects.filter(
+            auth_changed_at__gte=since
+        ).values_list('pk', flat=True)
+        cache.delete_many([STATE_CACHE_KEY.format(pk) for pk in changed])
+
+
+auth_state_changes = AuthStateChanges(
+    getattr(settings, 'AUTH_STATE_REFRESH_SECONDS', 5)
+)
+
+
+def get_auth_state(user_id):
+    """Текущие роль и активность пользователя: из кэша или одним запросом."""
+    auth_state_changes.refresh()
+    key = STATE_CACHE_KEY.format(user_id)
+    state = cache.get(key)
+    if state is None:
+        state = User.objects.filter(pk=user_id).values_list(
+            *STATE_FIELDS
+        ).first()
+        if state is None:
+            raise AuthenticationFailed(
+                'Пользователь не найден.', code='user_not_found'
+            )
+        cache.set(key, tuple(state), STATE_CACHE_TIMEOUT)
+    return dict(zip(STATE_FIELDS, state))
+
+
+def invalidate_auth_state(user_id):
+    """Сбрасывает кэш состояния после изменения роли или блокировки
+    и отмечает изменение для остальных процессов."""
+    User.objects.filter(pk=user_id).update(auth_changed_at=timezone.now())
+    cache.delete(STATE_CACHE_KEY.format(user_id))
+
+
+def remember_auth_state(sender, instance, raw=False, update_fields=None,
+                        **kwargs):
+    """pre_save: отмечает пользователя, у которого сохранение меняет
+    роль, права суперпользователя или активность."""
+    instance._auth_state_changed = False
+    if raw or instance._state.adding or (
+        update_fields is not None and not set(update_fields) & set(
+            STATE_FIELDS
+        )
+    ):
+        return
+    stored = User.objects.filter(pk=instance.pk).values_list(
+        *STATE_FIELDS
+    ).first()
+    instance._auth_state_changed = stored is not None and tuple(stored) != (
+        tuple(getattr(instance, field) for field in STATE_FIELDS)
+    )
+
+
+def stamp_auth_state(sender, instance, **kwargs):
+    """post_save: сбрасывает состояние пользователя, отмеченного
+    в remember_auth_state."""
+    if getattr(instance, '_auth_state_changed', False):
+        invalidate_auth_state(instance.pk)
+
+
+def load_full_user(user):
+    """Одним запросом подгружает все отложенные поля пользователя."""
+    deferred = user.get_deferred_fields()
+    if deferred:
+        user.refresh_from_db(fields=deferred)
+    return user
+
+
+class VerifiedTokenCache:
+    """LRU проверенных токенов, ключ — SHA-256 от строки токена.
+
+    Запись живёт не дольше срока действия токена (`exp`). Отзыв токена
+    и блокировка пользователя проверяются после кэша на каждый запрос.
+    """
+
+    def __init__(self, maxsize):
+        self.maxsize = maxsize
+        self.hits = 0
+        self.misses = 0
+        self._entries = OrderedDict()
+        self._lock = threading.Lock()
+
+    @staticmethod
+    def key(raw_token):
+        if isinstance(raw_token, str):
+            raw_token = raw_token.encode()
+        return hashlib.sha256(raw_token).digest()
+
+    def get(self, raw_token):
+        key = self.key(raw_token)
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is not None and entry[1] > time.time():
+                self._entries.move_to_end(key)
+                self.hits += 1
+                return entry[0]
+            if entry is not None:
+                del self._entries[key]
+            self.misses += 1
+            return None
+
+    def set(self, raw_token, token):
+        if self.maxsize <= 0:
+            return
+        key = self.key(raw_token)
+        with self._lock:
+            self._entries[key] = (token, token['exp'])
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.maxsize:
+                self._entries.popitem(last=False)
+
+    def discard(self, raw_token):
+        with self._lock:
+            self._entries.pop(self.key(raw_token), None)
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+            self.hits = self.misses = 0
+
+    def stats(self):
+        return {
+            'hits': self.hits,
+            'misses': self.misses,
+            'size': len(self._entries),
+            'maxsize': self.maxsize,
+        }
+
+
+verified_tokens = VerifiedTokenCache(
+    getattr(settings, 'VERIFIED_TOKEN_CACHE_SIZE', 10000)
+)
+
+
+class StatelessJWTAuthentication(JWTAuthentication):
+    """Собирает пользователя из токена, не обращаясь к таблице users."""
+
+    def get_validated_token(self, raw_token):
+        token = verified_tokens.get(raw_token)
+        if token is None:
+            token = super().get_validated_token(raw_token)
+            verified_tokens.set(raw_token, token)
+        jti = token.get(api_settings.JTI_CLAIM)
+        if jti is not None and is_revoked(jti):
+            raise AuthenticationFailed('Токен отозван.', code='token_revoked')
+        return token
+
+    def get_user(self, validated_token):
+        if not all(claim in validated_token for claim in USER_CLAIMS):
+            return super().get_user(validated_token)
+        user_id = validated_token[api_settings.USER_ID_CLAIM]
+        state = get_auth_state(user_id)
+        if not state['is_active']:
+            raise AuthenticationFailed(
+                'Пользователь заблокирован.', code='user_inactive'
+            )
+        known = {
+            api_settings.USER_ID_FIELD: user_id,
+            'username': validated_token['username'],
+            **state,
+        }
+        fields = [
+            field.attname for field in User._meta.concrete_fields
+            if field.attname in known
+        ]
+        return User.from_db(
+            DEFAULT_DB_ALIAS, fields, [known[name] for name in fields]
+        )
@@ -0,0 +1,93 @@
+import base64
+import datetime as dt
+
+from django.db.models import Q
+from rest_framework.exceptions import ValidationError
+
+from reviews.models import Comment, Review, Tombstone
+from reviews.sharding import load_related, shard_for_title
+
+EPOCH = dt.datetime(1970, 1, 1, tzinfo=dt.timezone.utc)
+MICROSECOND = dt.timedelta(microseconds=1)
+
+# Порядок источников в ленте при одинаковом времени изменения.
+REVIEW, COMMENT, TOMBSTONE = range(3)
+
+
+def encode_watermark(position):
+    """Упаковывает позицию в ленте — время, источник и id последнего
+    выданного события — в непрозрачную строку для клиента."""
+    if position is None:
+        return None
+    moment, source, pk = position
+    micros = (moment - EPOCH) // MICROSECOND
+    return base64.urlsafe_b64encode(
+        f'{micros}:{source}:{pk}'.encode()
+    ).decode()
+
+
+def decode_watermark(value):
+    """Восстанавливает позицию из строки, выданной клиенту ранее.
+
+    Прежние отметки содержат только время: они означают, что выданы все
+    события до этого момента включительно.
+    """
+    try:
+        parts = base64.urlsafe_b64decode(value.encode()).decode().split(':')
+        if len(parts) == 1:
+            parts += [TOMBSTONE + 1, 0]
+        micros, source, pk = map(int, parts)
+        return EPOCH + micros * MICROSECOND, source, pk
+    except (ValueError, UnicodeError, OverflowError, OSError):
+        raise ValidationError({'since': 'Некорректная отметка синхронизации.'})
+
+
+def after(queryset, field, source, since):
+    """События источника, идущие в ленте после позиции since."""
+    if since is None:
+        return queryset
+    moment, last_source, last_pk = since
+    later = Q(**{f'{field}__gt': moment})
+    if source > last_source:
+        later |= Q(**{field: moment})
+    elif source == last_source:
+        later |= Q(**{field: moment, 'pk__gt': last_pk})
+    return queryset.filter(later)
+
+
+def collect_changes(title, since, limit):
+    """Собирает отзывы, комментарии и удаления по произведению после since.
+
+    События упорядочены по времени изменения, источнику и id. Каждый
+    источник читается по индексу (произведение, время изменения) не более
+    чем на limit + 1 записей; позиция последнего выданного события
+    становится отметкой, поэтому события с одинаковым временем не теряются
+    на границе страниц.
+    """
+    sources = (
+        (REVIEW, 'updated_at', load_related(
+            title.reviews.filter(is_hidden=False), 'author'
+        )),
+        (COMMENT, 'updated_at', load_related(
+            Comment.objects.using(shard_for_title(title.pk)).filter(
+                title=title, review__is_hidden=False, is_hidden=False
+            ), 'author'
+        )),
+        (TOMBSTONE, 'deleted_at', title.tombstones.all()),
+    )
+    events = sorted(
+        ((getattr(obj, field), source, obj.pk), obj)
+        for source, field, queryset in sources
+        for obj in after(queryset, field, source, since).order_by(
+            field, 'pk'
+        )[:limit + 1]
+    )
+    has_more = len(events) > limit
+    events = events[:limit]
+    return {
+        'reviews': [obj for _, obj in events if isinstance(obj, Review)],
+        'comments': [obj for _, obj in events if isinstance(obj, Comment)],
+        'deleted': [obj for _, obj in events if isinstance(obj, Tombstone)],
+        'watermark': events[-1][0] if events else since,
+        'has_more': has_more,
+    }
@@ -1,5 +1,6 @@
 from django_filters.rest_framework import FilterSet
 from django_filters import NumberFilter, CharFilter
+from rest_framework.filters import BaseFilterBackend
 
 from reviews.models import Title
 
@@ -14,3 +15,40 @@ class TitleFilter(FilterSet):
     class Meta:
         model = Title
         fields = ('name', 'year', 'genre', 'category')
+
+
+def prefix_upper_bound(prefix):
+    """Наименьшая строка, которая больше всех строк с этим префиксом."""
+    while prefix and prefix[-1] == chr(0x10FFFF):
+        prefix = prefix[:-1]
+    if not prefix:
+        return None
+    return prefix[:-1] + chr(ord(prefix[-1]) + 1)
+
+
+class PrefixSearchFilter(BaseFilterBackend):
+    """ Поиск по началу значения через диапазон по индексу.
+
+    Параметры запроса и поля берутся из `prefix_search_fields`
+    представления. `?username_prefix=ab` превращается в
+    `username >= 'ab' AND username < 'ac'`: такое условие читается по
+    уникальному индексу, а результат уже упорядочен по нему, в отличие от
+    `icontains`, который просматривает всю таблицу. Сравнение учитывает
+    регистр.
+    """
+
+    def filter_queryset(self, request, queryset, view):
+        fields = getattr(view, 'prefix_search_fields', {})
+        ordering = None
+        for param, field in fields.items():
+            prefix = request.query_params.get(param)
+            if not prefix:
+                continue
+            queryset = queryset.filter(**{f'{field}__gte': prefix})
+            upper = prefix_upper_bound(prefix)
+            if upper is not None:
+                queryset = queryset.filter(**{f'{field}__lt': upper})
+            ordering = ordering or field
+        if ordering:
+            queryset = queryset.order_by(ordering)
+        return queryset
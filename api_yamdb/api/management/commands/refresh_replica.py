@@ -0,0 +1,30 @@
+import time
+
+from django.conf import settings
+from django.core.management.base import BaseCommand
+
+from api.replica import refresh_replica
+
+
+class Command(BaseCommand):
+    help = 'Снимает копию основной базы в реплику для чтения.'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--interval', type=float, default=0,
+            help='Повторять каждые N секунд вместо однократного запуска. '
+                 'Должно быть заметно меньше REPLICA_MAX_AGE.'
+        )
+
+    def handle(self, *args, **options):
+        if options['interval'] >= settings.REPLICA_MAX_AGE:
+            self.stderr.write(
+                'Интервал не меньше REPLICA_MAX_AGE: реплика будет '
+                'устаревать, и чтение уйдёт в основную базу.'
+            )
+        while True:
+            elapsed = refresh_replica()
+            self.stdout.write(f'Реплика обновлена за {elapsed:.2f} с')
+            if not options['interval']:
+                return
+            time.sleep(max(options['interval'] - elapsed, 0))
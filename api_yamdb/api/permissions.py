@@ -7,6 +7,15 @@ class IsAdmin(permissions.BasePermission):
         return request.user.is_authenticated and request.user.is_admin
 
 
+class IsAdminOrModerator(permissions.BasePermission):
+    """Доступ только для администратора или модератора."""
+
+    def has_permission(self, request, view):
+        return request.user.is_authenticated and (
+            request.user.is_admin or request.user.is_moderator
+        )
+
+
 class IsAdminOrReadOnly(permissions.BasePermission):
     """Проверка, что админ или суперюзер и безопасный метод"""
 
@@ -0,0 +1,167 @@
+"""Чтение из реплики SQLite.
+
+Реплика — копия основной базы, которую команда `refresh_replica` снимает
+через online backup API SQLite. Безопасные запросы к представлениям
+с `ReplicaReadMixin` читают из реплики, если её снимок не старше
+REPLICA_MAX_AGE секунд. Клиент, который что-то записал, читает из
+основной базы, пока не будет снята реплика новее его последней записи.
+Время записи возвращается клиенту в cookie и заголовке ответа
+(LAST_WRITE_COOKIE, LAST_WRITE_HEADER) и приходит обратно с его
+следующими запросами, поэтому его видит любой процесс сервера.
+"""
+import contextvars
+import os
+import sqlite3
+import time
+
+from django.conf import settings
+from django.db import DEFAULT_DB_ALIAS, connections
+from rest_framework.permissions import SAFE_METHODS
+
+from reviews.sharding import is_sharded
+
+REPLICA = 'replica'
+LAST_WRITE_COOKIE = 'replica_last_write'
+LAST_WRITE_HEADER = 'X-Replica-Last-Write'
+
+# Состояние текущего запроса; вне запросов (команды, оболочка) — None,
+# и все запросы к базе идут в основную.
+_request_state = contextvars.ContextVar('replica_request_state',
+                                        default=None)
+
+
+class RequestState:
+
+    def __init__(self):
+        self.use_replica = False
+        self.wrote = False
+
+
+def snapshot_time():
+    """Время начала снятия текущей реплики или None, если её нет."""
+    if REPLICA not in settings.DATABASES:
+        return None
+    try:
+        return os.path.getmtime(connections[REPLICA].settings_dict['NAME'])
+    except OSError:
+        return None
+
+
+def remember_write(response):
+    """Возвращает клиенту время его записи."""
+    written = f'{time.time():.6f}'
+    response.set_cookie(LAST_WRITE_COOKIE, written,
+                        max_age=settings.REPLICA_MAX_AGE, httponly=True,
+                        samesite='Lax')
+    response[LAST_WRITE_HEADER] = written
+
+
+def last_write(request):
+    """Время последней записи клиента из cookie или заголовка."""
+    value = request.COOKIES.get(LAST_WRITE_COOKIE) or request.META.get(
+        'HTTP_' + LAST_WRITE_HEADER.upper().replace('-', '_')
+    )
+    try:
+        return float(value) if value else None
+    except ValueError:
+        return None
+
+
+def can_read_replica(request):
+    """Достаточно ли свежа реплика для чтения от имени клиента."""
+    snapshot = snapshot_time()
+    if snapshot is None or time.time() - snapshot > settings.REPLICA_MAX_AGE:
+        return False
+    written = last_write(request)
+    return written is None or written < snapshot
+
+
+def refresh_replica(path=None):
+    """Снимает копию основной базы в файл реплики.
+
+    Копия пишется во временный файл и подменяет реплику целиком, так что
+    открытые соединения дочитывают прежний снимок. Время изменения файла —
+    момент начала копирования. Возвращает время работы в секундах.
+    """
+    path = str(path or connections[REPLICA].settings_dict['NAME'])
+    temporary = f'{path}.tmp'
+    started = time.time()
+    source = connections[DEFAULT_DB_ALIAS]
+    source.ensure_connection()
+    target = sqlite3.connect(temporary)
+    try:
+        # Копируем за один шаг: в режиме WAL это одна читающая транзакция,
+        # которая не мешает писателям, а при копировании по частям каждая
+        # запись в основную базу начинала бы копирование заново.
+        source.connection.backup(target)
+        target.execute('PRAGMA journal_mode = DELETE')
+    finally:
+        target.close()
+    os.utime(temporary, (started, started))
+    os.replace(temporary, path)
+    return time.time() - started
+
+
+class ReplicaMiddleware:
+    """Заводит состояние запроса для ReplicaRouter и после запроса
+    с записью возвращает клиенту время записи."""
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+
+    def __call__(self, request):
+        state = RequestState()
+        token = _request_state.set(state)
+        try:
+            response = self.get_response(request)
+        finally:
+            _request_state.reset(token)
+        if state.wrote:
+            remember_write(response)
+        return response
+
+
+class ReplicaReadMixin:
+    """Безопасные запросы к представлению читают из реплики.
+
+    Флаг ставится после аутентификации и проверки прав, поэтому данные
+    пользователя и токена по-прежнему читаются из основной базы.
+    """
+
+    def initial(self, request, *args, **kwargs):
+        super().initial(request, *args, **kwargs)
+        state = _request_state.get()
+        if state is not None and request.method in SAFE_METHODS:
+            state.use_replica = can_read_replica(request)
+
+
+class ReplicaRouter:
+    """Направляет чтение в реплику, если запрос это разрешил
+    и в нём ещё ничего не записано."""
+
+    def db_for_read(self, model, **hints):
+        state = _request_state.get()
+        if state is None or not state.use_replica or state.wrote:
+            return None
+        # Шарды отзывов не копируются в реплику.
+        if is_sharded(model):
+            return None
+        return REPLICA
+
+    def db_for_write(self, model, **hints):
+        state = _request_state.get()
+        if state is not None:
+            state.wrote = True
+        return None
+
+    def allow_relation(self, obj1, obj2, **hints):
+        databases = {DEFAULT_DB_ALIAS, REPLICA}
+        if {obj1._state.db, obj2._state.db} <= databases:
+            return True
+        return None
+
+    def allow_migrate(self, db, app_label, **hints):
+        # Схема попадает в реплику вместе с копией основной базы.
+        if db == REPLICA:
+            return False
+        return None
@@ -1,9 +1,15 @@
 from rest_framework import serializers
 from django.contrib.auth.validators import UnicodeUsernameValidator
+from django.db.models import Q
+from rest_framework_simplejwt.exceptions import TokenError
+from rest_framework_simplejwt.tokens import AccessToken
 import datetime as dt
 
 from users.models import User
-from reviews.models import Title, Category, Genre, Comment, Review
+from reviews.models import (Title, Category, Genre, Comment, Review,
+                            Tombstone)
+from reviews.sharding import shard_for_title
+from .changes import encode_watermark
 
 
 class UserSerializer(serializers.ModelSerializer):
@@ -25,6 +31,16 @@ class TokenSerializer(serializers.Serializer):
     confirmation_code = serializers.CharField(max_length=512)
 
 
+class RevokeTokenSerializer(serializers.Serializer):
+    token = serializers.CharField(required=False)
+
+    def validate_token(self, value):
+        try:
+            return AccessToken(value)
+        except TokenError as error:
+            raise serializers.ValidationError(str(error))
+
+
 class UserSignUpSerializer(serializers.Serializer):
 
     username = serializers.CharField(
@@ -40,13 +56,23 @@ class UserSignUpSerializer(serializers.Serializer):
 
         if username.lower() == 'me':
             raise serializers.ValidationError('Недопустимое имя пользователя.')
-        if User.objects.filter(username=username, email=email).exists():
-            return data
-        if User.objects.filter(username=username).exists():
-            raise serializers.ValidationError(
-                'Введенное вами имя пользователя уже занято.'
-            )
-        if User.objects.filter(email=email).exists():
+        # Один запрос вместо отдельных проверок имени и почты: совпасть
+        # может не больше двух пользователей. Удалённым (скрытым)
+        # пользователям код подтверждения не высылается.
+        matches = User.objects.filter(
+            Q(username=username) | Q(email=email), is_hidden=False
+        )[:2]
+        data['user'] = None
+        for user in matches:
+            if user.username == username and user.email == email:
+                data['user'] = user
+                return data
+        for user in matches:
+            if user.username == username:
+                raise serializers.ValidationError(
+                    'Введенное вами имя пользователя уже занято.'
+                )
+        if matches:
             raise serializers.ValidationError(
                 'Введенный вами адрес электронной почты уже занят.'
             )
@@ -76,18 +102,29 @@ class TitleSerializer(serializers.ModelSerializer):
     class Meta:
         model = Title
         fields = (
-            'id', 'name', 'year', 'description', 'genre', 'category', 'rating'
+            'id', 'name', 'year', 'description', 'genre', 'category',
+            'rating', 'review_count'
         )
 
+    def to_representation(self, instance):
+        data = super().to_representation(instance)
+        if instance.category is not None and instance.category.is_hidden:
+            data['category'] = None
+        return data
+
 
 class TitleCreateUpdateSerializer(serializers.ModelSerializer):
     """ Сериализатор произведений, методы POST и PATCH. """
     description = serializers.CharField(required=False)
-    category = serializers.SlugRelatedField(queryset=Category.objects.all(),
-                                            slug_field='slug')
-    genre = serializers.SlugRelatedField(queryset=Genre.objects.all(),
-                                         slug_field='slug',
-                                         many=True)
+    category = serializers.SlugRelatedField(
+        queryset=Category.objects.filter(is_hidden=False),
+        slug_field='slug'
+    )
+    genre = serializers.SlugRelatedField(
+        queryset=Genre.objects.filter(is_hidden=False),
+        slug_field='slug',
+        many=True
+    )
 
     class Meta:
         model = Title
@@ -111,8 +148,11 @@ class ReviewSerializer(serializers.ModelSerializer):
 
     class Meta:
         model = Review
-        fields = ('id', 'title', 'text', 'author', 'score', 'pub_date')
-        read_only_fields = ('author', 'title', 'pub_date')
+        fields = (
+            'id', 'title', 'text', 'author', 'score', 'pub_date',
+            'comment_count'
+        )
+        read_only_fields = ('author', 'title', 'pub_date', 'comment_count')
 
     def validate(self, data):
         request = self.context['request']
@@ -120,7 +160,8 @@ class ReviewSerializer(serializers.ModelSerializer):
             return data
         author = request.user
         title_id = self.context['view'].kwargs.get('title_id')
-        if Review.objects.filter(title_id=title_id, author=author).exists():
+        reviews = Review.objects.using(shard_for_title(title_id))
+        if reviews.filter(title_id=title_id, author=author).exists():
             raise serializers.ValidationError(
                 'У Вас уже есть отзыв на это произведение.'
             )
@@ -134,6 +175,23 @@ class ReviewSerializer(serializers.ModelSerializer):
         return data
 
 
+class EmbeddedCommentSerializer(serializers.ModelSerializer):
+    """Комментарий, встроенный в ответ со списком отзывов."""
+    author = serializers.CharField(source='author_username', read_only=True)
+
+    class Meta:
+        model = Comment
+        fields = ('id', 'text', 'author', 'pub_date')
+
+
+class ReviewWithCommentsSerializer(ReviewSerializer):
+    """Отзыв вместе с последними комментариями к нему."""
+    latest_comments = EmbeddedCommentSerializer(many=True, read_only=True)
+
+    class Meta(ReviewSerializer.Meta):
+        fields = ReviewSerializer.Meta.fields + ('latest_comments',)
+
+
 class CommentSerializer(serializers.ModelSerializer):
     author = serializers.SlugRelatedField(
         read_only=True, slug_field='username'
@@ -146,3 +204,71 @@ class CommentSerializer(serializers.ModelSerializer):
         model = Comment
         fields = ('id', 'review', 'text', 'author', 'pub_date')
         read_only_fields = ('author', 'review', 'pub_date')
+
+
+class BulkModerationSerializer(serializers.Serializer):
+    """Запрос на массовое удаление или скрытие отзывов и комментариев."""
+    action = serializers.ChoiceField(choices=('delete', 'hide'))
+    reviews = serializers.ListField(
+        child=serializers.IntegerField(min_value=1),
+        required=False,
+        max_length=10000
+    )
+    comments = serializers.ListField(
+        child=serializers.IntegerField(min_value=1),
+        required=False,
+        max_length=10000
+    )
+    author = serializers.SlugRelatedField(
+        queryset=User.objects.all(), slug_field='username', required=False
+    )
+    since = serializers.DateTimeField(required=False)
+    until = serializers.DateTimeField(required=False)
+
+    def validate(self, data):
+        if not any(data.get(key) for key in ('reviews', 'comments', 'author')):
+            raise serializers.ValidationError(
+                'Укажите идентификаторы отзывов и комментариев или автора.'
+            )
+        if ('since' in data or 'until' in data) and 'author' not in data:
+            raise serializers.ValidationError(
+                'Интервал времени задаётся только вместе с автором.'
+            )
+        return data
+
+
+class ReviewChangeSerializer(ReviewSerializer):
+    """Отзыв в ленте изменений."""
+
+    class Meta(ReviewSerializer.Meta):
+        fields = ReviewSerializer.Meta.fields + ('updated_at',)
+
+
+class CommentChangeSerializer(CommentSerializer):
+    """Комментарий в ленте изменений."""
+    review = serializers.PrimaryKeyRelatedField(read_only=True)
+
+    class Meta(CommentSerializer.Meta):
+        fields = CommentSerializer.Meta.fields + ('updated_at',)
+
+
+class TombstoneSerializer(serializers.ModelSerializer):
+    """Удалённый отзыв или комментарий в ленте изменений."""
+    type = serializers.CharField(source='kind')
+    id = serializers.IntegerField(source='object_id')
+
+    class Meta:
+        model = Tombstone
+        fields = ('type', 'id', 'deleted_at')
+
+
+class ChangesSerializer(serializers.Serializer):
+    """Порция ленты изменений по произведению."""
+    reviews = ReviewChangeSerializer(many=True)
+    comments = CommentChangeSerializer(many=True)
+    deleted = TombstoneSerializer(many=True)
+    watermark = serializers.SerializerMethodField()
+    has_more = serializers.BooleanField()
+
+    def get_watermark(self, obj):
+        return encode_watermark(obj['watermark'])
@@ -0,0 +1,199 @@
+"""Ограничение частоты запросов по скользящему окну.
+
+Лимиты задаются в `REST_FRAMEWORK['DEFAULT_THROTTLE_RATES']` по областям
+(`signup`, `token`, `reviews`, `comments`), хранилище счётчиков выбирается
+настройкой `THROTTLE_LIMITER`:
+
+* `InMemoryLimiter` — счётчики в памяти процесса, без сетевых вызовов;
+* `CacheLimiter` — счётчики в кэше Django, общие для всех процессов.
+
+Оба считают запросы по двум соседним фиксированным окнам и взвешивают
+предыдущее окно по доле оставшегося времени, поэтому проверка стоит O(1)
+по времени и памяти на ключ. Время до снятия ограничения DRF отдаёт
+в заголовке `Retry-After`.
+"""
+import math
+import threading
+import time
+from collections import OrderedDict
+
+from django.conf import settings
+from django.core.cache import cache
+from django.utils.module_loading import import_string
+from rest_framework.settings import api_settings
+from rest_framework.throttling import BaseThrottle
+
+PERIODS = {'s': 1, 'm': 60, 'h': 3600, 'd': 86400}
+
+
+def parse_rate(rate):
+    """'20/min' -> (20, 60)."""
+    count, period = rate.split('/')
+    return int(count), PERIODS[period[0]]
+
+
+def estimate(previous, current, fraction):
+    """Число запросов в скользящем окне, заканчивающемся сейчас."""
+    return previous * (1 - fraction) + current
+
+
+def retry_after(previous, current, limit, fraction, period):
+    """Через сколько секунд в скользящем окне освободится место."""
+    if current + 1 > limit:
+        # Ждём следующего окна, где текущее станет предыдущим.
+        needed = 1 - (limit - 1) / current if current else 0
+        wait = (1 - fraction) + max(needed, 0)
+    else:
+        needed = 1 - (limit - current - 1) / previous
+        wait = needed - fraction
+    return max(1, math.ceil(round(wait * period, 6)))
+
+
+class InMemoryLimiter:
+    """Счётчики в памяти процесса.
+
+    Ключи хранятся в порядке последнего обращения: при переполнении
+    сначала убираются истёкшие, затем давно не обращавшиеся клиенты.
+    """
+
+    max_keys = 100000
+
+    def __init__(self):
+        self._windows = OrderedDict()
+        self._next_expiry = -float('inf')
+        self._lock = threading.Lock()
+
+    def hit(self, key, limit, period, now=None):
+        now = time.time() if now is None else now
+        window, fraction = divmod(now / period, 1)
+        expires = (window + 2) * period
+        with self._lock:
+            started, previous, current, _ = self._windows.get(
+                key, (window, 0, 0, expires)
+            )
+            if started != window:
+                previous = current if started == window - 1 else 0
+                current = 0
+            allowed = estimate(previous, current, fraction) + 1 <= limit
+            if allowed:
+                current += 1
+            if key not in self._windows and len(self._windows) >= (
+                self.max_keys
+            ):
+                self._prune(now)
+            self._windows[key] = (window, previous, current, expires)
+            self._windows.move_to_end(key)
+            self._next_expiry = min(self._next_expiry, expires)
+        if allowed:
+            return True, None
+        return False, retry_after(previous, current, limit, fraction, period)
+
+    def _prune(self, now):
+        """Освобождает место для нового ключа: убирает ключи, окна которых
+        уже не влияют на лимит, а если таких нет — самый давний."""
+        # До самого раннего срока среди оставшихся ключей повторный
+        # просмотр ничего не найдёт.
+        if now >= self._next_expiry:
+            stale = [
+                key for key, (_, _, _, expires) in self._windows.items()
+                if expires <= now
+            ]
+            for key in stale:
+                del self._windows[key]
+            self._next_expiry = min(
+                (expires for _, _, _, expires in self._windows.values()),
+                default=float('inf'),
+            )
+        while len(self._windows) >= self.max_keys:
+            self._windows.popitem(last=False)
+
+    def clear(self):
+        with self._lock:
+            self._windows.clear()
+            self._next_expiry = -float('inf')
+
+
+class CacheLimiter:
+    """Счётчики в кэше Django: общие для всех процессов и серверов."""
+
+    prefix = 'throttle'
+
+    def hit(self, key, limit, period, now=None):
+        now = time.time() if now is None else now
+        window, fraction = divmod(now / period, 1)
+        current_key = f'{self.prefix}:{key}:{int(window)}'
+        previous_key = f'{self.prefix}:{key}:{int(window) - 1}'
+        counts = cache.get_many((current_key, previous_key))
+        previous = counts.get(previous_key, 0)
+        current = counts.get(current_key, 0)
+        if estimate(previous, current, fraction) + 1 > limit:
+            return False, retry_after(
+                previous, current, limit, fraction, period
+            )
+        if not cache.add(current_key, 1, timeout=period * 2):
+            cache.incr(current_key)
+        return True, None
+
+
+_limiter = None
+
+
+def get_limiter():
+    global _limiter
+    if _limiter is None:
+        _limiter = import_string(settings.THROTTLE_LIMITER)()
+    return _limiter
+
+
+class ScopedThrottle(BaseThrottle):
+    """Лимит по области представления (`throttle_scope`) и клиенту.
+
+    Представление может ограничить проверку отдельными методами через
+    `throttle_methods`, например только POST.
+    """
+    scope = None
+
+    def get_client_key(self, request):
+        raise NotImplementedError
+
+    def allow_request(self, request, view):
+        self.wait_seconds = None
+        scope = getattr(view, 'throttle_scope', None) or self.scope
+        methods = getattr(view, 'throttle_methods', None)
+        if scope is None or (methods and request.method not in methods):
+            return True
+        rate = api_settings.DEFAULT_THROTTLE_RATES.get(scope)
+        if rate is None:
+            return True
+        limit, period = parse_rate(rate)
+        allowed, self.wait_seconds = get_limiter().hit(
+            f'{scope}:{self.get_client_key(request)}', limit, period
+        )
+        return allowed
+
+    def wait(self):
+        return self.wait_seconds
+
+
+class ScopedIPThrottle(ScopedThrottle):
+    """Лимит на IP-адрес клиента."""
+
+    def get_client_key(self, request):
+        return f'ip:{self.get_ident(request)}'
+
+
+class ScopedUserThrottle(ScopedThrottle):
+    """Лимит на пользователя, для анонимов — на IP-адрес."""
+
+    def get_client_key(self, request):
+        if request.user and request.user.is_authenticated:
+            return f'user:{request.user.pk}'
+        return f'ip:{self.get_ident(request)}'
+
+
+class SignupThrottle(ScopedIPThrottle):
+    scope = 'signup'
+
+
+class TokenThrottle(ScopedIPThrottle):
+    scope = 'token'
@@ -1,8 +1,8 @@
 from django.urls import include, path
 from rest_framework.routers import DefaultRouter
 
-from .views import (UsersViewSet, get_jwt_token,
-                    register)
+from .views import (UsersViewSet, get_jwt_token, revoke_token,
+                    register, moderate, import_users)
 
 from .views import (CategoryViewSet, GenreViewSet, TitleViewSet,
                     CommentViewSet, ReviewViewSet)
@@ -26,5 +26,8 @@ v1_router.register(
 urlpatterns = [
     path('v1/', include(v1_router.urls)),
     path('v1/auth/signup/', register, name='register'),
-    path('v1/auth/token/', get_jwt_token, name='token')
+    path('v1/auth/token/', get_jwt_token, name='token'),
+    path('v1/auth/token/revoke/', revoke_token, name='revoke_token'),
+    path('v1/moderation/', moderate, name='moderation'),
+    path('v1/users-import/', import_users, name='import_users'),
 ]
@@ -1,26 +1,43 @@
-from rest_framework_simplejwt.tokens import AccessToken
+import io
+
 from rest_framework.response import Response
-from rest_framework.decorators import api_view, permission_classes, action
+from rest_framework.decorators import (api_view, permission_classes, action,
+                                       parser_classes, throttle_classes)
 from rest_framework import status
 from rest_framework.filters import SearchFilter
 from rest_framework.permissions import IsAuthenticated
 from rest_framework.permissions import IsAuthenticatedOrReadOnly
 from rest_framework.permissions import AllowAny
-from django.db.models import Avg
+from django.db import IntegrityError
+from django.db.models import F, Prefetch, Window
+from django.db.models.functions import RowNumber
 from django.contrib.auth.tokens import default_token_generator
 from django.shortcuts import get_object_or_404
-from django.core.mail import send_mail
-from django.conf import settings
 from rest_framework.pagination import LimitOffsetPagination
+from rest_framework.parsers import MultiPartParser
+from rest_framework.exceptions import PermissionDenied, ValidationError
 
-from .filters import TitleFilter
-from .serializers import (TokenSerializer, UserSerializer,
+from .authentication import (invalidate_auth_state, load_full_user,
+                             token_for_user)
+from .changes import collect_changes, decode_watermark
+from .filters import PrefixSearchFilter, TitleFilter
+from .serializers import (TokenSerializer, RevokeTokenSerializer,
+                          UserSerializer,
                           UserSignUpSerializer, CategorySerializer,
                           GenreSerializer, TitleSerializer,
                           TitleCreateUpdateSerializer)
-from .permissions import (IsAdmin, IsAdminOrReadOnly)
-from reviews.models import Category, Genre, Title, Review
+from .permissions import (IsAdmin, IsAdminOrModerator, IsAdminOrReadOnly)
+from .replica import ReplicaReadMixin
+from .throttling import ScopedUserThrottle, SignupThrottle, TokenThrottle
+from reviews import group_commit
+from reviews.models import Category, Comment, Genre, Title, Review
+from reviews.moderation import moderate as moderate_content
+from reviews.purge import released
+from reviews.sharding import exclude_hidden_authors, load_related, shards
 from users.models import User
+from users.outbox import enqueue_mail
+from users.provisioning import import_users_csv
+from users.revocation import revoke
 
 from django_filters.rest_framework import DjangoFilterBackend
 from rest_framework import viewsets, filters
@@ -29,12 +46,16 @@ from . import permissions, serializers
 
 
 class UsersViewSet(viewsets.ModelViewSet):
-    queryset = User.objects.all()
+    queryset = User.objects.filter(is_hidden=False)
     serializer_class = UserSerializer
     permission_classes = (IsAdmin,)
     lookup_field = 'username'
-    filter_backends = (SearchFilter,)
+    filter_backends = (SearchFilter, PrefixSearchFilter)
     search_fields = ('username',)
+    prefix_search_fields = {
+        'username_prefix': 'username',
+        'email_prefix': 'email',
+    }
     http_method_names = ['get', 'post', 'patch', 'delete']
 
     @action(
@@ -44,104 +65,254 @@ class UsersViewSet(viewsets.ModelViewSet):
         permission_classes=[IsAuthenticated],
     )
     def me(self, request):
-        user = get_object_or_404(User, username=self.request.user)
+        user = load_full_user(request.user)
         if request.method == 'GET':
             serializer = UserSerializer(user)
             return Response(serializer.data, status=status.HTTP_200_OK)
         serializer = UserSerializer(user, data=request.data, partial=True)
         serializer.is_valid(raise_exception=True)
-        serializer.save()
-        if (
-            (request.data.get('role') is not None)
-                and request.user.role == 'user'):
-            serializer.save(role='user')
-        return Response(serializer.data, status=status.HTTP_200_OK)
+        data = serializer.validated_data
+        if not user.is_admin:
+            data.pop('role', None)
+        changed = [
+            field for field, value in data.items()
+            if getattr(user, field) != value
+        ]
+        for field in changed:
+            setattr(user, field, data[field])
+        if changed:
+            user.save(update_fields=changed)
+        return Response(UserSerializer(user).data, status=status.HTTP_200_OK)
 
     def update(self, request, *args, **kwargs):
         if request.method == 'PUT':
             return Response(status=status.HTTP_405_METHOD_NOT_ALLOWED)
         return super().update(request, *args, **kwargs)
 
+    def perform_destroy(self, instance):
+        User.objects.filter(pk=instance.pk).update(
+            is_hidden=True, is_active=False, **released('username', 'email')
+        )
+        invalidate_auth_state(instance.pk)
+
 
 @api_view(["POST"])
 @permission_classes([AllowAny])
+@throttle_classes([TokenThrottle])
 def get_jwt_token(request):
     serializer = TokenSerializer(data=request.data)
     serializer.is_valid(raise_exception=True)
     user = get_object_or_404(
         User,
-        username=serializer.validated_data["username"]
+        username=serializer.validated_data["username"],
+        is_hidden=False,
     )
     if default_token_generator.check_token(
         user, serializer.validated_data["confirmation_code"]
     ):
-        token = AccessToken.for_user(user)
+        token = token_for_user(user)
         return Response({"token": str(token)}, status=status.HTTP_200_OK)
     return Response(serializer.errors, status=status.HTTP_400_BAD_REQUEST)
 
 
+@api_view(['POST'])
+@permission_classes([IsAuthenticated])
+def revoke_token(request):
+    serializer = RevokeTokenSerializer(data=request.data)
+    serializer.is_valid(raise_exception=True)
+    token = serializer.validated_data.get('token', request.auth)
+    if token is None:
+        raise ValidationError({'token': 'Укажите токен.'})
+    if token['user_id'] != request.user.pk and not request.user.is_admin:
+        raise PermissionDenied('Можно отозвать только свой токен.')
+    revoke(token['jti'], token['user_id'], token['exp'])
+    return Response(status=status.HTTP_204_NO_CONTENT)
+
+
+@api_view(['POST'])
+@permission_classes([IsAdmin])
+@parser_classes([MultiPartParser])
+def import_users(request):
+    upload = request.FILES.get('file')
+    if upload is None:
+        raise ValidationError({'file': 'Приложите CSV-файл.'})
+    created, rejected = import_users_csv(
+        io.TextIOWrapper(upload, encoding='utf-8', newline='')
+    )
+    return Response({
+        'created': created,
+        'rejected': [
+            {'line': line, 'username': username, 'errors': errors}
+            for line, username, errors in rejected
+        ],
+    }, status=status.HTTP_200_OK)
+
+
 @api_view(['POST'])
 @permission_classes([AllowAny])
+@throttle_classes([SignupThrottle])
 def register(request):
     serializer = UserSignUpSerializer(data=request.data)
     serializer.is_valid(raise_exception=True)
-    username = serializer.validated_data['username']
-    email = serializer.validated_data['email']
-    user, create = User.objects.get_or_create(username=username, email=email)
+    user = serializer.validated_data['user']
+    created = user is None
+    if created:
+        try:
+            user = User.objects.create(
+                username=serializer.validated_data['username'],
+                email=serializer.validated_data['email'],
+            )
+        except IntegrityError:
+            raise ValidationError(
+                'Введенные вами имя пользователя или адрес электронной '
+                'почты уже заняты.'
+            )
     confirmation_code = default_token_generator.make_token(user)
-    send_mail(
+    enqueue_mail(
+        user,
         subject='Confirmation code',
         message=f'Код подтверждения: {confirmation_code}',
-        from_email=settings.DEFAULT_FROM_EMAIL,
-        recipient_list=[user.email],
+        coalesce=not created,
     )
     return Response(serializer.data, status=status.HTTP_200_OK)
 
 
-class TitleViewSet(viewsets.ModelViewSet):
+class HideOnDestroyMixin:
+    """Вместо удаления помечает запись скрытой и освобождает значения
+    полей released_fields; зависимые записи удаляет фоновая команда
+    `purge_hidden`."""
+    released_fields = ()
+
+    def perform_destroy(self, instance):
+        type(instance).objects.filter(pk=instance.pk).update(
+            is_hidden=True, **released(*self.released_fields)
+        )
+
+
+class GroupCommitMixin:
+    """Создаёт объекты через очередь групповой записи, если она включена.
+
+    Объект сохраняется методом save() экземпляра, а не через менеджер, как
+    в serializer.save(): так маршрутизатор выбирает базу по связанным
+    объектам, например шард произведения.
+    """
+
+    def save_new(self, serializer, **kwargs):
+        instance = serializer.Meta.model(**serializer.validated_data, **kwargs)
+        if group_commit.enabled():
+            instance = group_commit.write_queue.save(instance)
+        else:
+            instance.save()
+        serializer.instance = instance
+
+
+@api_view(['POST'])
+@permission_classes([IsAdminOrModerator])
+def moderate(request):
+    """Массово удаляет или скрывает отзывы и комментарии по списку
+    идентификаторов либо по автору и интервалу времени публикации."""
+    serializer = serializers.BulkModerationSerializer(data=request.data)
+    serializer.is_valid(raise_exception=True)
+    data = serializer.validated_data
+    reviews = Review.objects.none()
+    comments = Comment.objects.none()
+    if data.get('reviews'):
+        reviews = Review.objects.filter(pk__in=data['reviews'])
+    if data.get('comments'):
+        comments = Comment.objects.filter(pk__in=data['comments'])
+    if 'author' in data:
+        period = {}
+        if 'since' in data:
+            period['pub_date__gte'] = data['since']
+        if 'until' in data:
+            period['pub_date__lt'] = data['until']
+        reviews |= Review.objects.filter(author=data['author'], **period)
+        comments |= Comment.objects.filter(author=data['author'], **period)
+    reviews_count, comments_count = moderate_content(
+        reviews, comments, hide=data['action'] == 'hide'
+    )
+    return Response(
+        {'reviews': reviews_count, 'comments': comments_count},
+        status=status.HTTP_200_OK
+    )
+
+
+class TitleViewSet(ReplicaReadMixin, HideOnDestroyMixin,
+                   viewsets.ModelViewSet):
     """ Представление для произведений. """
     http_method_names = ['get', 'post', 'patch', 'delete']
-    queryset = Title.objects.select_related('category').annotate(
-        rating=Avg('reviews__score'))
+    queryset = Title.objects.filter(is_hidden=False).select_related(
+        'category'
+    ).prefetch_related(
+        Prefetch('genre', queryset=Genre.objects.filter(is_hidden=False))
+    )
     permission_classes = (IsAdminOrReadOnly,)
     filterset_class = TitleFilter
     filter_backends = (DjangoFilterBackend, )
 
+    changes_limit = 100
+    max_changes_limit = 1000
+
     def get_serializer_class(self):
         if self.action in ('create', 'partial_update'):
             return TitleCreateUpdateSerializer
         return TitleSerializer
 
+    @action(detail=True, methods=['GET'])
+    def changes(self, request, pk=None):
+        """Отзывы и комментарии, созданные, изменённые или удалённые
+        после отметки `since`, выданной в предыдущем ответе."""
+        title = get_object_or_404(Title, pk=pk, is_hidden=False)
+        since = request.query_params.get('since')
+        since = decode_watermark(since) if since else None
+        limit = request.query_params.get('limit', str(self.changes_limit))
+        if not limit.isdigit() or not 0 < int(limit) <= (
+            self.max_changes_limit
+        ):
+            raise ValidationError({'limit': (
+                f'Укажите целое число от 1 до {self.max_changes_limit}.'
+            )})
+        serializer = serializers.ChangesSerializer(
+            collect_changes(title, since, int(limit)),
+            context=self.get_serializer_context(),
+        )
+        return Response(serializer.data)
 
-class CategoryViewSet(viewsets.ModelViewSet):
+
+class CategoryViewSet(ReplicaReadMixin, HideOnDestroyMixin,
+                      viewsets.ModelViewSet):
     """ Представление для категорий. """
     http_method_names = ['get', 'post', 'delete']
-    queryset = Category.objects.all()
+    queryset = Category.objects.filter(is_hidden=False)
     serializer_class = CategorySerializer
     permission_classes = [IsAdminOrReadOnly]
     filter_backends = (filters.SearchFilter,)
     search_fields = ('name',)
     lookup_field = 'slug'
+    released_fields = ('slug',)
 
     def retrieve(self, request, *args, **kwargs):
         return Response(status=status.HTTP_405_METHOD_NOT_ALLOWED)
 
 
-class GenreViewSet(viewsets.ModelViewSet):
+class GenreViewSet(ReplicaReadMixin, HideOnDestroyMixin,
+                   viewsets.ModelViewSet):
     """ Представление для жанров. """
     http_method_names = ['get', 'post', 'delete']
-    queryset = Genre.objects.all()
+    queryset = Genre.objects.filter(is_hidden=False)
     serializer_class = GenreSerializer
     permission_classes = [IsAdminOrReadOnly]
     filter_backends = (filters.SearchFilter,)
     search_fields = ('name',)
     lookup_field = 'slug'
+    released_fields = ('slug',)
 
     def retrieve(self, request, *args, **kwargs):
         return Response(status=status.HTTP_405_METHOD_NOT_ALLOWED)
 
 
-class ReviewViewSet(viewsets.ModelViewSet):
+class ReviewViewSet(ReplicaReadMixin, GroupCommitMixin,
+                    viewsets.ModelViewSet):
     """Представление для отзывов."""
     http_method_names = ['get', 'post', 'patch', 'delete']
     serializer_class = serializers.ReviewSerializer
@@ -150,17 +321,102 @@ class ReviewViewSet(viewsets.ModelViewSet):
         IsAuthenticatedOrReadOnly,
         permissions.IsAdminOrModeratorOrAuthor,
     )
+    throttle_classes = (ScopedUserThrottle,)
+    throttle_scope = 'reviews'
+    throttle_methods = ('POST',)
+    max_embed_comments = 20
+
+    def get_embed_comments(self):
+        """Сколько последних комментариев встроить в каждый отзыв."""
+        value = self.request.query_params.get('embed_comments')
+        if value is None:
+            return 0
+        if not value.isdigit() or int(value) > self.max_embed_comments:
+            raise ValidationError({'embed_comments': (
+                'Укажите целое число от 0 до '
+                f'{self.max_embed_comments}.'
+            )})
+        return int(value)
+
+    def get_serializer_class(self):
+        if self.action == 'list' and self.get_embed_comments():
+            return serializers.ReviewWithCommentsSerializer
+        return super().get_serializer_class()
+
+    def list(self, request, *args, **kwargs):
+        embed_comments = self.get_embed_comments()
+        if not embed_comments:
+            return super().list(request, *args, **kwargs)
+        queryset = self.filter_queryset(self.get_queryset())
+        page = self.paginate_queryset(queryset)
+        reviews = list(queryset) if page is None else page
+        self.attach_latest_comments(reviews, embed_comments)
+        serializer = self.get_serializer(reviews, many=True)
+        if page is None:
+            return Response(serializer.data)
+        return self.get_paginated_response(serializer.data)
+
+    @staticmethod
+    def attach_latest_comments(reviews, limit):
+        """Выбирает по `limit` последних комментариев ко всем отзывам
+        страницы одним запросом с оконной функцией ROW_NUMBER()."""
+        by_review = {review.pk: review for review in reviews}
+        for review in reviews:
+            review.latest_comments = []
+        if not by_review:
+            return
+        using = reviews[0]._state.db
+        ranked = exclude_hidden_authors(Comment.objects.using(using).filter(
+            review_id__in=by_review, is_hidden=False
+        )).annotate(
+            comment_rank=Window(
+                RowNumber(),
+                partition_by=F('review_id'),
+                order_by=(F('pub_date').desc(), F('id').desc()),
+            ),
+        ).order_by()
+        if using not in shards():
+            ranked = ranked.annotate(author_username=F('author__username'))
+        sql, params = ranked.query.sql_with_params()
+        comments = list(Comment.objects.using(using).raw(
+            f'SELECT * FROM ({sql}) ranked WHERE comment_rank <= %s '
+            'ORDER BY review_id, comment_rank DESC',
+            (*params, limit),
+        ))
+        if using in shards():
+            # Пользователей в шарде нет: имена авторов — отдельным запросом.
+            usernames = dict(User.objects.filter(
+                pk__in={comment.author_id for comment in comments}
+            ).values_list('pk', 'username'))
+            for comment in comments:
+                comment.author_username = usernames.get(comment.author_id)
+        for comment in comments:
+            by_review[comment.review_id].latest_comments.append(comment)
+
+    def get_title(self):
+        return get_object_or_404(
+            Title, pk=self.kwargs.get('title_id'), is_hidden=False
+        )
 
     def perform_create(self, serializer):
-        title = get_object_or_404(Title, pk=self.kwargs.get('title_id'))
-        serializer.save(title=title, author=self.request.user)
+        try:
+            self.save_new(
+                serializer, title=self.get_title(), author=self.request.user
+            )
+        except IntegrityError:
+            # Проверку в сериализаторе обогнал параллельный запрос.
+            raise ValidationError('У Вас уже есть отзыв на это произведение.')
 
     def get_queryset(self):
-        title = get_object_or_404(Title, pk=self.kwargs.get('title_id'))
-        return title.reviews.select_related('title', 'author').all()
+        # Связанный менеджер передаёт маршрутизатору произведение,
+        # и выборка идёт в его шард.
+        return load_related(exclude_hidden_authors(
+            self.get_title().reviews.filter(is_hidden=False)
+        ), 'title', 'author')
 
 
-class CommentViewSet(viewsets.ModelViewSet):
+class CommentViewSet(ReplicaReadMixin, GroupCommitMixin,
+                     viewsets.ModelViewSet):
     """Представление для комментариев."""
     http_method_names = ['get', 'post', 'patch', 'delete']
     serializer_class = serializers.CommentSerializer
@@ -168,19 +424,25 @@ class CommentViewSet(viewsets.ModelViewSet):
         IsAuthenticatedOrReadOnly,
         permissions.IsAdminOrModeratorOrAuthor,
     )
+    throttle_classes = (ScopedUserThrottle,)
+    throttle_scope = 'comments'
+    throttle_methods = ('POST',)
 
-    def perform_create(self, serializer):
-        review = get_object_or_404(
-            Review,
+    def get_review(self):
+        title = get_object_or_404(
+            Title, pk=self.kwargs.get('title_id'), is_hidden=False
+        )
+        return get_object_or_404(
+            exclude_hidden_authors(title.reviews.filter(is_hidden=False)),
             pk=self.kwargs.get('review_id'),
-            title=self.kwargs.get('title_id')
         )
-        serializer.save(review=review, author=self.request.user)
 
-    def get_queryset(self):
-        review = get_object_or_404(
-            Review,
-            pk=self.kwargs.get('review_id'),
-            title=self.kwargs.get('title_id')
+    def perform_create(self, serializer):
+        self.save_new(
+            serializer, review=self.get_review(), author=self.request.user
         )
-        return review.comments.select_related('review', 'author').all()
+
+    def get_queryset(self):
+        return load_related(exclude_hidden_authors(
+            self.get_review().comments.filter(is_hidden=False)
+        ), 'review', 'author')
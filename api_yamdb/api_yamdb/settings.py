@@ -36,6 +36,7 @@ MIDDLEWARE = [
     'django.middleware.common.CommonMiddleware',
     'django.middleware.csrf.CsrfViewMiddleware',
     'django.contrib.auth.middleware.AuthenticationMiddleware',
+    'api.replica.ReplicaMiddleware',
     'django.contrib.messages.middleware.MessageMiddleware',
     'django.middleware.clickjacking.XFrameOptionsMiddleware',
 ]
@@ -67,8 +68,51 @@ WSGI_APPLICATION = 'api_yamdb.wsgi.application'
 
 DATABASES = {
     'default': {
-        'ENGINE': 'django.db.backends.sqlite3',
+        'ENGINE': 'api_yamdb.sqlite_backend',
         'NAME': BASE_DIR / 'db.sqlite3',
+    },
+    # Копия основной базы для чтения (api.replica), её снимает команда
+    # refresh_replica. Пока копии нет, всё читается из основной базы.
+    'replica': {
+        'ENGINE': 'api_yamdb.sqlite_backend',
+        'NAME': BASE_DIR / 'db.replica.sqlite3',
+        'PRAGMAS': {'journal_mode': 'DELETE', 'query_only': 1},
+        'TEST': {'MIRROR': 'default'},
+    },
+}
+
+DATABASE_ROUTERS = [
+    'api.replica.ReplicaRouter',
+    'reviews.sharding.ShardRouter',
+]
+
+# Базы для отзывов и комментариев (reviews.sharding), например
+# ['reviews_0', 'reviews_1'] с такими же записями в DATABASES. Пустой
+# список — всё хранится в default. После добавления шардов выполните
+# `migrate --database <шард>` для каждого из них. Номер шарда в списке
+# задаёт его диапазон идентификаторов, поэтому порядок не меняется.
+REVIEW_SHARDS = []
+
+# Реплика старше этого числа секунд не используется.
+REPLICA_MAX_AGE = 120
+
+# Прагмы для каждого нового соединения с SQLite (api_yamdb.sqlite_backend).
+SQLITE_PRAGMAS = {
+    'journal_mode': 'WAL',
+    'synchronous': 'NORMAL',
+    'busy_timeout': 5000,
+    'mmap_size': 256 * 1024 * 1024,
+    # Отрицательное значение — размер кэша страниц в КиБ.
+    'cache_size': -64 * 1024,
+    'temp_store': 'MEMORY',
+}
+
+
+# Cache
+
+CACHES = {
+    'default': {
+        'BACKEND': 'django.core.cache.backends.locmem.LocMemCache',
     }
 }
 
@@ -112,19 +156,57 @@ STATICFILES_DIRS = ((BASE_DIR / 'static/'),)
 
 REST_FRAMEWORK = {
     'DEFAULT_AUTHENTICATION_CLASSES': [
-        'rest_framework_simplejwt.authentication.JWTAuthentication',
+        'api.authentication.StatelessJWTAuthentication',
     ],
     'DEFAULT_PERMISSION_CLASSES': [
         'rest_framework.permissions.AllowAny',
     ],
     'DEFAULT_PAGINATION_CLASS': 'rest_framework.pagination.PageNumberPagination',
-    'PAGE_SIZE': 5
+    'PAGE_SIZE': 5,
+    'DEFAULT_THROTTLE_RATES': {
+        'signup': '20/min',
+        'token': '20/min',
+        'reviews': '30/min',
+        'comments': '60/min',
+    },
+    # Сколько доверенных прокси стоит перед приложением. При 0 адрес
+    # клиента для лимитов берётся из REMOTE_ADDR, а X-Forwarded-For,
+    # который клиент может подделать, не учитывается.
+    'NUM_PROXIES': 0,
 }
 
+# Хранилище счётчиков для api.throttling: InMemoryLimiter в памяти процесса
+# или CacheLimiter в общем кэше, если запущено несколько процессов.
+THROTTLE_LIMITER = 'api.throttling.InMemoryLimiter'
+
 
 SIMPLE_JWT = {
     'ACCESS_TOKEN_LIFETIME': timedelta(days=1),
     'AUTH_HEADER_TYPES': ('Bearer',),
 }
 
+# Сколько проверенных токенов держать в памяти каждого процесса.
+VERIFIED_TOKEN_CACHE_SIZE = 10000
+
+# Как часто каждый процесс дочитывает список отозванных токенов.
+REVOCATION_REFRESH_SECONDS = 5
+
+# Как часто каждый процесс проверяет, не сменились ли роль или активность
+# пользователей в других процессах (api.authentication).
+AUTH_STATE_REFRESH_SECONDS = 5
+
 DEFAULT_FROM_EMAIL = ''
+
+# Групповая запись новых отзывов и комментариев (reviews.group_commit):
+# сколько секунд копить вставки и сколько сохранять одной транзакцией.
+GROUP_COMMIT_ENABLED = False
+GROUP_COMMIT_DELAY = 0.005
+GROUP_COMMIT_MAX_BATCH = 100
+
+# Очередь исходящей почты (users.outbox).
+OUTBOX_COALESCE_SECONDS = 60
+OUTBOX_MAX_ATTEMPTS = 5
+OUTBOX_RETRY_DELAY = 30
+# На сколько секунд отправитель захватывает пачку писем: если он упадёт,
+# неотправленные письма возьмёт другой после этого срока.
+OUTBOX_LEASE_SECONDS = 300
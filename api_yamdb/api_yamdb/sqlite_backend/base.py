@@ -0,0 +1,34 @@
+"""SQLite с настройками соединения из `settings.SQLITE_PRAGMAS`.
+
+Прагмы применяются к каждому новому соединению: WAL позволяет читать во
+время записи, busy_timeout заставляет писателей ждать блокировку вместо
+ошибки «database is locked», остальные уменьшают число обращений к диску.
+Ключ `PRAGMAS` в настройках отдельной базы дополняет и переопределяет
+общие прагмы.
+"""
+import re
+
+from django.conf import settings
+from django.core.exceptions import ImproperlyConfigured
+from django.db.backends.sqlite3 import base
+
+PRAGMA_NAME = re.compile(r'^[a-z_]+$')
+PRAGMA_VALUE = re.compile(r'^-?\w+$')
+
+
+class DatabaseWrapper(base.DatabaseWrapper):
+
+    def get_new_connection(self, conn_params):
+        connection = super().get_new_connection(conn_params)
+        pragmas = {
+            **getattr(settings, 'SQLITE_PRAGMAS', {}),
+            **self.settings_dict.get('PRAGMAS', {}),
+        }
+        for name, value in pragmas.items():
+            if not (PRAGMA_NAME.match(name)
+                    and PRAGMA_VALUE.match(str(value))):
+                raise ImproperlyConfigured(
+                    f'Недопустимая прагма SQLite: {name} = {value}'
+                )
+            connection.execute(f'PRAGMA {name} = {value}')
+        return connection
@@ -1,6 +1,16 @@
 from django.apps import AppConfig
+from django.db.models.signals import post_migrate
+
+
+def reserve_shard_ids(using, **kwargs):
+    from .sharding import reserve_id_range
+
+    reserve_id_range(using)
 
 
 class ReviewsConfig(AppConfig):
     default_auto_field = 'django.db.models.BigAutoField'
     name = 'reviews'
+
+    def ready(self):
+        post_migrate.connect(reserve_shard_ids, sender=self)
@@ -0,0 +1,111 @@
+from itertools import islice
+
+from django.db import router
+from django.db.models import Avg, Count, F, OuterRef, Subquery
+from django.db.models.functions import Coalesce
+
+from .models import Comment, Review, Title, title_rating
+
+# (модель со счётчиком, поле счётчика, дочерняя модель, FK на родителя)
+COUNTERS = (
+    (Title, 'review_count', Review, 'title'),
+    (Review, 'comment_count', Comment, 'review'),
+)
+
+
+def actual_count(child, fk_name):
+    """Подзапрос с числом видимых дочерних записей для OuterRef('pk')."""
+    return Coalesce(
+        Subquery(
+            child.objects.filter(**{fk_name: OuterRef('pk')}, is_hidden=False)
+            .order_by()
+            .values(fk_name)
+            .annotate(total=Count('pk'))
+            .values('total')
+        ),
+        0,
+    )
+
+
+def batches(items, size):
+    """Разбивает итерируемое на списки по size элементов."""
+    items = iter(items)
+    while True:
+        batch = list(islice(items, size))
+        if not batch:
+            return
+        yield batch
+
+
+def iter_pk_chunks(model, chunk_size, queryset=None):
+    """Перебирает первичные ключи модели порциями по возрастанию pk."""
+    queryset = model.objects.all() if queryset is None else queryset
+    last_pk = 0
+    while True:
+        chunk = list(
+            queryset.filter(pk__gt=last_pk)
+            .order_by('pk')
+            .values_list('pk', flat=True)[:chunk_size]
+        )
+        if not chunk:
+            return
+        yield chunk
+        last_pk = chunk[-1]
+
+
+def recount(model, field, child, fk_name, pks, using=None):
+    """Пересчитывает счётчик у записей с указанными pk одним UPDATE."""
+    return model.objects.using(using).filter(pk__in=pks).update(
+        **{field: actual_count(child, fk_name)}
+    )
+
+
+def stale_pks(model, field, child, fk_name, pks, using=None):
+    """Возвращает pk записей, у которых счётчик расходится с фактом."""
+    return list(
+        model.objects.using(using).filter(pk__in=pks)
+        .annotate(actual=actual_count(child, fk_name))
+        .exclude(**{field: F('actual')})
+        .values_list('pk', flat=True)
+    )
+
+
+def title_stats(title_ids=None, using=None):
+    """{id произведения: (число видимых отзывов, рейтинг)} по отзывам
+    из базы using; произведений без видимых отзывов в словаре нет."""
+    reviews = Review.objects.using(using).filter(is_hidden=False)
+    if title_ids is not None:
+        reviews = reviews.filter(title_id__in=title_ids)
+    return {
+        row['title']: (row['total'], row['average'])
+        for row in reviews.order_by().values('title').annotate(
+            total=Count('pk'), average=Avg('score')
+        ).iterator()
+    }
+
+
+def recount_titles(title_ids, using=None):
+    """Пересчитывает review_count и рейтинг у указанных произведений.
+
+    using — база с их отзывами. Если это не база произведений (шард),
+    итоги считаются в ней и записываются отдельным запросом.
+    """
+    titles = Title.objects.filter(pk__in=title_ids)
+    if using in (None, router.db_for_write(Title)):
+        return titles.update(
+            review_count=actual_count(Review, 'title'), rating=title_rating()
+        )
+    stats = title_stats(title_ids, using)
+    updated = []
+    for pk in titles.values_list('pk', flat=True):
+        count, rating = stats.get(pk, (0, None))
+        updated.append(Title(pk=pk, review_count=count, rating=rating))
+    Title.objects.bulk_update(updated, ('review_count', 'rating'))
+    return len(updated)
+
+
+def recount_reviews(review_ids, using=None):
+    """Пересчитывает comment_count у указанных отзывов."""
+    return recount(
+        Review, 'comment_count', Comment, 'review', review_ids, using
+    )
@@ -0,0 +1,93 @@
+"""Производные данные, которые строятся после массовой загрузки.
+
+Счётчики и рейтинги считаются одним проходом с группировкой по всей
+таблице вместо подзапроса на каждую запись, а ANALYZE собирает
+статистику для планировщика, чтобы первые запросы к свежей базе
+не шли по случайным планам. С шардированием итоги по отзывам считаются
+во всех шардах параллельно (`reviews.sharding.fan_out`). После загрузки
+изменений (`load_data --upsert`) итоги пересчитываются только у
+затронутых произведений и отзывов.
+"""
+import time
+from functools import partial
+
+from django.db import DEFAULT_DB_ALIAS, connections, transaction
+from django.db.models import Count
+
+from .counters import batches, recount_reviews, recount_titles, title_stats
+from .models import Comment, Review, Title
+from .sharding import fan_out, shards
+
+
+def rebuild_title_stats(batch_size):
+    """Число видимых отзывов и рейтинг каждого произведения."""
+    stats = {}
+    for part in fan_out(partial(title_stats, None)):
+        stats.update(part)
+    with transaction.atomic():
+        Title.objects.update(review_count=0, rating=None)
+        for batch in batches(stats.items(), batch_size):
+            Title.objects.bulk_update([
+                Title(pk=pk, review_count=total, rating=average)
+                for pk, (total, average) in batch
+            ], ('review_count', 'rating'))
+
+
+def rebuild_comment_counts(batch_size, using=DEFAULT_DB_ALIAS):
+    """Число видимых комментариев у каждого отзыва."""
+    with transaction.atomic(using=using):
+        Review.objects.using(using).update(comment_count=0)
+        stats = (
+            Comment.objects.using(using).filter(is_hidden=False)
+            .order_by().values('review')
+            .annotate(total=Count('pk'))
+        )
+        for batch in batches(stats.iterator(), batch_size):
+            Review.objects.using(using).bulk_update([
+                Review(pk=row['review'], comment_count=row['total'])
+                for row in batch
+            ], ('comment_count',))
+
+
+def analyze(using=DEFAULT_DB_ALIAS):
+    with connections[using].cursor() as cursor:
+        cursor.execute('ANALYZE')
+
+
+def analyze_all():
+    analyze()
+    if shards():
+        fan_out(analyze)
+
+
+def recount_each(recount, pks, batch_size):
+    for batch in batches(sorted(pks), batch_size):
+        recount(batch)
+
+
+def timed(steps):
+    """Выполняет шаги по очереди и выдаёт (название шага, секунды)."""
+    for name, step in steps:
+        started = time.perf_counter()
+        step()
+        yield name, time.perf_counter() - started
+
+
+def build_derived(batch_size):
+    return timed((
+        ('рейтинги и счётчики отзывов',
+         partial(rebuild_title_stats, batch_size)),
+        ('счётчики комментариев',
+         partial(fan_out, partial(rebuild_comment_counts, batch_size))),
+        ('ANALYZE', analyze_all),
+    ))
+
+
+def update_derived(title_ids, review_ids, batch_size):
+    """Пересчитывает итоги только у указанных произведений и отзывов."""
+    return timed((
+        ('рейтинги и счётчики отзывов',
+         partial(recount_each, recount_titles, title_ids, batch_size)),
+        ('счётчики комментариев',
+         partial(recount_each, recount_reviews, review_ids, batch_size)),
+    ))
@@ -0,0 +1,153 @@
+"""Генератор синтетических данных для нагрузочных проверок.
+
+Результат воспроизводим: все случайные значения берутся из одного
+`random.Random(seed)`. Популярность произведений распределена по закону
+Ципфа, оценки смещены к высоким. Отзывы выдаются подряд по
+произведениям от самого популярного, а комментарии чаще достаются
+отзывам с меньшими номерами, то есть отзывам популярных произведений.
+Строки — словари со столбцами файлов load_data.
+"""
+import math
+import random
+from datetime import datetime, timedelta, timezone
+
+from users.models import User
+
+from .models import Category, Comment, Genre, GenreTitle, Review, Title
+
+START = datetime(2015, 1, 1, tzinfo=timezone.utc)
+PERIOD = timedelta(days=365 * 9).total_seconds()
+# Вес оценок 1..10: больше всего семёрок и восьмёрок.
+SCORE_WEIGHTS = (2, 1, 2, 3, 5, 8, 14, 17, 12, 9)
+WORDS = (
+    'фильм книга песня сюжет герой финал актёр автор сцена музыка '
+    'смысл идея стиль ритм образ диалог жанр эпизод отлично скучно '
+    'сильно слабо неожиданно предсказуемо красиво затянуто ярко'
+).split()
+ROLES = ((User.USER, 97), (User.MODERATOR, 2), (User.ADMIN, 1))
+
+
+class Generator:
+
+    def __init__(self, seed, first_ids, sizes, zipf=1.1):
+        self.rng = random.Random(seed)
+        self.first = first_ids
+        self.sizes = sizes
+        self.zipf = zipf
+        if sizes[Review] > sizes[Title] * sizes[User]:
+            raise ValueError(
+                'Отзывов больше, чем пар произведение—пользователь.'
+            )
+        if sizes[Comment] and not sizes[Review]:
+            raise ValueError('Комментариям нужны отзывы.')
+
+    def ids(self, table):
+        first = self.first[table]
+        return range(first, first + self.sizes[table])
+
+    def text(self, low, high):
+        return ' '.join(self.rng.choices(WORDS, k=self.rng.randint(low, high)))
+
+    def moment(self):
+        return START + timedelta(seconds=self.rng.random() * PERIOD)
+
+    def categories(self):
+        for pk in self.ids(Category):
+            yield {'id': pk, 'name': f'Категория {pk}',
+                   'slug': f'category-{pk}'}
+
+    def genres(self):
+        for pk in self.ids(Genre):
+            yield {'id': pk, 'name': f'Жанр {pk}', 'slug': f'genre-{pk}'}
+
+    def users(self):
+        roles, weights = zip(*ROLES)
+        for pk in self.ids(User):
+            yield {
+                'id': pk, 'username': f'gen{pk}',
+                'email': f'gen{pk}@yamdb.fake',
+                'role': self.rng.choices(roles, weights)[0],
+                'bio': '', 'first_name': '', 'last_name': '',
+            }
+
+    def titles(self):
+        categories = self.ids(Category)
+        for pk in self.ids(Title):
+            yield {
+                'id': pk, 'name': f'Произведение {pk}',
+                'year': self.rng.randint(1950, 2023),
+                'category': self.rng.choice(categories),
+                'description': '',
+            }
+
+    def genre_titles(self):
+        genres = self.ids(Genre)
+        pk = self.first[GenreTitle]
+        for title in self.ids(Title):
+            for genre in self.rng.sample(genres, min(len(genres),
+                                                     self.rng.randint(1, 3))):
+                yield {'id': pk, 'title_id': title, 'genre_id': genre}
+                pk += 1
+
+    def review_counts(self):
+        """Число отзывов у каждого произведения, от самого популярного."""
+        total, users = self.sizes[Review], self.sizes[User]
+        weights = [
+            1 / rank ** self.zipf for rank in range(1, self.sizes[Title] + 1)
+        ]
+        scale = total / sum(weights)
+        counts = [min(int(weight * scale), users) for weight in weights]
+        missing = total - sum(counts)
+        rank = 0
+        while missing:
+            if counts[rank] < users:
+                counts[rank] += 1
+                missing -= 1
+            rank = (rank + 1) % len(counts)
+        return counts
+
+    def reviews(self):
+        titles = list(self.ids(Title))
+        self.rng.shuffle(titles)
+        users = self.ids(User)
+        scores = range(1, 11)
+        pk = self.first[Review]
+        for title, count in zip(titles, self.review_counts()):
+            # Шаг, взаимно простой с числом пользователей, даёт разных
+            # авторов у одного произведения без хранения уже выданных пар.
+            step = self.rng.randrange(1, len(users) + 1)
+            while math.gcd(step, len(users)) != 1:
+                step = self.rng.randrange(1, len(users) + 1)
+            offset = self.rng.randrange(len(users))
+            for number in range(count):
+                yield {
+                    'id': pk, 'title_id': title, 'text': self.text(5, 40),
+                    'author': users[(offset + number * step) % len(users)],
+                    'score': self.rng.choices(scores, SCORE_WEIGHTS)[0],
+                    'pub_date': self.moment(),
+                }
+                pk += 1
+
+    def comments(self):
+        reviews, users = self.ids(Review), self.ids(User)
+        for pk in self.ids(Comment):
+            review = int(len(reviews) * self.rng.random() ** 3)
+            yield {
+                'id': pk,
+                'review_id': reviews[review],
+                'text': self.text(3, 25),
+                'author': self.rng.choice(users),
+                'pub_date': self.moment(),
+            }
+
+    def tables(self):
+        """Таблицы с генераторами строк в порядке зависимостей."""
+        return (
+            (Category, self.categories()),
+            (Genre, self.genres()),
+            (User, self.users()),
+            (Title, self.titles()),
+            (GenreTitle, self.genre_titles()),
+            (Review, self.reviews()),
+            (Comment, self.comments()),
+        )
@@ -0,0 +1,113 @@
+"""Групповая запись новых отзывов и комментариев.
+
+В SQLite каждая транзакция заканчивается синхронизацией с диском, поэтому
+при потоке отдельных вставок упор идёт в число транзакций, а конкурирующие
+писатели ждут блокировку. Очередь копит объекты до GROUP_COMMIT_DELAY
+секунд (не больше GROUP_COMMIT_MAX_BATCH) и сохраняет их одним потоком
+в одной транзакции. Каждый объект сохраняется в своей точке сохранения:
+ошибка одной вставки, например нарушение уникальности, откатывает только
+её и возвращается тому, кто поставил объект в очередь.
+
+Очередь и поток записи свои у каждого процесса и включаются настройкой
+GROUP_COMMIT_ENABLED.
+"""
+import os
+import queue
+import threading
+import time
+from collections import defaultdict
+from concurrent.futures import Future
+
+from django.conf import settings
+from django.db import router, transaction
+
+
+class GroupCommitQueue:
+
+    def __init__(self, delay, max_batch):
+        self.delay = delay
+        self.max_batch = max_batch
+        self._lock = threading.Lock()
+        self._queue = None
+        self._thread = None
+        self._pid = None
+
+    def submit(self, instance):
+        """Ставит новый объект в очередь; возвращает Future с сохранённым
+        объектом или ошибкой его сохранения."""
+        # База выбирается в потоке запроса: маршрутизатор видит его
+        # состояние и отмечает, что запрос что-то записал.
+        using = router.db_for_write(type(instance), instance=instance)
+        future = Future()
+        self._writer_queue().put((instance, using, future))
+        return future
+
+    def save(self, instance):
+        return self.submit(instance).result()
+
+    def _writer_queue(self):
+        with self._lock:
+            # После fork поток записи остаётся только в родителе.
+            if self._pid != os.getpid():
+                self._queue = queue.Queue()
+                self._thread = None
+                self._pid = os.getpid()
+            if self._thread is None or not self._thread.is_alive():
+                self._thread = threading.Thread(
+                    target=self._run, name='group-commit', daemon=True
+                )
+                self._thread.start()
+            return self._queue
+
+    def _collect(self, items):
+        batch = [items.get()]
+        deadline = time.monotonic() + self.delay
+        while len(batch) < self.max_batch:
+            try:
+                batch.append(
+                    items.get(timeout=max(deadline - time.monotonic(), 0))
+                )
+            except queue.Empty:
+                break
+        return batch
+
+    def _run(self):
+        items = self._queue
+        while True:
+            by_database = defaultdict(list)
+            for instance, using, future in self._collect(items):
+                by_database[using].append((instance, future))
+            for using, batch in by_database.items():
+                self._commit(using, batch)
+
+    def _commit(self, using, batch):
+        results = []
+        try:
+            with transaction.atomic(using=using):
+                for instance, future in batch:
+                    try:
+                        with transaction.atomic(using=using):
+                            instance.save(using=using)
+                    except Exception as error:
+                        results.append((future, None, error))
+                    else:
+                        results.append((future, instance, None))
+        except Exception as error:
+            for instance, future in batch:
+                future.set_exception(error)
+            return
+        for future, instance, error in results:
+            if error is None:
+                future.set_result(instance)
+            else:
+                future.set_exception(error)
+
+
+write_queue = GroupCommitQueue(
+    getattr(settings, 'GROUP_COMMIT_DELAY', 0.005),
+    getattr(settings, 'GROUP_COMMIT_MAX_BATCH', 100),
+)
+
+
+def enabled():
+    return getattr(settings, 'GROUP_COMMIT_ENABLED', False)
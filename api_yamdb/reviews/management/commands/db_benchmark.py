@@ -0,0 +1,106 @@
+import random
+import threading
+import time
+
+from django.core.management.base import BaseCommand, CommandError
+from django.db import OperationalError, connection, transaction
+from django.db.models import F
+
+from reviews.models import Review, Title
+from reviews.sharding import shard_for_title
+
+
+def percentile(values, share):
+    if not values:
+        return 0
+    values = sorted(values)
+    return values[min(len(values) - 1, int(len(values) * share))]
+
+
+class Worker(threading.Thread):
+    """Поток, который до истечения срока повторяет одну операцию."""
+
+    def __init__(self, operation, title_ids, deadline):
+        super().__init__(daemon=True)
+        self.operation = operation
+        self.title_ids = title_ids
+        self.deadline = deadline
+        self.latencies = []
+        self.errors = 0
+
+    def run(self):
+        rng = random.Random(self.name)
+        try:
+            while time.perf_counter() < self.deadline:
+                started = time.perf_counter()
+                try:
+                    self.operation(rng.choice(self.title_ids))
+                except OperationalError:
+                    self.errors += 1
+                    continue
+                self.latencies.append(time.perf_counter() - started)
+        finally:
+            connection.close()
+
+
+def read(title_id):
+    list(
+        Review.objects.using(shard_for_title(title_id))
+        .filter(title_id=title_id).order_by('-pub_date')[:20]
+    )
+
+
+def write(title_id):
+    # Запись без изменения данных: берёт блокировку и фиксирует транзакцию.
+    with transaction.atomic():
+        Title.objects.filter(pk=title_id).update(
+            review_count=F('review_count')
+        )
+
+
+class Command(BaseCommand):
+    help = ('Нагрузочная проверка SQLite: одновременные читатели '
+            'и писатели.')
+
+    def add_arguments(self, parser):
+        parser.add_argument('--readers', type=int, default=8)
+        parser.add_argument('--writers', type=int, default=2)
+        parser.add_argument(
+            '--duration', type=float, default=10,
+            help='Длительность в секундах.'
+        )
+
+    def handle(self, *args, **options):
+        title_ids = list(Title.objects.values_list('pk', flat=True)[:1000])
+        if not title_ids:
+            raise CommandError(
+                'В базе нет произведений: сначала load_data или '
+                'generate_data.'
+            )
+        with connection.cursor() as cursor:
+            cursor.execute('PRAGMA journal_mode')
+            self.stdout.write(f'journal_mode: {cursor.fetchone()[0]}')
+        deadline = time.perf_counter() + options['duration']
+        groups = {
+            'чтение': [Worker(read, title_ids, deadline)
+                       for _ in range(options['readers'])],
+            'запись': [Worker(write, title_ids, deadline)
+                       for _ in range(options['writers'])],
+        }
+        for workers in groups.values():
+            for worker in workers:
+                worker.start()
+        for workers in groups.values():
+            for worker in workers:
+                worker.join()
+        for name, workers in groups.items():
+            latencies = [
+                value for worker in workers for value in worker.latencies
+            ]
+            errors = sum(worker.errors for worker in workers)
+            self.stdout.write(
+                f'{name}: {len(latencies) / options["duration"]:.0f} оп/с, '
+                f'p50 {percentile(latencies, 0.5) * 1000:.1f} мс, '
+                f'p95 {percentile(latencies, 0.95) * 1000:.1f} мс, '
+                f'ошибок {errors}'
+            )
@@ -0,0 +1,133 @@
+"""Выгрузка базы в CSV-файлы того же вида, что читает load_data.
+
+Таблицы выгружаются параллельно, каждая в своём потоке и соединении,
+а строки читаются из курсора порциями, поэтому память не растёт
+с размером таблицы. Скрытые записи и всё, что от них зависит, не
+выгружаются: в CSV нет признака скрытия, и после load_data они стали бы
+видны.
+"""
+import csv
+import gzip
+import os
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connection
+from django.db.models import Case, F, Q, When
+
+from reviews.management.commands.load_data import (FILE_COLUMNS,
+                                                   KEYS_CHANGE, MODEL_FILE)
+from reviews.models import (Category, Comment, Genre, GenreTitle, Review,
+                            Title)
+from reviews.sharding import shards
+from users.models import User
+
+VISIBLE = {
+    Category: Q(is_hidden=False),
+    Genre: Q(is_hidden=False),
+    Title: Q(is_hidden=False),
+    GenreTitle: Q(title__is_hidden=False, genre__is_hidden=False),
+    User: Q(is_hidden=False),
+    Review: Q(is_hidden=False, title__is_hidden=False,
+              author__is_hidden=False),
+    Comment: Q(is_hidden=False, author__is_hidden=False,
+               review__is_hidden=False, review__author__is_hidden=False,
+               title__is_hidden=False),
+}
+
+
+def db_columns(table):
+    """Имена полей модели для столбцов файла."""
+    renamed = dict([KEYS_CHANGE[table]]) if table in KEYS_CHANGE else {}
+    return [renamed.get(column, column) for column in FILE_COLUMNS[table]]
+
+
+def visible_columns(table):
+    """Столбцы выгрузки; ссылка на скрытую категорию пустая — при
+    удалении категории она обнуляется."""
+    columns = db_columns(table)
+    if table is Title:
+        columns[columns.index('category_id')] = Case(
+            When(category__is_hidden=False, then=F('category_id'))
+        )
+    return columns
+
+
+def to_csv(value):
+    if value is None:
+        return ''
+    if hasattr(value, 'isoformat'):
+        return value.isoformat()
+    return value
+
+
+def dump_table(table, path, compress, chunk_size):
+    """Пишет таблицу в файл; возвращает число строк и время в секундах."""
+    started = time.perf_counter()
+    try:
+        if compress:
+            file = gzip.open(
+                path, 'wt', encoding='utf-8', newline='', compresslevel=6
+            )
+        else:
+            file = open(path, 'w', encoding='utf-8', newline='')
+        with file:
+            writer = csv.writer(file)
+            writer.writerow(FILE_COLUMNS[table])
+            dumped = 0
+            rows = table.objects.filter(VISIBLE[table]).order_by(
+                'pk'
+            ).values_list(
+                *visible_columns(table)
+            ).iterator(chunk_size=chunk_size)
+            for row in rows:
+                writer.writerow([to_csv(value) for value in row])
+                dumped += 1
+        return dumped, time.perf_counter() - started
+    finally:
+        # Поток пула открыл своё соединение с базой.
+        connection.close()
+
+
+class Command(BaseCommand):
+    help = 'Выгружает данные в CSV-файлы в формате load_data.'
+
+    def add_arguments(self, parser):
+        parser.add_argument('path', help='Каталог для файлов.')
+        parser.add_argument(
+            '--gzip', action='store_true',
+            help='Сжимать файлы (имена вида titles.csv.gz).'
+        )
+        parser.add_argument(
+            '--chunk-size', type=int, default=2000,
+            help='Сколько строк читать из курсора за раз.'
+        )
+        parser.add_argument(
+            '--workers', type=int, default=4,
+            help='Сколько таблиц выгружать одновременно.'
+        )
+
+    def handle(self, *args, **options):
+        if shards():
+            raise CommandError(
+                'dump_data пока работает только без шардирования '
+                '(REVIEW_SHARDS).'
+            )
+        os.makedirs(options['path'], exist_ok=True)
+        suffix = '.gz' if options['gzip'] else ''
+        with ThreadPoolExecutor(max(options['workers'], 1)) as pool:
+            jobs = {
+                pool.submit(
+                    dump_table, table,
+                    os.path.join(options['path'], file_name + suffix),
+                    options['gzip'], options['chunk_size'],
+                ): file_name + suffix
+                for table, file_name in MODEL_FILE.items()
+            }
+            for job, file_name in jobs.items():
+                dumped, elapsed = job.result()
+                self.stdout.write(
+                    f'{file_name}: {dumped} строк за {elapsed:.2f} с '
+                    f'({dumped / elapsed if elapsed else 0:.0f} строк/с)'
+                )
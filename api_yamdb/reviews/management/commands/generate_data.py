@@ -0,0 +1,131 @@
+import csv
+import gzip
+import os
+import time
+
+from django.core.management.base import BaseCommand, CommandError
+from django.db import transaction
+from django.db.models import Max
+
+from reviews.counters import batches
+from reviews.derived import build_derived
+from reviews.generator import Generator
+from reviews.management.commands.dump_data import to_csv
+from reviews.management.commands.load_data import (FILE_COLUMNS,
+                                                   KEYS_CHANGE, MODEL_FILE)
+from reviews.models import Category, Comment, Genre, Review, Title
+from reviews.sharding import shards
+from reviews.upsert import add_comment_titles, upsert
+from users.models import User
+
+SIZE_OPTIONS = (
+    (Category, 'categories', 10),
+    (Genre, 'genres', 20),
+    (User, 'users', 1000),
+    (Title, 'titles', 500),
+    (Review, 'reviews', 10000),
+    (Comment, 'comments', 20000),
+)
+
+
+class Command(BaseCommand):
+    help = ('Генерирует воспроизводимый набор данных: в CSV-файлы формата '
+            'load_data или сразу в базу.')
+
+    def add_arguments(self, parser):
+        for _, name, default in SIZE_OPTIONS:
+            parser.add_argument(f'--{name}', type=int, default=default)
+        parser.add_argument('--seed', type=int, default=0)
+        parser.add_argument(
+            '--zipf', type=float, default=1.1,
+            help='Показатель закона Ципфа для популярности произведений.'
+        )
+        parser.add_argument(
+            '--output',
+            help='Каталог для CSV-файлов; без него данные пишутся в базу.'
+        )
+        parser.add_argument(
+            '--gzip', action='store_true',
+            help='Сжимать CSV-файлы (имена вида titles.csv.gz).'
+        )
+        parser.add_argument(
+            '--batch-size', type=int, default=5000,
+            help='Сколько строк вставлять одним запросом и транзакцией.'
+        )
+
+    def handle(self, *args, **options):
+        sizes = {table: options[name] for table, name, _ in SIZE_OPTIONS}
+        if min(sizes[table] for table in (Category, Genre, User, Title)) < 1:
+            raise CommandError(
+                'Нужны хотя бы одна категория, жанр, пользователь '
+                'и произведение.'
+            )
+        if options['output']:
+            first_ids = dict.fromkeys(MODEL_FILE, 1)
+        elif shards():
+            raise CommandError(
+                'Запись в базу пока работает только без шардирования '
+                '(REVIEW_SHARDS); используйте --output.'
+            )
+        else:
+            # Новые записи получают номера после уже существующих.
+            first_ids = {
+                table: (table.objects.aggregate(last=Max('pk'))['last'] or 0)
+                + 1
+                for table in MODEL_FILE
+            }
+        try:
+            generator = Generator(
+                options['seed'], first_ids, sizes, options['zipf']
+            )
+        except ValueError as error:
+            raise CommandError(error)
+        for table, rows in generator.tables():
+            started = time.perf_counter()
+            if options['output']:
+                written = self.write_csv(table, rows, options)
+            else:
+                written = self.insert(table, rows, options['batch_size'])
+            elapsed = time.perf_counter() - started
+            self.stdout.write(
+                f'{MODEL_FILE[table]}: {written} строк за {elapsed:.2f} с '
+                f'({written / elapsed if elapsed else 0:.0f} строк/с)'
+            )
+        if not options['output']:
+            for step, elapsed in build_derived(options['batch_size']):
+                self.stdout.write(f'{step}: {elapsed:.2f} с')
+
+    def write_csv(self, table, rows, options):
+        os.makedirs(options['output'], exist_ok=True)
+        path = os.path.join(options['output'], MODEL_FILE[table])
+        if options['gzip']:
+            file = gzip.open(path + '.gz', 'wt', encoding='utf-8',
+                             newline='', compresslevel=6)
+        else:
+            file = open(path, 'w', encoding='utf-8', newline='')
+        written = 0
+        with file:
+            writer = csv.writer(file)
+            writer.writerow(FILE_COLUMNS[table])
+            for row in rows:
+                writer.writerow(
+                    [to_csv(row[column]) for column in FILE_COLUMNS[table]]
+                )
+                written += 1
+        return written
+
+    def insert(self, table, rows, batch_size):
+        """Вставляет строки пачками. upsert, в отличие от bulk_create,
+        сохраняет сгенерированные даты публикации."""
+        written = 0
+        for batch in batches(rows, batch_size):
+            if table in KEYS_CHANGE:
+                key, new_key = KEYS_CHANGE[table]
+                for row in batch:
+                    row[new_key] = row.pop(key)
+            if table is Comment:
+                add_comment_titles(batch)
+            with transaction.atomic():
+                upsert(table, batch)
+            written += len(batch)
+        return written
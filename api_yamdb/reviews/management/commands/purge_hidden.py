@@ -0,0 +1,32 @@
+import time
+
+from django.core.management.base import BaseCommand
+
+from reviews.purge import purge_hidden
+
+
+class Command(BaseCommand):
+    help = ('Удаляет скрытые произведения, пользователей, категории и жанры '
+            'вместе с зависимыми записями небольшими порциями.')
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--batch-size', type=int, default=500,
+            help='Сколько записей удалять в одной транзакции.'
+        )
+        parser.add_argument(
+            '--interval', type=float, default=0,
+            help='Повторять каждые N секунд вместо однократного запуска.'
+        )
+
+    def handle(self, *args, **options):
+        while True:
+            purged = purge_hidden(options['batch_size'])
+            for model, count in purged.items():
+                if count:
+                    self.stdout.write(
+                        f'{model._meta.verbose_name_plural}: удалено {count}'
+                    )
+            if not options['interval']:
+                return
+            time.sleep(options['interval'])
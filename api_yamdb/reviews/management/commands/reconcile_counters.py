@@ -0,0 +1,77 @@
+from functools import partial
+
+from django.core.management.base import BaseCommand
+from django.db import transaction
+
+from reviews.counters import (COUNTERS, iter_pk_chunks, recount, stale_pks,
+                              title_stats)
+from reviews.models import Title
+from reviews.sharding import fan_out, shards
+
+
+class Command(BaseCommand):
+    help = 'Сверяет и исправляет счётчики отзывов и комментариев.'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--chunk-size', type=int, default=1000,
+            help='Сколько записей сверять за один запрос.'
+        )
+        parser.add_argument(
+            '--dry-run', action='store_true',
+            help='Только показать расхождения, ничего не исправляя.'
+        )
+
+    def handle(self, *args, **options):
+        self.chunk_size = options['chunk_size']
+        self.dry_run = options['dry_run']
+        for model, field, child, fk_name in COUNTERS:
+            if model is Title and shards():
+                results = [self.reconcile_sharded_titles()]
+            else:
+                # Каждая база с отзывами сверяется в своём потоке.
+                results = fan_out(
+                    partial(self.reconcile, model, field, child, fk_name)
+                )
+            checked = sum(result[0] for result in results)
+            fixed = sum(result[1] for result in results)
+            self.stdout.write(
+                f'{model._meta.label}.{field}: проверено {checked}, '
+                f'расхождений {fixed}'
+                + (' (не исправлены)' if self.dry_run and fixed else '')
+            )
+
+    def reconcile(self, model, field, child, fk_name, using):
+        checked = fixed = 0
+        for chunk in iter_pk_chunks(
+            model, self.chunk_size, model.objects.using(using)
+        ):
+            checked += len(chunk)
+            with transaction.atomic(using=using):
+                stale = stale_pks(model, field, child, fk_name, chunk, using)
+                if stale and not self.dry_run:
+                    recount(model, field, child, fk_name, stale, using)
+            fixed += len(stale)
+        return checked, fixed
+
+    def reconcile_sharded_titles(self):
+        """Счётчики и рейтинги произведений по итогам из всех шардов."""
+        stats = {}
+        for part in fan_out(partial(title_stats, None)):
+            stats.update(part)
+        checked = fixed = 0
+        for chunk in iter_pk_chunks(Title, self.chunk_size):
+            checked += len(chunk)
+            stale = []
+            for pk, count, rating in Title.objects.filter(
+                pk__in=chunk
+            ).values_list('pk', 'review_count', 'rating'):
+                actual = stats.get(pk, (0, None))
+                if (count, rating) != actual:
+                    stale.append(Title(
+                        pk=pk, review_count=actual[0], rating=actual[1]
+                    ))
+            if stale and not self.dry_run:
+                Title.objects.bulk_update(stale, ('review_count', 'rating'))
+            fixed += len(stale)
+        return checked, fixed
@@ -0,0 +1,41 @@
+# Generated by Django 3.2 on 2026-10-19 10:01
+
+from django.db import migrations, models
+from django.db.models import Count, OuterRef, Subquery
+from django.db.models.functions import Coalesce
+
+
+def fill_counters(apps, schema_editor):
+    Title = apps.get_model('reviews', 'Title')
+    Review = apps.get_model('reviews', 'Review')
+    Comment = apps.get_model('reviews', 'Comment')
+    for model, field, child, fk_name in (
+        (Title, 'review_count', Review, 'title'),
+        (Review, 'comment_count', Comment, 'review'),
+    ):
+        model.objects.update(**{field: Coalesce(Subquery(
+            child.objects.filter(**{fk_name: OuterRef('pk')})
+            .order_by().values(fk_name)
+            .annotate(total=Count('pk')).values('total')
+        ), 0)})
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('reviews', '0008_alter_review_score'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='review',
+            name='comment_count',
+            field=models.PositiveIntegerField(default=0, editable=False, verbose_name='Количество комментариев'),
+        ),
+        migrations.AddField(
+            model_name='title',
+            name='review_count',
+            field=models.PositiveIntegerField(default=0, editable=False, verbose_name='Количество отзывов'),
+        ),
+        migrations.RunPython(fill_counters, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,64 @@
+# Generated by Django 3.2 on 2026-10-19 10:03
+
+from django.db import migrations, models
+from django.db.models import F
+import django.db.models.deletion
+
+
+def fill_updated_at(apps, schema_editor):
+    for model_name in ('Review', 'Comment'):
+        apps.get_model('reviews', model_name).objects.update(
+            updated_at=F('pub_date')
+        )
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('reviews', '0009_counters'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='Tombstone',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('kind', models.CharField(choices=[('review', 'Отзыв'), ('comment', 'Комментарий')], max_length=16, verbose_name='Тип записи')),
+                ('object_id', models.PositiveBigIntegerField(verbose_name='Идентификатор записи')),
+                ('deleted_at', models.DateTimeField(auto_now_add=True, verbose_name='Дата удаления')),
+            ],
+            options={
+                'verbose_name': 'Удалённая запись',
+                'verbose_name_plural': 'Удалённые записи',
+                'ordering': ['deleted_at'],
+            },
+        ),
+        migrations.AddField(
+            model_name='comment',
+            name='updated_at',
+            field=models.DateTimeField(auto_now=True, verbose_name='Дата изменения'),
+        ),
+        migrations.AddField(
+            model_name='review',
+            name='updated_at',
+            field=models.DateTimeField(auto_now=True, verbose_name='Дата изменения'),
+        ),
+        migrations.RunPython(fill_updated_at, migrations.RunPython.noop),
+        migrations.AddIndex(
+            model_name='comment',
+            index=models.Index(fields=['review', 'updated_at'], name='reviews_com_review__50ba15_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='review',
+            index=models.Index(fields=['title', 'updated_at'], name='reviews_rev_title_i_7bf4c4_idx'),
+        ),
+        migrations.AddField(
+            model_name='tombstone',
+            name='title',
+            field=models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='tombstones', to='reviews.title', verbose_name='Произведение'),
+        ),
+        migrations.AddIndex(
+            model_name='tombstone',
+            index=models.Index(fields=['title', 'deleted_at'], name='reviews_tom_title_i_1774f0_idx'),
+        ),
+    ]
@@ -0,0 +1,28 @@
+# Generated by Django 3.2 on 2026-10-19 10:04
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('reviews', '0010_changes_feed'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='category',
+            name='is_hidden',
+            field=models.BooleanField(db_index=True, default=False, verbose_name='Ожидает удаления'),
+        ),
+        migrations.AddField(
+            model_name='genre',
+            name='is_hidden',
+            field=models.BooleanField(db_index=True, default=False, verbose_name='Ожидает удаления'),
+        ),
+        migrations.AddField(
+            model_name='title',
+            name='is_hidden',
+            field=models.BooleanField(db_index=True, default=False, verbose_name='Ожидает удаления'),
+        ),
+    ]
@@ -0,0 +1,43 @@
+# Generated by Django 3.2 on 2026-10-19 10:24
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('reviews', '0012_moderation_hidden'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='ImportedFile',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('table', models.CharField(max_length=100, unique=True, verbose_name='Таблица')),
+                ('checksum', models.CharField(max_length=64, verbose_name='SHA-256 файла')),
+                ('imported_at', models.DateTimeField(auto_now=True, verbose_name='Дата загрузки')),
+            ],
+            options={
+                'verbose_name': 'Загруженный файл',
+                'verbose_name_plural': 'Загруженные файлы',
+            },
+        ),
+        migrations.CreateModel(
+            name='ImportedRow',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('table', models.CharField(max_length=100, verbose_name='Таблица')),
+                ('object_id', models.PositiveBigIntegerField(verbose_name='Идентификатор записи')),
+                ('row_hash', models.CharField(max_length=40, verbose_name='Хеш строки')),
+            ],
+            options={
+                'verbose_name': 'Загруженная строка',
+                'verbose_name_plural': 'Загруженные строки',
+            },
+        ),
+        migrations.AddConstraint(
+            model_name='importedrow',
+            constraint=models.UniqueConstraint(fields=('table', 'object_id'), name='unique_imported_row'),
+        ),
+    ]
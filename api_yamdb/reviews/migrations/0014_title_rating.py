@@ -0,0 +1,30 @@
+# Generated by Django 3.2 on 2026-10-19 10:34
+
+from django.db import migrations, models
+from django.db.models import Avg, OuterRef, Subquery
+
+
+def fill_rating(apps, schema_editor):
+    Title = apps.get_model('reviews', 'Title')
+    Review = apps.get_model('reviews', 'Review')
+    Title.objects.update(rating=Subquery(
+        Review.objects.filter(title=OuterRef('pk'), is_hidden=False)
+        .order_by().values('title')
+        .annotate(average=Avg('score')).values('average')
+    ))
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('reviews', '0013_import_state'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='title',
+            name='rating',
+            field=models.FloatField(blank=True, editable=False, null=True, verbose_name='Рейтинг'),
+        ),
+        migrations.RunPython(fill_rating, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,42 @@
+# Generated by Django 3.2 on 2026-10-19 10:47
+
+# Ограничения внешних ключей отзывов, комментариев и отметок удаления
+# зависят от настроек: с шардированием (REVIEW_SHARDS) их нет, потому что
+# в шардах нет таблиц пользователей и произведений, без него — есть.
+# Поэтому REVIEW_SHARDS задаётся до `migrate` любой из баз, в том числе
+# шардов, и после этого не меняется.
+
+from django.conf import settings
+from django.db import migrations, models
+import django.db.models.deletion
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+        ('reviews', '0014_title_rating'),
+    ]
+
+    operations = [
+        migrations.AlterField(
+            model_name='comment',
+            name='author',
+            field=models.ForeignKey(db_constraint=not settings.REVIEW_SHARDS, on_delete=django.db.models.deletion.CASCADE, related_name='comments', to=settings.AUTH_USER_MODEL),
+        ),
+        migrations.AlterField(
+            model_name='review',
+            name='author',
+            field=models.ForeignKey(db_constraint=not settings.REVIEW_SHARDS, on_delete=django.db.models.deletion.CASCADE, related_name='reviews', to=settings.AUTH_USER_MODEL),
+        ),
+        migrations.AlterField(
+            model_name='review',
+            name='title',
+            field=models.ForeignKey(db_constraint=not settings.REVIEW_SHARDS, on_delete=django.db.models.deletion.CASCADE, related_name='reviews', to='reviews.title', verbose_name='Произведение'),
+        ),
+        migrations.AlterField(
+            model_name='tombstone',
+            name='title',
+            field=models.ForeignKey(db_constraint=not settings.REVIEW_SHARDS, on_delete=django.db.models.deletion.CASCADE, related_name='tombstones', to='reviews.title', verbose_name='Произведение'),
+        ),
+    ]
@@ -0,0 +1,45 @@
+# Generated by Django 3.2 on 2026-10-19 11:12
+
+from django.conf import settings
+from django.db import migrations, models
+from django.db.models import OuterRef, Subquery
+import django.db.models.deletion
+
+
+def fill_title(apps, schema_editor):
+    Comment = apps.get_model('reviews', 'Comment')
+    Review = apps.get_model('reviews', 'Review')
+    using = schema_editor.connection.alias
+    Comment.objects.using(using).update(title=Subquery(
+        Review.objects.using(using).filter(pk=OuterRef('review_id'))
+        .values('title_id')[:1]
+    ))
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('reviews', '0016_review_key_constraints'),
+    ]
+
+    operations = [
+        migrations.RemoveIndex(
+            model_name='comment',
+            name='reviews_com_review__50ba15_idx',
+        ),
+        migrations.AddField(
+            model_name='comment',
+            name='title',
+            field=models.ForeignKey(db_constraint=not settings.REVIEW_SHARDS, editable=False, null=True, on_delete=django.db.models.deletion.CASCADE, related_name='comments', to='reviews.title', verbose_name='Произведение'),
+        ),
+        migrations.RunPython(fill_title, migrations.RunPython.noop),
+        migrations.AlterField(
+            model_name='comment',
+            name='title',
+            field=models.ForeignKey(db_constraint=not settings.REVIEW_SHARDS, editable=False, on_delete=django.db.models.deletion.CASCADE, related_name='comments', to='reviews.title', verbose_name='Произведение'),
+        ),
+        migrations.AddIndex(
+            model_name='comment',
+            index=models.Index(fields=['title', 'updated_at'], name='reviews_com_title_i_4195a8_idx'),
+        ),
+    ]
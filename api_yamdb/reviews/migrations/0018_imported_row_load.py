@@ -0,0 +1,18 @@
+# Generated by Django 3.2 on 2026-10-19 11:17
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('reviews', '0017_comment_title'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='importedrow',
+            name='load',
+            field=models.CharField(blank=True, max_length=32, verbose_name='Ключ последней загрузки'),
+        ),
+    ]
@@ -0,0 +1,26 @@
+# Generated by Django 3.2 on 2026-10-19 12:08
+
+from django.db import migrations
+from django.db.models import CharField, Value
+from django.db.models.functions import Cast, Concat
+
+
+def release_hidden(apps, schema_editor):
+    """Освобождает slug категорий и жанров, скрытых до того, как это
+    стало делаться при скрытии (reviews.purge.released)."""
+    hidden = Concat(Cast('pk', CharField()), Value(' (скрыт)'))
+    for name in ('Category', 'Genre'):
+        apps.get_model('reviews', name).objects.using(
+            schema_editor.connection.alias
+        ).filter(is_hidden=True).update(slug=hidden)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('reviews', '0018_imported_row_load'),
+    ]
+
+    operations = [
+        migrations.RunPython(release_hidden, migrations.RunPython.noop),
+    ]
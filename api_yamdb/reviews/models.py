@@ -1,11 +1,22 @@
-from django.db import models
+from django.conf import settings
+from django.db import models, router, transaction
+from django.db.models import Avg, F, OuterRef, Subquery
 from users.models import User
 from django.core.validators import MaxValueValidator, MinValueValidator
 
 
+# С шардированием (reviews.sharding) отзывы лежат в базах без таблиц
+# пользователей и произведений, поэтому ограничения внешних ключей на них
+# создаются в схеме только без шардов.
+REVIEW_KEY_CONSTRAINTS = not getattr(settings, 'REVIEW_SHARDS', [])
+
+
 class Category(models.Model):
     name = models.CharField(max_length=256, verbose_name='Имя')
     slug = models.SlugField(max_length=50, unique=True)
+    is_hidden = models.BooleanField(
+        'Ожидает удаления', default=False, db_index=True
+    )
 
     class Meta:
         verbose_name = 'Категория'
@@ -18,6 +29,9 @@ class Category(models.Model):
 class Genre(models.Model):
     name = models.CharField(max_length=256, verbose_name='Имя')
     slug = models.SlugField(max_length=50, unique=True)
+    is_hidden = models.BooleanField(
+        'Ожидает удаления', default=False, db_index=True
+    )
 
     class Meta:
         verbose_name = 'Жанр'
@@ -43,6 +57,15 @@ class Title(models.Model):
         Genre,
         through='GenreTitle',
     )
+    review_count = models.PositiveIntegerField(
+        'Количество отзывов', default=0, editable=False
+    )
+    rating = models.FloatField(
+        'Рейтинг', null=True, blank=True, editable=False
+    )
+    is_hidden = models.BooleanField(
+        'Ожидает удаления', default=False, db_index=True
+    )
 
     class Meta:
         verbose_name = 'Произведение'
@@ -64,13 +87,15 @@ class Review(models.Model):
     author = models.ForeignKey(
         User,
         on_delete=models.CASCADE,
-        related_name='reviews'
+        related_name='reviews',
+        db_constraint=REVIEW_KEY_CONSTRAINTS
     )
     title = models.ForeignKey(
         Title,
         on_delete=models.CASCADE,
         related_name='reviews',
-        verbose_name='Произведение'
+        verbose_name='Произведение',
+        db_constraint=REVIEW_KEY_CONSTRAINTS
     )
     text = models.TextField()
     score = models.PositiveSmallIntegerField(
@@ -83,37 +108,213 @@ class Review(models.Model):
     pub_date = models.DateTimeField(
         'Дата публикации', auto_now_add=True, db_index=True
     )
+    updated_at = models.DateTimeField('Дата изменения', auto_now=True)
+    is_hidden = models.BooleanField('Скрыт модератором', default=False)
+    comment_count = models.PositiveIntegerField(
+        'Количество комментариев', default=0, editable=False
+    )
 
     class Meta:
         unique_together = ('author', 'title')
         ordering = ['pub_date']
+        indexes = [models.Index(fields=('title', 'updated_at'))]
         verbose_name = 'Отзыв'
         verbose_name_plural = 'Отзывы'
 
     def str(self):
         return f'{self.text[:25]}...'
 
+    def save(self, *args, **kwargs):
+        adding = self._state.adding
+        using = kwargs.get('using') or router.db_for_write(
+            type(self), instance=self
+        )
+        with transaction.atomic(using=using):
+            super().save(*args, **kwargs)
+            counters = {'rating': self.rating_update()}
+            if adding:
+                counters['review_count'] = F('review_count') + 1
+            Title.objects.filter(pk=self.title_id).update(**counters)
+
+    def rating_update(self):
+        """Новый рейтинг произведения: подзапрос, если отзывы лежат в одной
+        базе с произведениями, иначе значение, посчитанное в базе отзыва."""
+        if self._state.db == router.db_for_write(Title):
+            return title_rating()
+        return Review.objects.using(self._state.db).filter(
+            title_id=self.title_id, is_hidden=False
+        ).aggregate(average=Avg('score'))['average']
+
+    def delete(self, *args, **kwargs):
+        using = kwargs.get('using') or router.db_for_write(
+            type(self), instance=self
+        )
+        with transaction.atomic(using=using):
+            if not self.is_hidden:
+                Title.objects.filter(
+                    pk=self.title_id, review_count__gt=0
+                ).update(
+                    review_count=F('review_count') - 1
+                )
+            Tombstone.objects.using(using).bulk_create(
+                [Tombstone(title_id=self.title_id, kind=Tombstone.REVIEW,
+                           object_id=self.pk)]
+                + [
+                    Tombstone(title_id=self.title_id, kind=Tombstone.COMMENT,
+                              object_id=comment_id)
+                    for comment_id in self.comments.values_list(
+                        'pk', flat=True
+                    )
+                ]
+            )
+            deleted = super().delete(*args, **kwargs)
+            Title.objects.filter(pk=self.title_id).update(
+                rating=self.rating_update()
+            )
+            return deleted
+
+
+def title_rating():
+    """Подзапрос со средней оценкой видимых отзывов для OuterRef('pk')."""
+    return Subquery(
+        Review.objects.filter(title=OuterRef('pk'), is_hidden=False)
+        .order_by()
+        .values('title')
+        .annotate(average=Avg('score'))
+        .values('average')
+    )
+
 
 class Comment(models.Model):
     author = models.ForeignKey(
         User,
         on_delete=models.CASCADE,
-        related_name='comments'
+        related_name='comments',
+        db_constraint=REVIEW_KEY_CONSTRAINTS
     )
     review = models.ForeignKey(
         Review,
         on_delete=models.CASCADE,
         related_name='comments'
     )
+    # Копия review.title: лента изменений выбирает комментарии
+    # произведения по индексу, а не по каждому его отзыву.
+    title = models.ForeignKey(
+        Title,
+        on_delete=models.CASCADE,
+        related_name='comments',
+        verbose_name='Произведение',
+        editable=False,
+        db_constraint=REVIEW_KEY_CONSTRAINTS
+    )
     text = models.TextField()
     pub_date = models.DateTimeField(
         'Дата добавления', auto_now_add=True, db_index=True
     )
+    updated_at = models.DateTimeField('Дата изменения', auto_now=True)
+    is_hidden = models.BooleanField('Скрыт модератором', default=False)
 
     class Meta:
         ordering = ['pub_date']
+        indexes = [models.Index(fields=('title', 'updated_at'))]
         verbose_name = 'Комментарий'
         verbose_name_plural = 'Комментарии'
 
     def str(self):
         return f'{self.text[:25]}...'
+
+    def save(self, *args, **kwargs):
+        adding = self._state.adding
+        if self.title_id is None:
+            self.title_id = self.review.title_id
+        using = kwargs.get('using') or router.db_for_write(
+            type(self), instance=self
+        )
+        with transaction.atomic(using=using):
+            super().save(*args, **kwargs)
+            if adding:
+                Review.objects.using(using).filter(pk=self.review_id).update(
+                    comment_count=F('comment_count') + 1
+                )
+
+    def delete(self, *args, **kwargs):
+        using = kwargs.get('using') or router.db_for_write(
+            type(self), instance=self
+        )
+        with transaction.atomic(using=using):
+            if not self.is_hidden:
+                Review.objects.using(using).filter(
+                    pk=self.review_id, comment_count__gt=0
+                ).update(
+                    comment_count=F('comment_count') - 1
+                )
+            Tombstone.objects.using(using).create(
+                title_id=self.title_id, kind=Tombstone.COMMENT,
+                object_id=self.pk
+            )
+            return super().delete(*args, **kwargs)
+
+
+class Tombstone(models.Model):
+    """Отметка об удалении отзыва или комментария для ленты изменений."""
+    REVIEW = 'review'
+    COMMENT = 'comment'
+
+    KINDS = [
+        (REVIEW, 'Отзыв'),
+        (COMMENT, 'Комментарий'),
+    ]
+    title = models.ForeignKey(
+        Title,
+        on_delete=models.CASCADE,
+        related_name='tombstones',
+        verbose_name='Произведение',
+        db_constraint=REVIEW_KEY_CONSTRAINTS
+    )
+    kind = models.CharField('Тип записи', max_length=16, choices=KINDS)
+    object_id = models.PositiveBigIntegerField('Идентификатор записи')
+    deleted_at = models.DateTimeField('Дата удаления', auto_now_add=True)
+
+    class Meta:
+        ordering = ['deleted_at']
+        indexes = [models.Index(fields=('title', 'deleted_at'))]
+        verbose_name = 'Удалённая запись'
+        verbose_name_plural = 'Удалённые записи'
+
+    def __str__(self):
+        return f'{self.kind} {self.object_id}'
+
+
+class ImportedFile(models.Model):
+    """Контрольная сумма файла, загруженного `load_data --upsert`."""
+    table = models.CharField('Таблица', max_length=100, unique=True)
+    checksum = models.CharField('SHA-256 файла', max_length=64)
+    imported_at = models.DateTimeField('Дата загрузки', auto_now=True)
+
+    class Meta:
+        verbose_name = 'Загруженный файл'
+        verbose_name_plural = 'Загруженные файлы'
+
+    def __str__(self):
+        return self.table
+
+
+class ImportedRow(models.Model):
+    """Хеш строки, загруженной `load_data --upsert`."""
+    table = models.CharField('Таблица', max_length=100)
+    object_id = models.PositiveBigIntegerField('Идентификатор записи')
+    row_hash = models.CharField('Хеш строки', max_length=40)
+    load = models.CharField('Ключ последней загрузки', max_length=32,
+                            blank=True)
+
+    class Meta:
+        constraints = [
+            models.UniqueConstraint(
+                fields=('table', 'object_id'), name='unique_imported_row'
+            )
+        ]
+        verbose_name = 'Загруженная строка'
+        verbose_name_plural = 'Загруженные строки'
+
+    def __str__(self):
+        return f'{self.table} {self.object_id}'
@@ -0,0 +1,79 @@
+"""Массовое удаление и скрытие отзывов и комментариев модераторами."""
+from django.db import transaction
+
+from .counters import batches, recount_reviews, recount_titles
+from .models import Comment, Review, Tombstone
+from .purge import bury
+from .sharding import fan_out
+
+CHUNK_SIZE = 500
+
+
+def apply(model, kind, title_by_pk, hide, using):
+    """Удаляет или скрывает записи порциями, оставляя отметки удаления."""
+    for chunk in batches(title_by_pk, CHUNK_SIZE):
+        bury(kind, [(pk, title_by_pk[pk]) for pk in chunk], using)
+        queryset = model.objects.using(using).filter(pk__in=chunk)
+        if hide:
+            queryset.update(is_hidden=True)
+        else:
+            queryset.delete()
+
+
+def moderate(reviews, comments, hide=False):
+    """Удаляет (или скрывает при hide=True) выбранные отзывы и комментарии.
+
+    Изменения применяются порциями по CHUNK_SIZE записей, а счётчики
+    пересчитываются один раз для каждого затронутого произведения
+    и отзыва. С шардированием выборки применяются к каждому шарду
+    параллельно. Возвращает число обработанных отзывов и комментариев.
+    """
+    if hide:
+        reviews = reviews.filter(is_hidden=False)
+        comments = comments.filter(is_hidden=False)
+    results = fan_out(
+        lambda using: moderate_in(
+            reviews.using(using), comments.using(using), hide, using
+        )
+    )
+    return (
+        sum(result[0] for result in results),
+        sum(result[1] for result in results),
+    )
+
+
+def moderate_in(reviews, comments, hide, using):
+    with transaction.atomic(using=using):
+        review_rows = dict(reviews.values_list('pk', 'title_id'))
+        comment_rows = {
+            pk: (review_id, title_id)
+            for pk, review_id, title_id in comments.values_list(
+                'pk', 'review_id', 'title_id'
+            )
+        }
+        if not hide:
+            for chunk in batches(review_rows, CHUNK_SIZE):
+                comment_rows.update(
+                    (pk, (review_id, title_id))
+                    for pk, review_id, title_id in Comment.objects.using(
+                        using
+                    ).filter(review_id__in=chunk).values_list(
+                        'pk', 'review_id', 'title_id'
+                    )
+                )
+
+        apply(Comment, Tombstone.COMMENT, {
+            pk: title_id for pk, (_, title_id) in comment_rows.items()
+        }, hide, using)
+        apply(Review, Tombstone.REVIEW, review_rows, hide, using)
+
+        touched_reviews = {
+            review_id for review_id, _ in comment_rows.values()
+        }
+        if not hide:
+            touched_reviews -= set(review_rows)
+        for chunk in batches(touched_reviews, CHUNK_SIZE):
+            recount_reviews(chunk, using)
+        for chunk in batches(set(review_rows.values()), CHUNK_SIZE):
+            recount_titles(chunk, using)
+    return len(review_rows), len(comment_rows)
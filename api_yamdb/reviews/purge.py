@@ -0,0 +1,161 @@
+"""Фоновое удаление скрытых сущностей небольшими порциями.
+
+Представления только помечают произведение, пользователя, категорию или
+жанр как скрытые (`is_hidden`), а зависимые записи удаляет команда
+`purge_hidden`. Уникальные значения скрытой записи (slug, имя и почта
+пользователя) освобождаются сразу при скрытии (`released`). Каждая
+порция выполняется в отдельной короткой транзакции, поэтому запись
+в SQLite не блокируется надолго. Отзывы
+и комментарии удаляются в той базе, из которой их выбрали, — с
+шардированием в шарде произведения.
+"""
+from django.db import transaction
+from django.db.models import CharField, Value
+from django.db.models.functions import Cast, Concat
+
+from users.models import User
+
+from .counters import recount_reviews, recount_titles
+from .models import Category, Comment, Genre, GenreTitle, Review, Title
+from .models import Tombstone
+from .sharding import review_databases
+
+
+# Пробел и скобки не проходят валидаторы slug, имени пользователя
+# и почты, поэтому «<pk> (скрыт)» не совпадёт ни с одной живой записью.
+HIDDEN_SUFFIX = ' (скрыт)'
+
+
+def released(*fields):
+    """Значения для update(), которые при скрытии записи заменяют её
+    уникальные поля на «<pk> (скрыт)»."""
+    return {
+        field: Concat(Cast('pk', CharField()), Value(HIDDEN_SUFFIX))
+        for field in fields
+    }
+
+
+def take(queryset, batch_size):
+    """Первичные ключи очередной порции записей."""
+    return list(
+        queryset.order_by('pk').values_list('pk', flat=True)[:batch_size]
+    )
+
+
+def bury(kind, rows, using=None):
+    """Записывает отметки об удалении для ленты изменений."""
+    Tombstone.objects.using(using).bulk_create(
+        Tombstone(kind=kind, object_id=object_id, title_id=title_id)
+        for object_id, title_id in rows
+    )
+
+
+def delete_in_batches(queryset, batch_size):
+    """Удаляет записи выборки порциями, каждую в своей транзакции."""
+    using = queryset.db
+    deleted = 0
+    while True:
+        with transaction.atomic(using=using):
+            pks = take(queryset, batch_size)
+            if not pks:
+                return deleted
+            queryset.model.objects.using(using).filter(pk__in=pks).delete()
+        deleted += len(pks)
+
+
+def delete_comments(queryset, batch_size, tombstones=True):
+    """Удаляет комментарии порциями и пересчитывает счётчики отзывов."""
+    using = queryset.db
+    deleted = 0
+    while True:
+        with transaction.atomic(using=using):
+            rows = list(
+                queryset.order_by('pk')
+                .values_list('pk', 'review_id', 'title_id')
+                [:batch_size]
+            )
+            if not rows:
+                return deleted
+            pks = [pk for pk, _, _ in rows]
+            if tombstones:
+                bury(Tombstone.COMMENT, [(pk, title) for pk, _, title in rows],
+                     using)
+            Comment.objects.using(using).filter(pk__in=pks).delete()
+            recount_reviews({review for _, review, _ in rows}, using)
+        deleted += len(rows)
+
+
+def delete_reviews(queryset, batch_size, tombstones=True):
+    """Удаляет отзывы вместе с комментариями к ним порциями
+    и пересчитывает счётчики произведений."""
+    using = queryset.db
+    deleted = 0
+    while True:
+        rows = list(
+            queryset.order_by('pk').values_list('pk', 'title_id')[:batch_size]
+        )
+        if not rows:
+            return deleted
+        pks = [pk for pk, _ in rows]
+        delete_comments(
+            Comment.objects.using(using).filter(review_id__in=pks),
+            batch_size, tombstones
+        )
+        with transaction.atomic(using=using):
+            if tombstones:
+                bury(Tombstone.REVIEW, rows, using)
+            Review.objects.using(using).filter(pk__in=pks).delete()
+            recount_titles({title for _, title in rows}, using)
+        deleted += len(rows)
+
+
+def purge_title(title, batch_size):
+    delete_reviews(title.reviews.all(), batch_size, tombstones=False)
+    delete_in_batches(GenreTitle.objects.filter(title=title), batch_size)
+    delete_in_batches(title.tombstones.all(), batch_size)
+    title.delete()
+
+
+def purge_user(user, batch_size):
+    for using in review_databases():
+        delete_comments(
+            Comment.objects.using(using).filter(author=user), batch_size
+        )
+        delete_reviews(
+            Review.objects.using(using).filter(author=user), batch_size
+        )
+    user.delete()
+
+
+def purge_category(category, batch_size):
+    while True:
+        with transaction.atomic():
+            pks = take(category.titles.all(), batch_size)
+            if not pks:
+                break
+            Title.objects.filter(pk__in=pks).update(category=None)
+    category.delete()
+
+
+def purge_genre(genre, batch_size):
+    delete_in_batches(GenreTitle.objects.filter(genre=genre), batch_size)
+    genre.delete()
+
+
+PURGERS = (
+    (Title, purge_title),
+    (User, purge_user),
+    (Category, purge_category),
+    (Genre, purge_genre),
+)
+
+
+def purge_hidden(batch_size=500):
+    """Удаляет все скрытые сущности; возвращает число удалённых по моделям."""
+    purged = {}
+    for model, purge in PURGERS:
+        purged[model] = 0
+        for obj in list(model.objects.filter(is_hidden=True)):
+            purge(obj, batch_size)
+            purged[model] += 1
+    return purged
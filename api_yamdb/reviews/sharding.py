@@ -0,0 +1,159 @@
+"""Шардирование отзывов и комментариев по произведениям.
+
+Если в REVIEW_SHARDS перечислены базы, отзывы, комментарии и отметки
+удаления одного произведения хранятся в одной из них — её выбирает
+стабильный хеш id произведения. Произведения, пользователи и остальные
+таблицы остаются в default. По умолчанию список пуст и всё лежит в одной
+базе.
+
+`ShardRouter` находит шард по объекту, с которым связан запрос:
+произведению, отзыву или комментарию. Запросы без такого объекта
+направляются явно: `.using(shard_for_title(title_id))` или по всем
+шардам через `fan_out`. Соединить таблицы из разных баз нельзя, поэтому
+авторы и произведения отзывов из шарда подгружаются отдельными запросами
+(`load_related`).
+
+Идентификаторы отзывов, комментариев и отметок удаления уникальны во
+всех шардах: шард с номером n выдаёт их из диапазона, начинающегося
+с n * SHARD_ID_SPAN (`reserve_id_range` после миграции шарда). Поэтому
+запрос по id, разосланный во все шарды, находит не больше одной записи.
+"""
+import zlib
+from concurrent.futures import ThreadPoolExecutor
+
+from django.conf import settings
+from django.db import DEFAULT_DB_ALIAS, connections
+
+from users.models import User
+
+from .models import Comment, Review, Title, Tombstone
+
+SHARDED_MODELS = ('review', 'comment', 'tombstone')
+# Размер диапазона идентификаторов одного шарда.
+SHARD_ID_SPAN = 2 ** 40
+
+
+def shards():
+    return getattr(settings, 'REVIEW_SHARDS', [])
+
+
+def is_sharded(model):
+    return bool(shards()) and model._meta.app_label == 'reviews' and (
+        model._meta.model_name in SHARDED_MODELS
+    )
+
+
+def shard_for_title(title_id):
+    """База с отзывами произведения; None без шардирования, то есть
+    выбор базы остаётся за маршрутизаторами."""
+    aliases = shards()
+    if not aliases:
+        return None
+    key = zlib.crc32(str(int(title_id)).encode())
+    return aliases[key % len(aliases)]
+
+
+def review_databases():
+    """Все базы, в которых лежат отзывы."""
+    return shards() or [DEFAULT_DB_ALIAS]
+
+
+def reserve_id_range(using):
+    """Сдвигает автоинкремент таблиц шарда в его диапазон
+    идентификаторов; для других баз ничего не делает."""
+    if using not in shards():
+        return
+    start = shards().index(using) * SHARD_ID_SPAN
+    with connections[using].cursor() as cursor:
+        for model in (Review, Comment, Tombstone):
+            table = model._meta.db_table
+            cursor.execute(
+                'UPDATE sqlite_sequence SET seq = %s '
+                'WHERE name = %s AND seq < %s',
+                [start, table, start]
+            )
+            cursor.execute(
+                'INSERT INTO sqlite_sequence (name, seq) SELECT %s, %s '
+                'WHERE NOT EXISTS '
+                '(SELECT 1 FROM sqlite_sequence WHERE name = %s)',
+                [table, start, table]
+            )
+
+
+def fan_out(function, workers=None):
+    """Вызывает function(база) для каждой базы с отзывами в пуле потоков
+    и возвращает результаты в порядке баз."""
+    databases = review_databases()
+    if len(databases) == 1:
+        return [function(databases[0])]
+
+    def run(using):
+        try:
+            return function(using)
+        finally:
+            connections.close_all()
+
+    with ThreadPoolExecutor(workers or len(databases)) as pool:
+        return list(pool.map(run, databases))
+
+
+def load_related(queryset, *fields):
+    """select_related для выборки из default, а для выборки из шарда —
+    prefetch_related: связанные записи подгружаются из своей базы."""
+    if queryset.db in shards():
+        return queryset.prefetch_related(*fields)
+    return queryset.select_related(*fields)
+
+
+def exclude_hidden_authors(queryset):
+    """Убирает записи скрытых пользователей."""
+    if queryset.db in shards():
+        hidden = User.objects.filter(is_hidden=True).values_list(
+            'pk', flat=True
+        )
+        return queryset.exclude(author_id__in=list(hidden))
+    return queryset.filter(author__is_hidden=False)
+
+
+class ShardRouter:
+    """Направляет запросы к отзывам, комментариям и отметкам удаления
+    в шард их произведения."""
+
+    def shard(self, instance):
+        if instance is None:
+            return None
+        if instance._state.db in shards():
+            return instance._state.db
+        if isinstance(instance, Title):
+            return shard_for_title(instance.pk)
+        title_id = getattr(instance, 'title_id', None)
+        if title_id is not None:
+            return shard_for_title(title_id)
+        if isinstance(instance, Comment) and Comment.review.is_cached(
+            instance
+        ):
+            return self.shard(instance.review)
+        return None
+
+    def db_for_read(self, model, **hints):
+        if not shards():
+            return None
+        instance = hints.get('instance')
+        if is_sharded(model):
+            return self.shard(instance)
+        if instance is not None and instance._state.db in shards():
+            # Автор или произведение отзыва из шарда лежат в default.
+            return DEFAULT_DB_ALIAS
+        return None
+
+    db_for_write = db_for_read
+
+    def allow_relation(self, obj1, obj2, **hints):
+        if {obj1._state.db, obj2._state.db} <= {DEFAULT_DB_ALIAS, *shards()}:
+            return True
+        return None
+
+    def allow_migrate(self, db, app_label, model_name=None, **hints):
+        if db not in shards():
+            return None
+        return app_label == 'reviews' and model_name in SHARDED_MODELS
@@ -0,0 +1,168 @@
+"""Источники CSV-файлов для load_data.
+
+Источник — каталог, архив `.zip` или `.tar(.gz)` либо поток архива tar
+на стандартном вводе (`-`). В каталоге файл таблицы может быть сжат:
+`titles.csv.gz` или `titles.csv.zst` (нужен пакет zstandard). Сжатые
+файлы и архивы распаковываются потоком, на диск ничего не пишется.
+
+Каждый файл описывается кортежем, который можно передать в процесс пула:
+
+* ('path', путь) — файл в каталоге;
+* ('zip', архив, имя в архиве) — файл в zip;
+* ('tar', архив, имя в архиве) — файл в tar на диске; сжатый архив при
+  открытии файла распаковывается с начала до него;
+* ('bytes', имя, данные) — файл из потока tar на стандартном вводе, уже
+  прочитанный в память: из потока нельзя читать файлы в порядке загрузки
+  таблиц. Поэтому поток не может быть больше STDIN_LIMIT байт, а большие
+  архивы передаются путём к файлу.
+"""
+import codecs
+import gzip
+import hashlib
+import io
+import mmap
+import os
+import sys
+import tarfile
+import zipfile
+from contextlib import contextmanager
+
+from django.core.management.base import CommandError
+
+try:
+    import zstandard
+except ImportError:
+    zstandard = None
+
+COMPRESSED_SUFFIXES = ('', '.gz', '.zst')
+# Несжатые файлы крупнее этого читаются через mmap.
+MMAP_THRESHOLD = 1 << 20
+HASH_CHUNK = 1 << 20
+# Сколько байт файлов таблиц можно прочитать из архива на стандартном вводе.
+STDIN_LIMIT = 1 << 28
+
+
+def find_sources(source, file_names):
+    """Находит файлы таблиц в источнике: {имя файла: описание}."""
+    if source == '-':
+        return read_tar_stream(sys.stdin.buffer, file_names)
+    if os.path.isdir(source):
+        found = {}
+        for name in file_names:
+            for suffix in COMPRESSED_SUFFIXES:
+                path = os.path.join(source, name + suffix)
+                if os.path.isfile(path):
+                    found[name] = ('path', path)
+                    break
+        return found
+    if zipfile.is_zipfile(source):
+        with zipfile.ZipFile(source) as archive:
+            return {
+                os.path.basename(member): ('zip', source, member)
+                for member in archive.namelist()
+                if os.path.basename(member) in file_names
+            }
+    if os.path.isfile(source) and tarfile.is_tarfile(source):
+        found = {}
+        with tarfile.open(source, 'r:*') as archive:
+            for member in archive:
+                name = os.path.basename(member.name)
+                if member.isfile() and name in file_names:
+                    found[name] = ('tar', source, member.name)
+        return found
+    raise CommandError(
+        f'{source}: ожидается каталог, архив .zip или .tar(.gz) либо «-».'
+    )
+
+
+def read_tar_stream(file, file_names):
+    found = {}
+    total = 0
+    with tarfile.open(fileobj=file, mode='r|*') as archive:
+        for member in archive:
+            name = os.path.basename(member.name)
+            if member.isfile() and name in file_names:
+                total += member.size
+                if total > STDIN_LIMIT:
+                    raise CommandError(
+                        'Архив на стандартном вводе больше '
+                        f'{STDIN_LIMIT} байт: передайте путь к файлу.'
+                    )
+                data = archive.extractfile(member).read()
+                found[name] = ('bytes', name, data)
+    return found
+
+
+@contextmanager
+def open_binary(spec):
+    """Открывает файл на чтение байтов, распаковывая его при необходимости."""
+    kind = spec[0]
+    if kind == 'tar':
+        with tarfile.open(spec[1], 'r:*') as archive:
+            with archive.extractfile(spec[2]) as file:
+                yield file
+        return
+    if kind == 'bytes':
+        file = io.BytesIO(spec[2])
+    elif kind == 'zip':
+        file = zipfile.ZipFile(spec[1]).open(spec[2])
+    elif spec[1].endswith('.gz'):
+        file = gzip.open(spec[1], 'rb')
+    elif spec[1].endswith('.zst'):
+        if zstandard is None:
+            raise CommandError(
+                f'{spec[1]}: для файлов .zst установите пакет zstandard.'
+            )
+        file = zstandard.ZstdDecompressor().stream_reader(
+            open(spec[1], 'rb')
+        )
+    else:
+        file = open(spec[1], 'rb')
+    with file:
+        yield file
+
+
+def mmap_lines(path):
+    """Строки файла из mmap с пошаговым декодированием UTF-8."""
+    with open(path, 'rb') as file, mmap.mmap(
+        file.fileno(), 0, access=mmap.ACCESS_READ
+    ) as view:
+        decoder = codecs.getincrementaldecoder('utf-8')()
+        for line in iter(view.readline, b''):
+            yield decoder.decode(line)
+        tail = decoder.decode(b'', final=True)
+        if tail:
+            yield tail
+
+
+@contextmanager
+def open_text(spec):
+    """Строки CSV-файла как текст."""
+    if (spec[0] == 'path' and not spec[1].endswith(('.gz', '.zst'))
+            and os.path.getsize(spec[1]) >= MMAP_THRESHOLD):
+        lines = mmap_lines(spec[1])
+        try:
+            yield lines
+        finally:
+            lines.close()
+        return
+    with open_binary(spec) as binary, io.TextIOWrapper(
+        binary, encoding='utf-8', newline=''
+    ) as file:
+        yield file
+
+
+def checksum(spec):
+    """SHA-256 содержимого файла в том виде, в каком он лежит в источнике."""
+    digest = hashlib.sha256()
+    if spec[0] == 'bytes':
+        digest.update(spec[2])
+        return digest.hexdigest()
+    if spec[0] == 'path':
+        opened = open(spec[1], 'rb')
+    else:
+        opened = open_binary(spec)
+    with opened as file:
+        for chunk in iter(lambda: file.read(HASH_CHUNK), b''):
+            digest.update(chunk)
+    return digest.hexdigest()
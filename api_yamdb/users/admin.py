@@ -1,4 +1,6 @@
 from django.contrib import admin
-from .models import User
+from .models import OutgoingEmail, RevokedToken, User
 
 admin.site.register(User)
+admin.site.register(OutgoingEmail)
+admin.site.register(RevokedToken)
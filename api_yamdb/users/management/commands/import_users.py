@@ -0,0 +1,39 @@
+import sys
+
+from django.core.management.base import BaseCommand
+
+from users.provisioning import import_users_csv
+
+
+class Command(BaseCommand):
+    help = 'Заводит пользователей из CSV-файла порциями.'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            'path',
+            help='CSV с колонками username, email, role, bio, first_name, '
+                 'last_name; «-» — читать из стандартного ввода.'
+        )
+        parser.add_argument(
+            '--batch-size', type=int, default=1000,
+            help='Сколько пользователей создавать одним запросом.'
+        )
+
+    def handle(self, *args, **options):
+        if options['path'] == '-':
+            created, rejected = import_users_csv(
+                sys.stdin, options['batch_size']
+            )
+        else:
+            with open(options['path'], encoding='utf-8', newline='') as file:
+                created, rejected = import_users_csv(
+                    file, options['batch_size']
+                )
+        for line, username, errors in rejected:
+            self.stderr.write(
+                f'Строка {line} ({username}): {"; ".join(errors)}'
+            )
+        self.stdout.write(
+            f'Создано пользователей: {created}, отклонено строк: '
+            f'{len(rejected)}'
+        )
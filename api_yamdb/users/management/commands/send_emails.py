@@ -0,0 +1,33 @@
+import time
+
+from django.core.management.base import BaseCommand
+
+from users.outbox import send_pending
+
+
+class Command(BaseCommand):
+    help = 'Отправляет письма из очереди исходящей почты.'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--batch-size', type=int, default=100,
+            help='Сколько писем отправлять через одно соединение.'
+        )
+        parser.add_argument(
+            '--interval', type=float, default=0,
+            help='Повторять каждые N секунд вместо однократного запуска.'
+        )
+
+    def handle(self, *args, **options):
+        while True:
+            while True:
+                sent, failed = send_pending(options['batch_size'])
+                if sent or failed:
+                    self.stdout.write(
+                        f'Отправлено писем: {sent}, ошибок: {failed}'
+                    )
+                if sent + failed < options['batch_size']:
+                    break
+            if not options['interval']:
+                return
+            time.sleep(options['interval'])
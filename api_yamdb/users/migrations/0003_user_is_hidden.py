@@ -0,0 +1,18 @@
+# Generated by Django 3.2 on 2026-10-19 10:04
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('users', '0002_auto_20230123_1609'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='user',
+            name='is_hidden',
+            field=models.BooleanField(db_index=True, default=False, verbose_name='Ожидает удаления'),
+        ),
+    ]
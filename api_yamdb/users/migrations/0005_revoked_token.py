@@ -0,0 +1,29 @@
+# Generated by Django 3.2 on 2026-10-19 10:19
+
+from django.conf import settings
+from django.db import migrations, models
+import django.db.models.deletion
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('users', '0004_outgoing_email'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='RevokedToken',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('jti', models.CharField(max_length=255, unique=True, verbose_name='Идентификатор токена')),
+                ('expires_at', models.DateTimeField(verbose_name='Истекает')),
+                ('created_at', models.DateTimeField(auto_now_add=True, db_index=True, verbose_name='Дата отзыва')),
+                ('user', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='revoked_tokens', to=settings.AUTH_USER_MODEL, verbose_name='Пользователь')),
+            ],
+            options={
+                'verbose_name': 'Отозванный токен',
+                'verbose_name_plural': 'Отозванные токены',
+            },
+        ),
+    ]
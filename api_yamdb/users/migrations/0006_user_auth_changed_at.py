@@ -0,0 +1,18 @@
+# Generated by Django 3.2 on 2026-10-19 11:09
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('users', '0005_revoked_token'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='user',
+            name='auth_changed_at',
+            field=models.DateTimeField(blank=True, db_index=True, editable=False, null=True, verbose_name='Дата изменения прав'),
+        ),
+    ]
@@ -0,0 +1,18 @@
+# Generated by Django 3.2 on 2026-10-19 11:15
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('users', '0006_user_auth_changed_at'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='outgoingemail',
+            name='lease',
+            field=models.CharField(blank=True, db_index=True, max_length=32, verbose_name='Ключ захвата отправителем'),
+        ),
+    ]
@@ -0,0 +1,26 @@
+# Generated by Django 3.2 on 2026-10-19 12:08
+
+from django.db import migrations
+from django.db.models import CharField, Value
+from django.db.models.functions import Cast, Concat
+
+
+def release_hidden(apps, schema_editor):
+    """Освобождает имя и почту пользователей, скрытых до того, как это
+    стало делаться при скрытии (reviews.purge.released)."""
+    User = apps.get_model('users', 'User')
+    hidden = Concat(Cast('pk', CharField()), Value(' (скрыт)'))
+    User.objects.using(schema_editor.connection.alias).filter(
+        is_hidden=True
+    ).update(username=hidden, email=hidden)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('users', '0007_outgoing_email_lease'),
+    ]
+
+    operations = [
+        migrations.RunPython(release_hidden, migrations.RunPython.noop),
+    ]
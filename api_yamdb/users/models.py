@@ -37,6 +37,18 @@ class User(AbstractUser):
         'Биография',
         blank=True,
     )
+    is_hidden = models.BooleanField(
+        'Ожидает удаления',
+        default=False,
+        db_index=True,
+    )
+    auth_changed_at = models.DateTimeField(
+        'Дата изменения прав',
+        null=True,
+        blank=True,
+        editable=False,
+        db_index=True,
+    )
 
     class Meta:
         ordering = ('username',)
@@ -48,3 +60,57 @@ class User(AbstractUser):
     @property
     def is_moderator(self):
         return self.role == self.MODERATOR
+
+
+class OutgoingEmail(models.Model):
+    """Письмо в очереди на отправку фоновой командой `send_emails`."""
+    user = models.ForeignKey(
+        User,
+        on_delete=models.CASCADE,
+        related_name='outgoing_emails',
+        verbose_name='Пользователь'
+    )
+    recipient = models.EmailField('Получатель')
+    subject = models.CharField('Тема', max_length=255)
+    message = models.TextField('Текст')
+    created_at = models.DateTimeField('Дата постановки', auto_now_add=True)
+    send_after = models.DateTimeField('Отправить не раньше', db_index=True)
+    attempts = models.PositiveSmallIntegerField('Попыток', default=0)
+    sent_at = models.DateTimeField('Дата отправки', null=True, blank=True)
+    last_error = models.TextField('Последняя ошибка', blank=True)
+    lease = models.CharField(
+        'Ключ захвата отправителем', max_length=32, blank=True,
+        db_index=True
+    )
+
+    class Meta:
+        ordering = ('send_after',)
+        indexes = [models.Index(fields=('user', 'created_at'))]
+        verbose_name = 'Исходящее письмо'
+        verbose_name_plural = 'Исходящие письма'
+
+    def __str__(self):
+        return f'{self.recipient}: {self.subject}'
+
+
+class RevokedToken(models.Model):
+    """Отозванный до истечения срока токен доступа."""
+    jti = models.CharField('Идентификатор токена', max_length=255,
+                           unique=True)
+    user = models.ForeignKey(
+        User,
+        on_delete=models.CASCADE,
+        related_name='revoked_tokens',
+        verbose_name='Пользователь'
+    )
+    expires_at = models.DateTimeField('Истекает')
+    created_at = models.DateTimeField(
+        'Дата отзыва', auto_now_add=True, db_index=True
+    )
+
+    class Meta:
+        verbose_name = 'Отозванный токен'
+        verbose_name_plural = 'Отозванные токены'
+
+    def __str__(self):
+        return self.jti
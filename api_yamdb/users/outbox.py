@@ -0,0 +1,122 @@
+"""Очередь исходящих писем.
+
+Представления только ставят письмо в очередь, а отправляет его команда
+`send_emails` пачками через одно SMTP-соединение, с повторами и
+нарастающей паузой между попытками. Отправитель сначала захватывает пачку
+одним UPDATE, поэтому параллельные отправители не шлют одно письмо
+дважды, а результат каждого письма сохраняется сразу после отправки.
+"""
+import uuid
+from datetime import timedelta
+
+from django.conf import settings
+from django.core.mail import EmailMessage, get_connection
+from django.db import transaction
+from django.utils import timezone
+
+from .models import OutgoingEmail
+
+
+def enqueue_mail(user, subject, message, coalesce=True):
+    """Ставит письмо пользователю в очередь.
+
+    Повторные письма в пределах OUTBOX_COALESCE_SECONDS склеиваются:
+    неотправленное письмо получает новый текст, а если письмо только что
+    ушло, новое не создаётся. Для только что созданного пользователя
+    склеивать нечего, и проверку можно пропустить (coalesce=False).
+    """
+    now = timezone.now()
+    if not coalesce:
+        return OutgoingEmail.objects.create(
+            user=user, recipient=user.email, subject=subject,
+            message=message, send_after=now,
+        )
+    window = timedelta(seconds=settings.OUTBOX_COALESCE_SECONDS)
+    with transaction.atomic():
+        recent = OutgoingEmail.objects.filter(
+            user=user, subject=subject, created_at__gte=now - window
+        ).order_by('-created_at').first()
+        if recent is None:
+            return OutgoingEmail.objects.create(
+                user=user, recipient=user.email, subject=subject,
+                message=message, send_after=now,
+            )
+        if recent.sent_at is None:
+            recent.recipient = user.email
+            recent.message = message
+            recent.save(update_fields=('recipient', 'message'))
+        return recent
+
+
+def schedule_retry(email, error, now):
+    """Откладывает письмо, удваивая паузу после каждой неудачи."""
+    email.attempts += 1
+    email.last_error = str(error)
+    email.send_after = now + timedelta(
+        seconds=settings.OUTBOX_RETRY_DELAY * 2 ** (email.attempts - 1)
+    )
+
+
+def claim(batch_size, now):
+    """Захватывает пачку писем, срок которых подошёл.
+
+    Письма откладываются на OUTBOX_LEASE_SECONDS и помечаются ключом
+    захвата: другой отправитель их не возьмёт, а если этот упадёт, не
+    отправленные им письма вернутся в очередь после срока захвата.
+    """
+    lease = uuid.uuid4().hex
+    due = OutgoingEmail.objects.filter(
+        sent_at__isnull=True,
+        send_after__lte=now,
+        attempts__lt=settings.OUTBOX_MAX_ATTEMPTS,
+    )
+    due.filter(
+        pk__in=due.order_by('send_after').values('pk')[:batch_size]
+    ).update(
+        send_after=now + timedelta(seconds=settings.OUTBOX_LEASE_SECONDS),
+        lease=lease,
+    )
+    return list(OutgoingEmail.objects.filter(lease=lease))
+
+
+def send_pending(batch_size=100):
+    """Отправляет пачку писем, срок которых подошёл.
+
+    Возвращает число отправленных и число неудачных попыток.
+    """
+    now = timezone.now()
+    emails = claim(batch_size, now)
+    if not emails:
+        return 0, 0
+    fields = ('attempts', 'last_error', 'send_after', 'sent_at')
+    sent = failed = 0
+    connection = get_connection()
+    try:
+        connection.open()
+    except Exception as error:
+        for email in emails:
+            schedule_retry(email, error, now)
+        OutgoingEmail.objects.bulk_update(emails, fields)
+        return 0, len(emails)
+    else:
+        try:
+            for email in emails:
+                try:
+                    EmailMessage(
+                        subject=email.subject,
+                        body=email.message,
+                        from_email=settings.DEFAULT_FROM_EMAIL,
+                        to=[email.recipient],
+                        connection=connection,
+                    ).send()
+                except Exception as error:
+                    schedule_retry(email, error, now)
+                    failed += 1
+                else:
+                    email.attempts += 1
+                    email.sent_at = timezone.now()
+                    sent += 1
+                email.save(update_fields=fields)
+        finally:
+            connection.close()
+    return sent, failed
@@ -0,0 +1,131 @@
+"""Массовое заведение пользователей из CSV.
+
+Строки читаются потоком и проверяются порциями: поля — валидаторами модели
+`User` и `validate_username`, уникальность имени и почты — по множествам,
+куда попадают уже принятые строки файла и найденные в базе значения
+очередной порции. Каждая порция создаётся одним `bulk_create` в своей
+транзакции, поэтому база не блокируется на всё время загрузки. Если имя
+или почту заняли между проверкой и вставкой, порция создаётся заново по
+одной строке, и занятые строки отклоняются.
+"""
+import csv
+
+from django.core.exceptions import ValidationError
+from django.db import IntegrityError, transaction
+
+from .models import User
+from .validators import validate_username
+
+IMPORT_FIELDS = ('username', 'email', 'role', 'bio', 'first_name',
+                 'last_name')
+REQUIRED_FIELDS = ('username', 'email')
+
+
+def clean_row(row):
+    """Проверяет строку; возвращает данные пользователя и список ошибок."""
+    data, errors = {}, []
+    for name in IMPORT_FIELDS:
+        value = (row.get(name) or '').strip()
+        if not value and name not in REQUIRED_FIELDS:
+            continue
+        try:
+            data[name] = User._meta.get_field(name).clean(value, None)
+        except ValidationError as error:
+            errors.extend(f'{name}: {message}' for message in error.messages)
+    if 'username' in data:
+        try:
+            validate_username(data['username'])
+        except ValidationError as error:
+            errors.extend(f'username: {message}' for message in error.messages)
+    return data, errors
+
+
+def existing(batch, name):
+    """Значения поля name из порции, которые уже заняты в базе."""
+    values = {data[name] for _, data in batch}
+    return set(
+        User.objects.filter(**{f'{name}__in': values}).values_list(
+            name, flat=True
+        )
+    )
+
+
+def accepted(batch, seen, rejected):
+    """Строки порции, чьи имя и почта свободны в базе и в файле,
+    и их значения для seen."""
+    taken = {name: existing(batch, name) for name in seen}
+    rows, values = [], {name: set() for name in seen}
+    for line, data in batch:
+        errors = [
+            f'{name}: значение уже занято.' for name in seen
+            if data[name] in taken[name] or data[name] in seen[name]
+            or data[name] in values[name]
+        ]
+        if errors:
+            rejected.append((line, data['username'], errors))
+            continue
+        for name in seen:
+            values[name].add(data[name])
+        rows.append((line, data))
+    return rows, values
+
+
+def create_batch(batch, seen, rejected):
+    """Создаёт пользователей порции, чьи имя и почта ещё свободны."""
+    rows, values = accepted(batch, seen, rejected)
+    try:
+        with transaction.atomic():
+            User.objects.bulk_create(User(**data) for _, data in rows)
+    except IntegrityError:
+        return create_each(rows, seen, rejected)
+    for name in seen:
+        seen[name] |= values[name]
+    return len(rows)
+
+
+@transaction.atomic
+def create_each(rows, seen, rejected):
+    """Создаёт пользователей по одному, каждого в своей точке
+    сохранения; строки, нарушившие уникальность, отклоняются."""
+    created = 0
+    for line, data in rows:
+        try:
+            with transaction.atomic():
+                User.objects.create(**data)
+        except IntegrityError:
+            rejected.append(
+                (line, data['username'], ['Имя или почта уже заняты.'])
+            )
+            continue
+        for name in seen:
+            seen[name].add(data[name])
+        created += 1
+    return created
+
+
+def import_users(rows, batch_size=1000):
+    """Заводит пользователей из строк-словарей (например, csv.DictReader).
+
+    Возвращает число созданных пользователей и список отклонённых строк
+    вида (номер строки, имя, ошибки).
+    """
+    created, rejected = 0, []
+    seen = {'username': set(), 'email': set()}
+    batch = []
+    for line, row in enumerate(rows, start=2):
+        data, errors = clean_row(row)
+        if errors:
+            rejected.append((line, row.get('username'), errors))
+            continue
+        batch.append((line, data))
+        if len(batch) >= batch_size:
+            created += create_batch(batch, seen, rejected)
+            batch = []
+    if batch:
+        created += create_batch(batch, seen, rejected)
+    return created, rejected
+
+
+def import_users_csv(file, batch_size=1000):
+    """Заводит пользователей из открытого текстового CSV-файла."""
+    return import_users(csv.DictReader(file), batch_size)
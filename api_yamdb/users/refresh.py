@@ -0,0 +1,46 @@
+"""Данные в памяти процесса, которые периодически дочитываются из базы."""
+import threading
+import time
+from datetime import timedelta
+
+from django.utils import timezone
+
+# Записи, созданные одновременно с прошлым чтением, могли ещё не
+# закоммититься: дочитываем с небольшим перекрытием.
+REFRESH_OVERLAP = timedelta(seconds=5)
+
+
+class PeriodicRefresh:
+    """Не чаще раза в refresh_interval секунд вызывает load(since, started)
+    для записей, изменённых с прошлого чтения.
+
+    since — начало прошлого чтения с перекрытием или None при первом,
+    started — время начала текущего.
+    """
+
+    def __init__(self, refresh_interval):
+        self.refresh_interval = refresh_interval
+        self._loaded_until = None
+        self._refreshed_at = -float('inf')
+        self._lock = threading.Lock()
+
+    def refresh(self, force=False):
+        now = time.monotonic()
+        if not force and now - self._refreshed_at < self.refresh_interval:
+            return
+        with self._lock:
+            started = timezone.now()
+            self.load(
+                None if self._loaded_until is None
+                else self._loaded_until - REFRESH_OVERLAP,
+                started,
+            )
+            self._loaded_until = started
+            self._refreshed_at = now
+
+    def load(self, since, started):
+        raise NotImplementedError
+
+    def reset(self):
+        self._loaded_until = None
+        self._refreshed_at = -float('inf')
@@ -0,0 +1,86 @@
+"""Отзыв токенов доступа до истечения их срока.
+
+Отозванные токены хранятся в таблице `RevokedToken`, а каждый процесс
+держит в памяти снимок коротких хешей их идентификаторов (`jti`). Снимок
+дочитывает новые записи не чаще раза в REVOCATION_REFRESH_SECONDS, поэтому
+проверка неотозванного токена не обращается к базе. Совпадение по хешу
+только вероятное и подтверждается одним запросом.
+"""
+import hashlib
+import time
+from datetime import datetime, timezone as dt_timezone
+
+from django.conf import settings
+from rest_framework_simplejwt.settings import api_settings
+
+from .models import RevokedToken
+from .refresh import PeriodicRefresh
+
+
+def digest(jti):
+    """Первые 8 байт SHA-256 от идентификатора токена."""
+    return int.from_bytes(hashlib.sha256(jti.encode()).digest()[:8], 'big')
+
+
+class RevocationSnapshot(PeriodicRefresh):
+    """Снимок отозванных токенов в памяти процесса.
+
+    Раз в срок жизни токена снимок собирается заново только из
+    неистёкших записей, чтобы не копить хеши истёкших токенов.
+    """
+
+    def __init__(self, refresh_interval, rebuild_interval):
+        super().__init__(refresh_interval)
+        self.rebuild_interval = rebuild_interval
+        self._digests = set()
+        self._built_at = -float('inf')
+
+    def load(self, since, started):
+        now = time.monotonic()
+        queryset = RevokedToken.objects.filter(expires_at__gt=started)
+        if since is None or now - self._built_at >= self.rebuild_interval:
+            digests = set()
+            self._built_at = now
+        else:
+            digests = self._digests
+            queryset = queryset.filter(created_at__gte=since)
+        digests.update(
+            digest(jti) for jti in queryset.values_list('jti', flat=True)
+        )
+        self._digests = digests
+
+    def add(self, jti):
+        with self._lock:
+            self._digests.add(digest(jti))
+
+    def might_be_revoked(self, jti):
+        self.refresh()
+        return digest(jti) in self._digests
+
+    def clear(self):
+        with self._lock:
+            self._digests = set()
+            self._built_at = -float('inf')
+            self.reset()
+
+
+revoked_tokens = RevocationSnapshot(
+    getattr(settings, 'REVOCATION_REFRESH_SECONDS', 5),
+    api_settings.ACCESS_TOKEN_LIFETIME.total_seconds(),
+)
+
+
+def revoke(jti, user_id, exp):
+    """Отзывает токен с идентификатором jti и временем истечения exp."""
+    RevokedToken.objects.get_or_create(jti=jti, defaults={
+        'user_id': user_id,
+        'expires_at': datetime.fromtimestamp(exp, tz=dt_timezone.utc),
+    })
+    revoked_tokens.add(jti)
+
+
+def is_revoked(jti):
+    """Отозван ли токен: проверка в памяти, база — только при совпадении."""
+    if not revoked_tokens.might_be_revoked(jti):
+        return False
+    return RevokedToken.objects.filter(jti=jti).exists()
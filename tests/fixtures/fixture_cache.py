@@ -0,0 +1,15 @@
+import pytest
+from django.core.cache import cache
+
+
+@pytest.fixture(autouse=True)
+def clear_cache():
+    from api.throttling import get_limiter
+    from users.revocation import revoked_tokens
+
+    cache.clear()
+    revoked_tokens.clear()
+    if hasattr(get_limiter(), 'clear'):
+        get_limiter().clear()
+    yield
+    cache.clear()
@@ -1,6 +1,7 @@
 from http import HTTPStatus
 
 import pytest
+from django.core.management import call_command
 
 from tests.utils import (check_pagination,
                          invalid_data_for_user_patch_and_creation)
@@ -415,6 +416,7 @@ class Test01UserAPI:
             'Проверьте, что DELETE-запрос администратора к '
             '`/api/v1/users/{username}/` возвращает ответ со статусом 204.'
         )
+        call_command('purge_hidden')
         assert django_user_model.objects.count() == (users_cnt - 1), (
             'Проверьте, что DELETE-запрос администратора к '
             '`/api/v1/users/{username}/` удаляет пользователя.'
@@ -456,6 +458,7 @@ class Test01UserAPI:
             'Проверьте, что DELETE-запрос суперпользователя к '
             '`/api/v1/users/{username}/` возвращает ответ со статусом 204.'
         )
+        call_command('purge_hidden')
         assert django_user_model.objects.count() == (users_cnt - 1), (
             'Проверьте, что DELETE-запрос суперпользователя к '
             '`/api/v1/users/{username}/` удаляет пользователя.'
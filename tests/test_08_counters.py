@@ -0,0 +1,104 @@
+from http import HTTPStatus
+
+import pytest
+from django.core.management import call_command
+
+from tests.utils import create_comments
+
+
+@pytest.mark.django_db(transaction=True)
+class Test08CountersAPI:
+
+    def test_01_counters_in_responses(self, admin_client, admin, user_client,
+                                      user, moderator_client, moderator):
+        author_map = {
+            admin: admin_client,
+            user: user_client,
+            moderator: moderator_client
+        }
+        comments, reviews, titles = create_comments(admin_client, author_map)
+        title_url = f'/api/v1/titles/{titles[0]["id"]}/'
+        review_url = f'{title_url}reviews/{reviews[0]["id"]}/'
+
+        response = admin_client.get(title_url)
+        assert response.json().get('review_count') == len(reviews), (
+            'Проверьте, что ответ на GET-запрос к `/api/v1/titles/{title_id}/` '
+            'содержит поле `review_count` с количеством отзывов.'
+        )
+        response = admin_client.get(review_url)
+        assert response.json().get('comment_count') == len(comments), (
+            'Проверьте, что ответ на GET-запрос к '
+            '`/api/v1/titles/{title_id}/reviews/{review_id}/` содержит поле '
+            '`comment_count` с количеством комментариев.'
+        )
+
+        response = admin_client.delete(
+            f'{review_url}comments/{comments[0]["id"]}/'
+        )
+        assert response.status_code == HTTPStatus.NO_CONTENT
+        assert admin_client.get(review_url).json()['comment_count'] == (
+            len(comments) - 1
+        ), 'Проверьте, что удаление комментария уменьшает `comment_count`.'
+
+        response = admin_client.delete(review_url)
+        assert response.status_code == HTTPStatus.NO_CONTENT
+        assert admin_client.get(title_url).json()['review_count'] == (
+            len(reviews) - 1
+        ), 'Проверьте, что удаление отзыва уменьшает `review_count`.'
+
+    def test_02_reconcile_counters(self, admin_client, admin, user_client,
+                                   user):
+        from reviews.models import Review, Title
+
+        author_map = {admin: admin_client, user: user_client}
+        _, reviews, titles = create_comments(admin_client, author_map)
+        Title.objects.update(review_count=0)
+        Review.objects.update(comment_count=100)
+
+        call_command('reconcile_counters', chunk_size=1)
+
+        title = Title.objects.get(pk=titles[0]['id'])
+        assert title.review_count == len(reviews), (
+            'Команда `reconcile_counters` должна исправлять `review_count`.'
+        )
+        review = Review.objects.get(pk=reviews[0]['id'])
+        assert review.comment_count == len(author_map), (
+            'Команда `reconcile_counters` должна исправлять `comment_count`.'
+        )
+        assert Review.objects.get(pk=reviews[1]['id']).comment_count == 0
+
+    def test_03_stored_rating(self, admin_client, admin, user_client, user):
+        from django.db.models import Avg
+
+        from reviews.models import Title
+
+        author_map = {admin: admin_client, user: user_client}
+        _, reviews, titles = create_comments(admin_client, author_map)
+        title_url = f'/api/v1/titles/{titles[0]["id"]}/'
+
+        def expected():
+            return Title.objects.get(pk=titles[0]['id']).reviews.aggregate(
+                rating=Avg('score')
+            )['rating']
+
+        assert admin_client.get(title_url).json()['rating'] == int(
+            expected()
+        )
+        review = next(
+            review for review in reviews
+            if review['author'] == user.username
+        )
+        user_client.patch(
+            f'{title_url}reviews/{review["id"]}/', data={'score': 1}
+        )
+        title = Title.objects.get(pk=titles[0]['id'])
+        assert title.rating == expected(), (
+            'Проверьте, что изменение оценки пересчитывает рейтинг '
+            'произведения.'
+        )
+        admin_client.delete(f'{title_url}reviews/{review["id"]}/')
+        title.refresh_from_db()
+        assert title.rating == expected(), (
+            'Проверьте, что удаление отзыва пересчитывает рейтинг '
+            'произведения.'
+        )
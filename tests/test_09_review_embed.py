@@ -0,0 +1,76 @@
+from http import HTTPStatus
+
+import pytest
+
+from tests.utils import create_comments, create_single_comment
+
+
+@pytest.mark.django_db(transaction=True)
+class Test09ReviewEmbedCommentsAPI:
+
+    def test_01_embed_latest_comments(self, admin_client, admin, user_client,
+                                      user, moderator_client, moderator):
+        author_map = {
+            admin: admin_client,
+            user: user_client,
+            moderator: moderator_client
+        }
+        comments, reviews, titles = create_comments(admin_client, author_map)
+        create_single_comment(
+            user_client, titles[0]['id'], reviews[1]['id'], 'single comment'
+        )
+        url = f'/api/v1/titles/{titles[0]["id"]}/reviews/'
+
+        response = admin_client.get(url, {'embed_comments': 2})
+        assert response.status_code == HTTPStatus.OK, (
+            f'Проверьте, что GET-запрос к `{url}?embed_comments=2` '
+            'возвращает ответ со статусом 200.'
+        )
+        results = {
+            review['id']: review for review in response.json()['results']
+        }
+        latest = results[reviews[0]['id']].get('latest_comments')
+        assert [comment['text'] for comment in latest] == [
+            comments[-2]['text'], comments[-1]['text']
+        ], (
+            f'Проверьте, что GET-запрос к `{url}?embed_comments=N` '
+            'возвращает для каждого отзыва N последних комментариев.'
+        )
+        assert latest[-1]['author'] == comments[-1]['author']
+        assert [
+            comment['text']
+            for comment in results[reviews[1]['id']]['latest_comments']
+        ] == ['single comment']
+        assert results[reviews[2]['id']]['latest_comments'] == []
+
+        response = admin_client.get(url)
+        assert 'latest_comments' not in response.json()['results'][0], (
+            f'Без параметра `embed_comments` ответ на GET-запрос к `{url}` '
+            'не должен содержать комментариев.'
+        )
+
+    def test_02_embed_comments_single_query(self, admin_client, admin,
+                                            user_client, user,
+                                            django_assert_num_queries):
+        author_map = {admin: admin_client, user: user_client}
+        _, _, titles = create_comments(admin_client, author_map)
+        url = f'/api/v1/titles/{titles[0]["id"]}/reviews/'
+
+        # пользователь, произведение, count, страница отзывов
+        # и один запрос комментариев для всей страницы
+        with django_assert_num_queries(5):
+            response = admin_client.get(url, {'embed_comments': 3})
+        assert response.status_code == HTTPStatus.OK
+
+    @pytest.mark.parametrize('value', ('-1', 'abc', '1000'))
+    def test_03_embed_comments_invalid(self, admin_client, value):
+        from reviews.models import Title
+
+        title = Title.objects.create(name='Title', year=2000)
+        response = admin_client.get(
+            f'/api/v1/titles/{title.id}/reviews/', {'embed_comments': value}
+        )
+        assert response.status_code == HTTPStatus.BAD_REQUEST, (
+            'Некорректное значение `embed_comments` должно приводить к '
+            'ответу со статусом 400.'
+        )
@@ -0,0 +1,127 @@
+from http import HTTPStatus
+
+import pytest
+
+from tests.utils import create_comments, create_single_comment
+
+
+@pytest.mark.django_db(transaction=True)
+class Test10ChangesAPI:
+
+    def test_01_changes_feed(self, client, admin_client, admin, user_client,
+                             user):
+        author_map = {admin: admin_client, user: user_client}
+        comments, reviews, titles = create_comments(admin_client, author_map)
+        title_url = f'/api/v1/titles/{titles[0]["id"]}/'
+        url = f'{title_url}changes/'
+
+        response = client.get(url)
+        assert response.status_code == HTTPStatus.OK, (
+            f'Проверьте, что GET-запрос к `{url}` возвращает ответ со '
+            'статусом 200.'
+        )
+        data = response.json()
+        assert {review['id'] for review in data['reviews']} == {
+            review['id'] for review in reviews
+        }, (
+            f'Проверьте, что GET-запрос к `{url}` без отметки `since` '
+            'возвращает все отзывы произведения.'
+        )
+        assert {comment['id'] for comment in data['comments']} == {
+            comment['id'] for comment in comments
+        }
+        assert data['deleted'] == []
+        assert data['has_more'] is False
+        watermark = data['watermark']
+        assert watermark
+
+        data = client.get(url, {'since': watermark}).json()
+        assert data['reviews'] == data['comments'] == data['deleted'] == [], (
+            f'Проверьте, что GET-запрос к `{url}` с последней отметкой '
+            '`since` не возвращает уже полученных изменений.'
+        )
+        assert data['watermark'] == watermark
+
+        review_url = f'{title_url}reviews/{reviews[0]["id"]}/'
+        user_client.patch(
+            f'{title_url}reviews/{reviews[1]["id"]}/', data={'text': 'new'}
+        )
+        new_comment = create_single_comment(
+            user_client, titles[0]['id'], reviews[1]['id'], 'fresh'
+        ).json()
+        admin_client.delete(review_url)
+
+        data = client.get(url, {'since': watermark}).json()
+        assert [review['text'] for review in data['reviews']] == ['new'], (
+            f'Проверьте, что GET-запрос к `{url}` возвращает изменённые '
+            'после отметки `since` отзывы.'
+        )
+        assert [comment['id'] for comment in data['comments']] == [
+            new_comment['id']
+        ]
+        assert data['comments'][0]['review'] == reviews[1]['id']
+        deleted = {(item['type'], item['id']) for item in data['deleted']}
+        assert deleted == {('review', reviews[0]['id'])} | {
+            ('comment', comment['id']) for comment in comments
+        }, (
+            f'Проверьте, что GET-запрос к `{url}` возвращает удалённые после '
+            'отметки `since` отзывы и комментарии к ним.'
+        )
+
+    def test_02_changes_limit(self, client, admin_client, admin,
+                              user_client, user):
+        author_map = {admin: admin_client, user: user_client}
+        _, _, titles = create_comments(admin_client, author_map)
+        url = f'/api/v1/titles/{titles[0]["id"]}/changes/'
+
+        seen = 0
+        data = client.get(url, {'limit': 1}).json()
+        while True:
+            seen += len(data['reviews']) + len(data['comments'])
+            if not data['has_more']:
+                break
+            data = client.get(
+                url, {'limit': 1, 'since': data['watermark']}
+            ).json()
+        assert seen == 4, (
+            f'Проверьте, что постраничный обход `{url}` по отметкам `since` '
+            'возвращает все изменения.'
+        )
+
+    def test_03_changes_same_moment(self, client, admin_client, admin,
+                                    user_client, user):
+        from django.utils import timezone
+
+        from reviews.models import Comment, Review
+
+        author_map = {admin: admin_client, user: user_client}
+        _, _, titles = create_comments(admin_client, author_map)
+        moment = timezone.now()
+        Review.objects.update(updated_at=moment)
+        Comment.objects.update(updated_at=moment)
+        url = f'/api/v1/titles/{titles[0]["id"]}/changes/'
+
+        seen = []
+        data = client.get(url, {'limit': 1}).json()
+        while True:
+            seen += [('review', item['id']) for item in data['reviews']]
+            seen += [('comment', item['id']) for item in data['comments']]
+            if not data['has_more']:
+                break
+            data = client.get(
+                url, {'limit': 1, 'since': data['watermark']}
+            ).json()
+        assert len(seen) == len(set(seen)) == 4, (
+            f'Проверьте, что постраничный обход `{url}` не теряет и не '
+            'повторяет изменения с одинаковым временем.'
+        )
+
+    @pytest.mark.parametrize('params', (
+        {'since': 'not-a-watermark'}, {'limit': 0}, {'limit': 'abc'}
+    ))
+    def test_04_changes_invalid_params(self, client, params):
+        from reviews.models import Title
+
+        title = Title.objects.create(name='Title', year=2000)
+        response = client.get(f'/api/v1/titles/{title.id}/changes/', params)
+        assert response.status_code == HTTPStatus.BAD_REQUEST
@@ -0,0 +1,121 @@
+from http import HTTPStatus
+
+import pytest
+from django.core.management import call_command
+
+from tests.utils import create_comments
+
+
+@pytest.mark.django_db(transaction=True)
+class Test11PurgeHidden:
+
+    def test_01_title_delete_is_deferred(self, client, admin_client, admin,
+                                         user_client, user):
+        from reviews.models import Comment, Review, Title
+
+        author_map = {admin: admin_client, user: user_client}
+        _, _, titles = create_comments(admin_client, author_map)
+        title_id = titles[0]['id']
+
+        response = admin_client.delete(f'/api/v1/titles/{title_id}/')
+        assert response.status_code == HTTPStatus.NO_CONTENT
+        assert Title.objects.filter(pk=title_id, is_hidden=True).exists(), (
+            'DELETE-запрос к `/api/v1/titles/{title_id}/` должен только '
+            'скрывать произведение.'
+        )
+        assert client.get(f'/api/v1/titles/{title_id}/').status_code == (
+            HTTPStatus.NOT_FOUND
+        ), 'Скрытое произведение не должно отдаваться через API.'
+        assert client.get(
+            f'/api/v1/titles/{title_id}/reviews/'
+        ).status_code == HTTPStatus.NOT_FOUND
+
+        call_command('purge_hidden', batch_size=1)
+        assert not Title.objects.filter(pk=title_id).exists(), (
+            'Команда `purge_hidden` должна удалять скрытые произведения.'
+        )
+        assert not Review.objects.filter(title_id=title_id).exists()
+        assert not Comment.objects.exists()
+
+    def test_02_user_delete_recounts(self, client, admin_client, admin,
+                                     user_client, user):
+        from reviews.models import Review, Title, Tombstone
+
+        author_map = {admin: admin_client, user: user_client}
+        comments, reviews, titles = create_comments(admin_client, author_map)
+        title_url = f'/api/v1/titles/{titles[0]["id"]}/'
+
+        response = admin_client.delete(f'/api/v1/users/{user.username}/')
+        assert response.status_code == HTTPStatus.NO_CONTENT
+        user.refresh_from_db()
+        assert user.is_hidden and not user.is_active
+        response = client.get(f'{title_url}reviews/')
+        assert [review['author'] for review in response.json()['results']] == [
+            admin.username
+        ], 'Отзывы скрытого пользователя не должны отдаваться через API.'
+
+        call_command('purge_hidden', batch_size=1)
+        assert not type(user).objects.filter(pk=user.pk).exists()
+        title = Title.objects.get(pk=titles[0]['id'])
+        assert title.review_count == 1, (
+            'После удаления отзывов пользователя `review_count` '
+            'должен быть пересчитан.'
+        )
+        assert Review.objects.get(pk=reviews[0]['id']).comment_count == 1
+        assert set(Tombstone.objects.values_list('kind', 'object_id')) == {
+            ('review', reviews[1]['id']), ('comment', comments[1]['id'])
+        }
+
+    def test_03_category_and_genre_delete(self, client, admin_client):
+        from reviews.models import Category, GenreTitle, Title
+
+        create_comments(admin_client, {})
+        title = Title.objects.get(name='Терминатор')
+        admin_client.delete('/api/v1/categories/films/')
+        admin_client.delete('/api/v1/genres/horror/')
+
+        data = client.get(f'/api/v1/titles/{title.id}/').json()
+        assert data['category'] is None
+        assert [genre['slug'] for genre in data['genre']] == ['comedy']
+        assert [
+            category['slug']
+            for category in client.get('/api/v1/categories/').json()['results']
+        ] == ['books']
+
+        call_command('purge_hidden')
+        title.refresh_from_db()
+        assert title.category is None
+        assert not Category.objects.filter(slug='films').exists()
+        assert not GenreTitle.objects.filter(genre__slug='horror').exists()
+
+    def test_04_hidden_values_released(self, client, admin_client, user):
+        from django.contrib.auth.tokens import default_token_generator
+
+        code = default_token_generator.make_token(user)
+        username, email = user.username, user.email
+        admin_client.delete(f'/api/v1/users/{username}/')
+        response = client.post('/api/v1/auth/token/', {
+            'username': username, 'confirmation_code': code,
+        })
+        assert response.status_code == HTTPStatus.NOT_FOUND, (
+            'Проверьте, что скрытому пользователю не выдаётся токен.'
+        )
+
+        response = client.post('/api/v1/auth/signup/', {
+            'username': username, 'email': email,
+        })
+        assert response.status_code == HTTPStatus.OK, (
+            'Проверьте, что имя и почта скрытого пользователя освобождаются '
+            'сразу, а не после `purge_hidden`.'
+        )
+        new_user = type(user).objects.get(username=username)
+        assert new_user.pk != user.pk and not new_user.is_hidden
+
+        create_comments(admin_client, {})
+        admin_client.delete('/api/v1/categories/films/')
+        response = admin_client.post(
+            '/api/v1/categories/', {'name': 'Фильмы', 'slug': 'films'}
+        )
+        assert response.status_code == HTTPStatus.CREATED, (
+            'Проверьте, что slug скрытой категории можно занять снова.'
+        )
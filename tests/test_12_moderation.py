@@ -0,0 +1,91 @@
+from http import HTTPStatus
+
+import pytest
+
+from tests.utils import create_comments
+
+
+@pytest.mark.django_db(transaction=True)
+class Test12ModerationAPI:
+    url = '/api/v1/moderation/'
+
+    def test_01_moderation_permissions(self, client, user_client):
+        data = {'action': 'delete', 'reviews': [1]}
+        response = client.post(self.url, data=data, format='json')
+        assert response.status_code == HTTPStatus.UNAUTHORIZED, (
+            f'Проверьте, что POST-запрос неавторизованного пользователя к '
+            f'`{self.url}` возвращает ответ со статусом 401.'
+        )
+        response = user_client.post(self.url, data=data, format='json')
+        assert response.status_code == HTTPStatus.FORBIDDEN, (
+            f'Проверьте, что POST-запрос пользователя с ролью `user` к '
+            f'`{self.url}` возвращает ответ со статусом 403.'
+        )
+
+    def test_02_bulk_delete_by_ids(self, admin_client, admin, user_client,
+                                   user, moderator_client, moderator):
+        from reviews.models import Comment, Review, Title
+
+        author_map = {
+            admin: admin_client,
+            user: user_client,
+            moderator: moderator_client
+        }
+        comments, reviews, titles = create_comments(admin_client, author_map)
+        response = moderator_client.post(self.url, data={
+            'action': 'delete',
+            'reviews': [reviews[2]['id']],
+            'comments': [comments[1]['id']],
+        }, format='json')
+        assert response.status_code == HTTPStatus.OK, (
+            f'Проверьте, что POST-запрос модератора к `{self.url}` '
+            'возвращает ответ со статусом 200.'
+        )
+        assert response.json() == {'reviews': 1, 'comments': 1}
+        assert not Review.objects.filter(pk=reviews[2]['id']).exists()
+        assert not Comment.objects.filter(pk=comments[1]['id']).exists()
+        assert Title.objects.get(pk=titles[0]['id']).review_count == 2, (
+            'Массовое удаление должно пересчитывать `review_count`.'
+        )
+        assert Review.objects.get(pk=reviews[0]['id']).comment_count == 2, (
+            'Массовое удаление должно пересчитывать `comment_count`.'
+        )
+
+    def test_03_bulk_hide_by_author(self, client, admin_client, admin,
+                                    user_client, user, moderator_client):
+        author_map = {admin: admin_client, user: user_client}
+        _, reviews, titles = create_comments(admin_client, author_map)
+        title_url = f'/api/v1/titles/{titles[0]["id"]}/'
+        response = moderator_client.post(self.url, data={
+            'action': 'hide', 'author': user.username
+        }, format='json')
+        assert response.status_code == HTTPStatus.OK
+        assert response.json() == {'reviews': 1, 'comments': 1}
+
+        data = client.get(f'{title_url}reviews/').json()
+        assert [review['author'] for review in data['results']] == [
+            admin.username
+        ], 'Скрытые отзывы не должны отдаваться через API.'
+        data = client.get(
+            f'{title_url}reviews/{reviews[0]["id"]}/comments/'
+        ).json()
+        assert [comment['author'] for comment in data['results']] == [
+            admin.username
+        ], 'Скрытые комментарии не должны отдаваться через API.'
+        data = client.get(title_url).json()
+        assert data['review_count'] == 1
+        assert data['rating'] == 5
+
+    def test_04_bulk_moderation_invalid(self, moderator_client):
+        for data in (
+            {'action': 'delete'},
+            {'action': 'purge', 'reviews': [1]},
+            {'action': 'delete', 'reviews': [1],
+             'since': '2020-01-01T00:00:00Z'},
+        ):
+            response = moderator_client.post(self.url, data=data,
+                                              format='json')
+            assert response.status_code == HTTPStatus.BAD_REQUEST, (
+                f'Проверьте, что некорректный POST-запрос к `{self.url}` '
+                'возвращает ответ со статусом 400.'
+            )
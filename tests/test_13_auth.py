@@ -0,0 +1,254 @@
+from http import HTTPStatus
+
+import pytest
+from django.contrib.auth.tokens import default_token_generator
+from django.db import connection
+from django.test.utils import CaptureQueriesContext
+from rest_framework.test import APIClient
+from rest_framework_simplejwt.tokens import AccessToken
+from rest_framework_simplejwt.utils import datetime_from_epoch
+
+
+def get_token_client(user):
+    response = APIClient().post('/api/v1/auth/token/', data={
+        'username': user.username,
+        'confirmation_code': default_token_generator.make_token(user),
+    })
+    assert response.status_code == HTTPStatus.OK
+    client = APIClient()
+    client.credentials(
+        HTTP_AUTHORIZATION=f'Bearer {response.json()["token"]}'
+    )
+    return client
+
+
+@pytest.mark.django_db(transaction=True)
+class Test13StatelessAuth:
+
+    def test_01_no_user_query(self, user):
+        client = get_token_client(user)
+        client.get('/api/v1/titles/')
+        with CaptureQueriesContext(connection) as context:
+            response = client.get('/api/v1/titles/')
+        assert response.status_code == HTTPStatus.OK
+        assert not any(
+            'users_user' in query['sql'] for query in context.captured_queries
+        ), (
+            'Аутентификация по токену из `/api/v1/auth/token/` не должна '
+            'запрашивать пользователя из базы на каждый запрос.'
+        )
+
+    def test_02_role_change_applies(self, admin_client, user):
+        client = get_token_client(user)
+        response = client.post(
+            '/api/v1/moderation/', data={'action': 'hide', 'reviews': [1]},
+            format='json'
+        )
+        assert response.status_code == HTTPStatus.FORBIDDEN
+
+        admin_client.patch(
+            f'/api/v1/users/{user.username}/', data={'role': 'moderator'}
+        )
+        response = client.post(
+            '/api/v1/moderation/', data={'action': 'hide', 'reviews': [1]},
+            format='json'
+        )
+        assert response.status_code == HTTPStatus.OK, (
+            'Смена роли через `/api/v1/users/{username}/` должна сразу '
+            'действовать для уже выданных токенов.'
+        )
+
+    def test_03_deleted_user_rejected(self, admin_client, user):
+        client = get_token_client(user)
+        assert client.get('/api/v1/users/me/').status_code == HTTPStatus.OK
+        admin_client.delete(f'/api/v1/users/{user.username}/')
+        response = client.get('/api/v1/users/me/')
+        assert response.status_code == HTTPStatus.UNAUTHORIZED, (
+            'Токен удалённого пользователя не должен приниматься.'
+        )
+
+    def test_04_lazy_fields(self, user):
+        client = get_token_client(user)
+        response = client.get('/api/v1/users/me/')
+        assert response.json()['email'] == user.email
+
+    def test_05_verified_token_cache(self, user):
+        from api.authentication import verified_tokens
+
+        client = get_token_client(user)
+        verified_tokens.clear()
+        for _ in range(3):
+            assert client.get('/api/v1/users/me/').status_code == (
+                HTTPStatus.OK
+            )
+        assert verified_tokens.stats()['misses'] == 1, (
+            'Подпись одного и того же токена должна проверяться один раз.'
+        )
+        assert verified_tokens.stats()['hits'] == 2
+
+    def test_06_me_patch_single_update(self, user):
+        client = get_token_client(user)
+        client.get('/api/v1/users/me/')
+        with CaptureQueriesContext(connection) as context:
+            response = client.patch(
+                '/api/v1/users/me/', data={'bio': 'new bio', 'role': 'admin'}
+            )
+        assert response.status_code == HTTPStatus.OK
+        assert response.json()['bio'] == 'new bio'
+        assert response.json()['role'] == 'user'
+        updates = [
+            query['sql'] for query in context.captured_queries
+            if query['sql'].startswith('UPDATE')
+        ]
+        assert len(updates) == 1 and '"role"' not in updates[0], (
+            'PATCH-запрос к `/api/v1/users/me/` должен записывать только '
+            'изменённые поля одним запросом.'
+        )
+        user.refresh_from_db()
+        assert (user.bio, user.role) == ('new bio', 'user')
+
+    def test_07_role_change_in_other_process(self, user, monkeypatch):
+        from django.utils import timezone
+
+        from api.authentication import auth_state_changes, get_auth_state
+        from users.models import User
+
+        client = get_token_client(user)
+        assert client.get('/api/v1/users/me/').status_code == HTTPStatus.OK
+        assert get_auth_state(user.pk)['is_active']
+        # Другой процесс меняет только базу: его кэш этому процессу не
+        # виден.
+        User.objects.filter(pk=user.pk).update(
+            is_active=False, auth_changed_at=timezone.now()
+        )
+        monkeypatch.setattr(auth_state_changes, 'refresh_interval', 0)
+        response = client.get('/api/v1/users/me/')
+        assert response.status_code == HTTPStatus.UNAUTHORIZED, (
+            'Проверьте, что блокировка пользователя в другом процессе '
+            'применяется к уже выданным токенам после обновления отметок.'
+        )
+
+    def test_08_role_change_outside_api(self, user):
+        from api.authentication import get_auth_state
+
+        client = get_token_client(user)
+        assert client.get('/api/v1/users/me/').status_code == HTTPStatus.OK
+        assert get_auth_state(user.pk)['is_active']
+        user.refresh_from_db()
+        user.bio = 'Без изменения прав'
+        user.save()
+        user.refresh_from_db()
+        assert user.auth_changed_at is None, (
+            'Проверьте, что сохранение без смены прав не отмечает '
+            '`auth_changed_at`.'
+        )
+        # Как при блокировке в админке: save() без UsersViewSet.
+        user.is_active = False
+        user.save()
+        user.refresh_from_db()
+        assert user.auth_changed_at is not None, (
+            'Проверьте, что любое сохранение пользователя со сменой '
+            'активности отмечает `auth_changed_at`.'
+        )
+        assert client.get('/api/v1/users/me/').status_code == (
+            HTTPStatus.UNAUTHORIZED
+        ), (
+            'Проверьте, что блокировка через save() сразу применяется '
+            'к выданным токенам.'
+        )
+
+
+@pytest.mark.django_db(transaction=True)
+class Test13TokenRevocation:
+    url = '/api/v1/auth/token/revoke/'
+
+    def test_01_revoke_own_token(self, user):
+        client = get_token_client(user)
+        assert client.get('/api/v1/users/me/').status_code == HTTPStatus.OK
+        response = client.post(self.url)
+        assert response.status_code == HTTPStatus.NO_CONTENT, (
+            f'Проверьте, что POST-запрос к `{self.url}` отзывает текущий '
+            'токен и возвращает ответ со статусом 204.'
+        )
+        assert client.get('/api/v1/users/me/').status_code == (
+            HTTPStatus.UNAUTHORIZED
+        ), 'Отозванный токен не должен приниматься.'
+        assert get_token_client(user).get(
+            '/api/v1/users/me/'
+        ).status_code == HTTPStatus.OK
+
+    def test_02_revoke_foreign_token(self, admin_client, user, moderator):
+        client = get_token_client(user)
+        token = client._credentials['HTTP_AUTHORIZATION'].split()[1]
+        moderator_client = get_token_client(moderator)
+        response = moderator_client.post(self.url, {'token': token})
+        assert response.status_code == HTTPStatus.FORBIDDEN
+        response = admin_client.post(self.url, {'token': token})
+        assert response.status_code == HTTPStatus.NO_CONTENT
+        assert client.get('/api/v1/users/me/').status_code == (
+            HTTPStatus.UNAUTHORIZED
+        )
+        response = admin_client.post(self.url, {'token': 'broken'})
+        assert response.status_code == HTTPStatus.BAD_REQUEST
+
+    def test_03_not_revoked_check_in_memory(self, user):
+        client = get_token_client(user)
+        client.get('/api/v1/users/me/')
+        with CaptureQueriesContext(connection) as context:
+            client.get('/api/v1/users/me/')
+        assert not any(
+            'revokedtoken' in query['sql']
+            for query in context.captured_queries
+        ), (
+            'Проверка неотозванного токена не должна обращаться к базе.'
+        )
+
+    def test_04_snapshot_refresh(self, user):
+        from users.models import RevokedToken
+        from users.revocation import revoked_tokens
+
+        client = get_token_client(user)
+        client.get('/api/v1/users/me/')
+        token = AccessToken(
+            client._credentials['HTTP_AUTHORIZATION'].split()[1]
+        )
+        jti = token['jti']
+        # Токен отозван другим процессом: запись есть только в базе.
+        RevokedToken.objects.create(
+            jti=jti, user=user, expires_at=datetime_from_epoch(token['exp'])
+        )
+        assert revoked_tokens.might_be_revoked(jti) is False
+        revoked_tokens.refresh(force=True)
+        assert client.get('/api/v1/users/me/').status_code == (
+            HTTPStatus.UNAUTHORIZED
+        ), (
+            'Проверьте, что снимок отозванных токенов дочитывает новые '
+            'записи из базы.'
+        )
+
+
+class Test13VerifiedTokenCache:
+
+    def test_01_lru_bound_and_expiry(self, monkeypatch):
+        from api.authentication import VerifiedTokenCache
+
+        tokens = VerifiedTokenCache(maxsize=2)
+        now = 1_000_000
+        monkeypatch.setattr('api.authentication.time.time', lambda: now)
+        tokens.set('a', {'exp': now + 10})
+        tokens.set('b', {'exp': now + 10})
+        assert tokens.get('a') == {'exp': now + 10}
+        tokens.set('c', {'exp': now + 1})
+        assert tokens.get('b') is None, (
+            'При переполнении должен вытесняться давно не использованный '
+            'токен.'
+        )
+        assert tokens.get('a') is not None
+
+        now += 5
+        assert tokens.get('c') is None, (
+            'Токен с истёкшим `exp` не должен браться из кэша.'
+        )
+        assert tokens.stats() == {
+            'hits': 2, 'misses': 2, 'size': 1, 'maxsize': 2
+        }
@@ -0,0 +1,132 @@
+import pytest
+from django.core import mail
+from django.core.management import call_command
+
+
+@pytest.mark.django_db(transaction=True)
+class Test14Outbox:
+    url_signup = '/api/v1/auth/signup/'
+
+    def test_01_signup_only_enqueues(self, client):
+        from users.models import OutgoingEmail
+
+        data = {'email': 'queued@yamdb.fake', 'username': 'queued'}
+        client.post(self.url_signup, data=data)
+        assert len(mail.outbox) == 0, (
+            f'POST-запрос к `{self.url_signup}` должен только ставить '
+            'письмо в очередь, а не отправлять его.'
+        )
+        assert OutgoingEmail.objects.filter(
+            recipient=data['email'], sent_at__isnull=True
+        ).count() == 1
+
+        call_command('send_emails')
+        assert [message.to for message in mail.outbox] == [[data['email']]]
+        assert not OutgoingEmail.objects.filter(sent_at__isnull=True).exists()
+
+    def test_02_repeated_signup_coalesced(self, client):
+        from users.models import OutgoingEmail
+
+        data = {'email': 'repeat@yamdb.fake', 'username': 'repeat'}
+        for _ in range(3):
+            client.post(self.url_signup, data=data)
+        assert OutgoingEmail.objects.count() == 1, (
+            'Повторные запросы кода подтверждения в течение короткого '
+            'времени должны склеиваться в одно письмо.'
+        )
+        call_command('send_emails')
+        client.post(self.url_signup, data=data)
+        call_command('send_emails')
+        assert len(mail.outbox) == 1
+
+    def test_03_failed_send_retried_with_backoff(self, client, settings,
+                                                  monkeypatch):
+        from users.models import OutgoingEmail
+
+        data = {'email': 'retry@yamdb.fake', 'username': 'retry'}
+        client.post(self.url_signup, data=data)
+
+        def broken_send(self, *args, **kwargs):
+            raise ConnectionError('SMTP недоступен')
+
+        monkeypatch.setattr(
+            'django.core.mail.EmailMessage.send', broken_send
+        )
+        call_command('send_emails')
+        email = OutgoingEmail.objects.get()
+        assert email.sent_at is None
+        assert email.attempts == 1
+        assert 'SMTP' in email.last_error
+        first_delay = email.send_after - email.created_at
+
+        monkeypatch.undo()
+        call_command('send_emails')
+        assert len(mail.outbox) == 0, (
+            'Письмо после неудачной отправки должно повторяться только '
+            'после паузы.'
+        )
+        assert first_delay.total_seconds() >= settings.OUTBOX_RETRY_DELAY - 1
+
+        OutgoingEmail.objects.update(send_after=email.created_at)
+        call_command('send_emails')
+        assert len(mail.outbox) == 1
+
+    def test_04_signup_query_count(self, client, django_assert_num_queries):
+        data = {'email': 'fast@yamdb.fake', 'username': 'fast'}
+        # поиск по имени или почте, создание пользователя, постановка письма
+        with django_assert_num_queries(3):
+            client.post(self.url_signup, data=data)
+        taken = {'email': 'other@yamdb.fake', 'username': 'fast'}
+        with django_assert_num_queries(1):
+            response = client.post(self.url_signup, data=taken)
+        assert response.status_code == 400
+
+    def test_05_claimed_once_and_saved_per_message(self, user, monkeypatch):
+        from django.core.mail import EmailMessage
+        from django.utils import timezone
+
+        from users.models import OutgoingEmail
+        from users.outbox import claim, enqueue_mail, send_pending
+
+        for number in range(3):
+            enqueue_mail(user, f'Письмо {number}', 'Текст', coalesce=False)
+        now = timezone.now()
+        first = claim(2, now)
+        second = claim(10, now)
+        assert len(first) == 2 and len(second) == 1, (
+            'Проверьте, что параллельные отправители захватывают разные '
+            'письма.'
+        )
+        assert not {email.pk for email in first} & {
+            email.pk for email in second
+        }
+
+        OutgoingEmail.objects.update(send_after=now, lease='')
+
+        class Crash(BaseException):
+            pass
+
+        send = EmailMessage.send
+        calls = []
+
+        def crash_on_second(self, *args, **kwargs):
+            calls.append(self.subject)
+            if len(calls) == 2:
+                raise Crash
+            return send(self, *args, **kwargs)
+
+        monkeypatch.setattr(EmailMessage, 'send', crash_on_second)
+        with pytest.raises(Crash):
+            send_pending()
+        monkeypatch.undo()
+        assert OutgoingEmail.objects.filter(
+            sent_at__isnull=False
+        ).count() == 1, (
+            'Проверьте, что результат каждого письма сохраняется сразу '
+            'после отправки.'
+        )
+        assert send_pending() == (0, 0), (
+            'Проверьте, что письма упавшего отправителя не отправляются '
+            'повторно до конца срока захвата.'
+        )
+        assert len(mail.outbox) == 1
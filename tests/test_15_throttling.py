@@ -0,0 +1,110 @@
+from http import HTTPStatus
+
+import pytest
+
+from tests.utils import create_titles
+
+
+@pytest.mark.django_db(transaction=True)
+class Test15Throttling:
+
+    def test_01_signup_throttled(self, client, settings):
+        settings.REST_FRAMEWORK = {
+            **settings.REST_FRAMEWORK,
+            'DEFAULT_THROTTLE_RATES': {'signup': '2/min'},
+        }
+        data = {'email': 'throttled@yamdb.fake', 'username': 'throttled'}
+        for _ in range(2):
+            response = client.post('/api/v1/auth/signup/', data=data)
+            assert response.status_code == HTTPStatus.OK
+        response = client.post('/api/v1/auth/signup/', data=data)
+        assert response.status_code == HTTPStatus.TOO_MANY_REQUESTS, (
+            'Проверьте, что частые POST-запросы к `/api/v1/auth/signup/` '
+            'ограничиваются и возвращают ответ со статусом 429.'
+        )
+        assert int(response['Retry-After']) >= 1, (
+            'Ответ со статусом 429 должен содержать заголовок `Retry-After`.'
+        )
+
+    def test_02_reviews_throttled_per_user(self, admin_client, user_client,
+                                           moderator_client, settings):
+        titles, _, _ = create_titles(admin_client)
+        settings.REST_FRAMEWORK = {
+            **settings.REST_FRAMEWORK,
+            'DEFAULT_THROTTLE_RATES': {'reviews': '1/min'},
+        }
+        url = f'/api/v1/titles/{titles[0]["id"]}/reviews/'
+        data = {'text': 'text', 'score': 5}
+        assert user_client.post(url, data=data).status_code == (
+            HTTPStatus.CREATED
+        )
+        url_2 = f'/api/v1/titles/{titles[1]["id"]}/reviews/'
+        assert user_client.post(url_2, data=data).status_code == (
+            HTTPStatus.TOO_MANY_REQUESTS
+        )
+        assert moderator_client.post(url, data=data).status_code == (
+            HTTPStatus.CREATED
+        ), 'Лимит на отзывы должен считаться для каждого пользователя.'
+        assert user_client.get(url).status_code == HTTPStatus.OK, (
+            'Лимит на публикацию отзывов не должен ограничивать чтение.'
+        )
+
+    def test_03_forwarded_for_ignored(self, client, settings):
+        settings.REST_FRAMEWORK = {
+            **settings.REST_FRAMEWORK,
+            'DEFAULT_THROTTLE_RATES': {'signup': '1/min'},
+        }
+        data = {'email': 'forwarded@yamdb.fake', 'username': 'forwarded'}
+        client.post('/api/v1/auth/signup/', data=data,
+                    HTTP_X_FORWARDED_FOR='10.0.0.1')
+        response = client.post('/api/v1/auth/signup/', data=data,
+                               HTTP_X_FORWARDED_FOR='10.0.0.2')
+        assert response.status_code == HTTPStatus.TOO_MANY_REQUESTS, (
+            'Проверьте, что лимит по IP-адресу не обходится подменой '
+            'заголовка `X-Forwarded-For`.'
+        )
+
+
+class Test15Limiters:
+
+    @pytest.mark.parametrize('limiter_path', (
+        'api.throttling.InMemoryLimiter', 'api.throttling.CacheLimiter'
+    ))
+    def test_01_sliding_window(self, limiter_path):
+        from django.core.cache import cache
+        from django.utils.module_loading import import_string
+
+        cache.clear()
+        limiter = import_string(limiter_path)()
+        start = 6000.0
+        assert limiter.hit('k', 2, 60, now=start) == (True, None)
+        assert limiter.hit('k', 2, 60, now=start + 1) == (True, None)
+        allowed, wait = limiter.hit('k', 2, 60, now=start + 2)
+        assert not allowed and wait == 88
+        # В следующем окне вес прошлых запросов ещё не снизился.
+        assert not limiter.hit('k', 2, 60, now=start + 61)[0]
+        assert limiter.hit('k', 2, 60, now=start + 90) == (True, None)
+        assert limiter.hit('other', 2, 60, now=start + 2) == (True, None)
+
+    def test_02_memory_limiter_evicts_stale_keys(self):
+        from api.throttling import InMemoryLimiter
+
+        limiter = InMemoryLimiter()
+        limiter.max_keys = 3
+        limiter.hit('old', 1, 1, now=100.0)
+        for key in ('a', 'b'):
+            limiter.hit(key, 1, 60, now=100.0)
+        limiter.hit('c', 1, 60, now=110.0)
+        assert set(limiter._windows) == {'a', 'b', 'c'}, (
+            'Проверьте, что при переполнении сначала удаляются истёкшие '
+            'ключи.'
+        )
+        limiter.hit('a', 1, 60, now=111.0)
+        limiter.hit('d', 1, 60, now=112.0)
+        assert set(limiter._windows) == {'a', 'c', 'd'}, (
+            'Проверьте, что без истёкших ключей удаляется давно не '
+            'обращавшийся клиент, а не произвольная часть ключей.'
+        )
+        assert not limiter.hit('a', 1, 60, now=113.0)[0], (
+            'Лимит активного клиента не должен сбрасываться при очистке.'
+        )
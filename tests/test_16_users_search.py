@@ -0,0 +1,50 @@
+from http import HTTPStatus
+
+import pytest
+from django.db import connection
+from django.test.utils import CaptureQueriesContext
+
+
+@pytest.mark.django_db(transaction=True)
+class Test16UsersPrefixSearch:
+    url = '/api/v1/users/'
+
+    @pytest.fixture
+    def users(self, django_user_model):
+        for username in ('alpha', 'alphabet', 'alpine', 'Alps', 'beta'):
+            django_user_model.objects.create_user(
+                username=username, email=f'{username[::-1]}@yamdb.fake'
+            )
+
+    def test_01_username_prefix(self, admin_client, users):
+        response = admin_client.get(self.url, {'username_prefix': 'alp'})
+        assert response.status_code == HTTPStatus.OK
+        assert [
+            user['username'] for user in response.json()['results']
+        ] == ['alpha', 'alphabet', 'alpine'], (
+            f'Проверьте, что GET-запрос к `{self.url}?username_prefix=` '
+            'возвращает пользователей, чьё имя начинается с префикса, '
+            'в порядке имён.'
+        )
+
+    def test_02_email_prefix(self, admin_client, users):
+        response = admin_client.get(self.url, {'email_prefix': 'ahpla'})
+        assert [
+            user['username'] for user in response.json()['results']
+        ] == ['alpha']
+
+    def test_03_prefix_uses_index_order(self, admin_client, users):
+        with CaptureQueriesContext(connection) as context:
+            admin_client.get(self.url, {'username_prefix': 'alp'})
+        sql = next(
+            query['sql'] for query in context.captured_queries
+            if 'LIMIT' in query['sql'] and 'users_user' in query['sql']
+        )
+        assert 'LIKE' not in sql
+        with connection.cursor() as cursor:
+            cursor.execute(f'EXPLAIN QUERY PLAN {sql}')
+            plan = ' '.join(str(row) for row in cursor.fetchall())
+        assert 'TEMP B-TREE' not in plan, (
+            'Поиск по префиксу имени не должен сортировать результат '
+            f'отдельно от индекса: {plan}'
+        )
@@ -0,0 +1,106 @@
+from http import HTTPStatus
+from io import StringIO
+
+import pytest
+from django.core.files.uploadedfile import SimpleUploadedFile
+from django.core.management import call_command
+
+CSV = (
+    'username,email,role,bio,first_name,last_name\n'
+    'alice,alice@yamdb.fake,moderator,bio,,\n'
+    'bob,bob@yamdb.fake,,,,\n'
+    'me,me@yamdb.fake,,,,\n'
+    'bad name,bad@yamdb.fake,,,,\n'
+    'carol,not-an-email,,,,\n'
+    'dave,dave@yamdb.fake,king,,,\n'
+    'alice,alice2@yamdb.fake,,,,\n'
+    'TestUser,taken@yamdb.fake,,,,\n'
+)
+
+
+@pytest.mark.django_db(transaction=True)
+class Test17ImportUsers:
+
+    def test_01_import_command(self, user, django_user_model, tmp_path):
+        path = tmp_path / 'users.csv'
+        path.write_text(CSV, encoding='utf-8')
+        out, err = StringIO(), StringIO()
+        call_command(
+            'import_users', str(path), batch_size=2, stdout=out, stderr=err
+        )
+
+        created = django_user_model.objects.exclude(pk=user.pk)
+        assert set(created.values_list('username', 'role')) == {
+            ('alice', 'moderator'), ('bob', 'user')
+        }, (
+            'Проверьте, что команда `import_users` заводит пользователей '
+            'из корректных строк CSV.'
+        )
+        assert 'Создано пользователей: 2, отклонено строк: 6' in (
+            out.getvalue()
+        )
+        for line in range(4, 10):
+            assert f'Строка {line} ' in err.getvalue(), (
+                'Проверьте, что команда `import_users` сообщает об '
+                'отклонённых строках.'
+            )
+
+    def test_02_import_endpoint(self, admin_client, user_client, admin,
+                                django_user_model):
+        url = '/api/v1/users-import/'
+        upload = SimpleUploadedFile('users.csv', CSV.encode())
+        response = user_client.post(url, {'file': upload})
+        assert response.status_code == HTTPStatus.FORBIDDEN
+
+        upload = SimpleUploadedFile('users.csv', CSV.encode())
+        response = admin_client.post(url, {'file': upload})
+        assert response.status_code == HTTPStatus.OK, (
+            f'Проверьте, что POST-запрос администратора к `{url}` '
+            'возвращает ответ со статусом 200.'
+        )
+        data = response.json()
+        assert data['created'] == 2
+        assert [item['username'] for item in data['rejected']] == [
+            'me', 'bad name', 'carol', 'dave', 'alice', 'TestUser'
+        ]
+        assert django_user_model.objects.filter(username='bob').exists()
+
+        response = admin_client.post(url, {})
+        assert response.status_code == HTTPStatus.BAD_REQUEST
+
+    def test_03_concurrent_insert_rejected(self, user, django_user_model,
+                                           monkeypatch):
+        from users import provisioning
+
+        # Пользователь появился в базе уже после проверки порции.
+        monkeypatch.setattr(
+            provisioning, 'existing', lambda batch, name: set()
+        )
+        created, rejected = provisioning.import_users_csv(StringIO(
+            'username,email\n'
+            'erin,erin@yamdb.fake\n'
+            f'{user.username},other@yamdb.fake\n'
+            'frank,frank@yamdb.fake\n'
+        ), batch_size=10)
+        assert created == 2, (
+            'Проверьте, что нарушение уникальности при вставке отклоняет '
+            'только занятые строки порции.'
+        )
+        assert [(line, username) for line, username, _ in rejected] == [
+            (3, user.username)
+        ]
+        assert django_user_model.objects.filter(
+            username__in=('erin', 'frank')
+        ).count() == 2
+
+    def test_04_user_named_import(self, admin_client, django_user_model):
+        django_user_model.objects.create(
+            username='import', email='import@yamdb.fake'
+        )
+        response = admin_client.get('/api/v1/users/import/')
+        assert response.status_code == HTTPStatus.OK, (
+            'Проверьте, что пользователь с именем `import` доступен по '
+            '`/api/v1/users/import/`: загрузка CSV не должна занимать это '
+            'имя.'
+        )
+        assert response.json()['username'] == 'import'
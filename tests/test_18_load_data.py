@@ -0,0 +1,356 @@
+import csv
+from io import StringIO
+
+import pytest
+from django.core.management import call_command
+
+
+@pytest.mark.django_db(transaction=True)
+class Test18LoadData:
+
+    def test_01_load_and_reload(self):
+        from django.db.models import Avg
+
+        from reviews.models import Comment, Review, Title
+        from users.models import User
+
+        out = StringIO()
+        call_command('load_data', batch_size=10, workers=2, stdout=out)
+        counts = (User.objects.count(), Title.objects.count(),
+                  Review.objects.count(), Comment.objects.count())
+        assert counts == (5, 32, 72, 3), (
+            'Проверьте, что команда `load_data` загружает все строки CSV.'
+        )
+        assert 'строк/с' in out.getvalue()
+        assert 'ANALYZE:' in out.getvalue(), (
+            'Проверьте, что `load_data` после загрузки строит производные '
+            'данные отдельным шагом.'
+        )
+        title = Title.objects.get(pk=1)
+        assert title.review_count == title.reviews.count(), (
+            'Проверьте, что после загрузки `load_data` пересчитывает '
+            'счётчики отзывов.'
+        )
+        review = Comment.objects.first().review
+        assert review.comment_count == review.comments.count()
+        assert title.rating == title.reviews.aggregate(
+            rating=Avg('score')
+        )['rating']
+
+        call_command(
+            'load_data', truncate=True, workers=1, stdout=StringIO()
+        )
+        assert (User.objects.count(), Title.objects.count(),
+                Review.objects.count(), Comment.objects.count()) == counts, (
+            'Проверьте, что `load_data --truncate` заменяет данные.'
+        )
+
+    def test_02_dependency_order(self):
+        from reviews.management.commands.load_data import (
+            MODEL_FILE, dependencies, topological_order)
+        from reviews.models import Category, Comment, Review, Title
+        from users.models import User
+
+        order = topological_order(dependencies(MODEL_FILE))
+        assert set(order) == set(MODEL_FILE)
+        for parent, child in ((Category, Title), (Title, Review),
+                              (User, Review), (Review, Comment)):
+            assert order.index(parent) < order.index(child), (
+                'Проверьте, что `load_data` загружает таблицу после '
+                'таблиц, на которые она ссылается.'
+            )
+
+    def test_03_upsert(self, settings, tmp_path):
+        import csv
+        import shutil
+
+        from django.db import connection
+        from django.db.models import Avg
+        from django.test.utils import CaptureQueriesContext
+
+        from reviews.models import Comment, Review, Title, Tombstone
+
+        data_dir = tmp_path / 'static' / 'data'
+        shutil.copytree(settings.BASE_DIR / 'static' / 'data', data_dir)
+        settings.BASE_DIR = tmp_path
+        call_command('load_data', upsert=True, workers=1, stdout=StringIO())
+        counts = (Title.objects.count(), Review.objects.count())
+
+        out = StringIO()
+        call_command('load_data', upsert=True, workers=1, stdout=out)
+        assert out.getvalue().count('без изменений') == 7, (
+            'Проверьте, что `load_data --upsert` пропускает файлы, '
+            'не изменившиеся с прошлой загрузки.'
+        )
+        assert 'счётчики' not in out.getvalue(), (
+            'Проверьте, что `load_data` не пересчитывает производные данные, '
+            'если ничего не записано.'
+        )
+
+        commented = set(Comment.objects.values_list('review_id', flat=True))
+        path = data_dir / 'review.csv'
+        with open(path, encoding='utf-8', newline='') as file:
+            rows = list(csv.DictReader(file))
+        removed = next(row for row in rows if int(row['id']) not in commented)
+        rows.remove(removed)
+        # Отзыв другого произведения: его итоги не пересчитает удаление.
+        changed = next(
+            row for row in rows if row['title_id'] != removed['title_id']
+        )
+        changed['text'] = 'Изменённый отзыв'
+        changed['score'] = '1' if changed['score'] != '1' else '10'
+        with open(path, 'w', encoding='utf-8', newline='') as file:
+            writer = csv.DictWriter(file, fieldnames=list(rows[0]))
+            writer.writeheader()
+            writer.writerows(rows)
+        with open(data_dir / 'titles.csv', 'a', encoding='utf-8') as file:
+            file.write('\n1000,Новое произведение,2020,1\n')
+
+        out = StringIO()
+        with CaptureQueriesContext(connection) as context:
+            call_command('load_data', upsert=True, workers=1, stdout=out)
+        assert not [
+            query['sql'] for query in context.captured_queries
+            if query['sql'].startswith('SELECT')
+            and 'reviews_importedrow' in query['sql']
+            and 'IN (' not in query['sql'] and 'LIMIT' not in query['sql']
+        ], (
+            'Проверьте, что `load_data --upsert` сверяет хеши по пачкам, '
+            'не загружая их все в память.'
+        )
+        assert 'review.csv: удалено 1 строк' in out.getvalue()
+        assert 'review.csv: 1 строк' in out.getvalue(), (
+            'Проверьте, что `load_data --upsert` применяет только '
+            'изменённые строки.'
+        )
+        assert 'titles.csv: 1 строк' in out.getvalue()
+        assert (Title.objects.count(), Review.objects.count()) == (
+            counts[0] + 1, counts[1] - 1
+        )
+        assert Review.objects.get(pk=changed['id']).text == 'Изменённый отзыв'
+        assert Tombstone.objects.filter(
+            kind=Tombstone.REVIEW, object_id=removed['id']
+        ).exists()
+        title = Title.objects.get(pk=removed['title_id'])
+        assert title.review_count == title.reviews.count()
+        assert 'ANALYZE' not in out.getvalue(), (
+            'Проверьте, что `load_data --upsert` пересчитывает итоги только '
+            'у затронутых произведений и отзывов.'
+        )
+        title = Title.objects.get(pk=changed['title_id'])
+        assert title.rating == title.reviews.aggregate(
+            average=Avg('score')
+        )['average'], (
+            'Проверьте, что `load_data --upsert` пересчитывает рейтинг '
+            'произведения изменённого отзыва.'
+        )
+
+    def test_04_dump_round_trip(self, settings, tmp_path):
+        import gzip
+
+        from reviews.models import Review, Title
+        from users.models import User
+
+        call_command('load_data', workers=1, stdout=StringIO())
+        Title.objects.filter(pk=1).update(
+            category=None, description='Описание,\nв две строки'
+        )
+        data_dir = tmp_path / 'static' / 'data'
+        out = StringIO()
+        call_command('dump_data', str(data_dir), stdout=out)
+        assert 'review.csv: 72 строк' in out.getvalue()
+        for file_name in ('titles.csv', 'review.csv', 'users.csv'):
+            with open(settings.BASE_DIR / 'static' / 'data' / file_name,
+                      encoding='utf-8') as source:
+                header = source.readline().rstrip()
+            assert (data_dir / file_name).read_text(
+                encoding='utf-8'
+            ).startswith(header), (
+                'Проверьте, что `dump_data` пишет файлы с теми же столбцами, '
+                'что читает `load_data`.'
+            )
+
+        call_command('dump_data', str(tmp_path / 'gz'), gzip=True,
+                     workers=1, stdout=StringIO())
+        with gzip.open(tmp_path / 'gz' / 'titles.csv.gz', 'rt',
+                       encoding='utf-8') as file:
+            assert len(list(csv.reader(file))) == 33
+
+        titles = list(
+            Title.objects.order_by('pk').values_list(
+                'pk', 'name', 'category', 'description'
+            )
+        )
+        reviews = list(
+            Review.objects.order_by('pk').values_list(
+                'pk', 'text', 'score', 'pub_date'
+            )
+        )
+        settings.BASE_DIR = tmp_path
+        call_command('load_data', truncate=True, workers=1,
+                     stdout=StringIO())
+        assert Title.objects.get(pk=1).category is None, (
+            'Проверьте, что пустая категория из выгрузки загружается '
+            'как NULL.'
+        )
+        assert list(
+            Title.objects.order_by('pk').values_list(
+                'pk', 'name', 'category', 'description'
+            )
+        ) == titles, (
+            'Проверьте, что выгрузку `dump_data` можно загрузить обратно '
+            'через `load_data`.'
+        )
+        assert list(
+            Review.objects.order_by('pk').values_list(
+                'pk', 'text', 'score', 'pub_date'
+            )
+        ) == reviews, (
+            'Проверьте, что `load_data` сохраняет даты публикации из файла.'
+        )
+        assert User.objects.count() == 5
+
+    @pytest.mark.parametrize('bundle', ('dir-gz', 'tar', 'zip', 'stdin',
+                                        'mmap'))
+    def test_05_sources(self, settings, tmp_path, monkeypatch, bundle):
+        import gzip
+        import io
+        import shutil
+        import sys
+        import tarfile
+        import zipfile
+
+        from reviews.models import Comment, Review, Title
+
+        data_dir = settings.BASE_DIR / 'static' / 'data'
+        files = sorted(data_dir.glob('*.csv'))
+        if bundle == 'dir-gz':
+            source = tmp_path / 'gz'
+            source.mkdir()
+            for path in files:
+                with gzip.open(source / (path.name + '.gz'), 'wb') as file:
+                    file.write(path.read_bytes())
+        elif bundle in ('tar', 'stdin'):
+            source = tmp_path / 'data.tar.gz'
+            with tarfile.open(source, 'w:gz') as archive:
+                for path in files:
+                    archive.add(path, arcname=f'dump/{path.name}')
+        elif bundle == 'zip':
+            source = tmp_path / 'data.zip'
+            with zipfile.ZipFile(source, 'w') as archive:
+                for path in files:
+                    archive.write(path, arcname=path.name)
+        else:
+            source = tmp_path / 'plain'
+            shutil.copytree(data_dir, source)
+            monkeypatch.setattr('reviews.sources.MMAP_THRESHOLD', 0)
+        if bundle == 'stdin':
+            monkeypatch.setattr(sys, 'stdin', io.TextIOWrapper(
+                io.BytesIO(source.read_bytes())
+            ))
+            source = '-'
+
+        call_command('load_data', str(source), workers=1, stdout=StringIO())
+        assert (Title.objects.count(), Review.objects.count(),
+                Comment.objects.count()) == (32, 72, 3), (
+            'Проверьте, что `load_data` читает данные из каталога со сжатыми '
+            'файлами, архивов и стандартного ввода.'
+        )
+        assert Review.objects.get(pk=6).text.count('\n') > 3
+
+    def test_06_parse_error_in_pool(self, settings, tmp_path):
+        import shutil
+
+        from django.core.management.base import CommandError
+
+        from reviews.models import Title
+
+        data_dir = tmp_path / 'data'
+        shutil.copytree(settings.BASE_DIR / 'static' / 'data', data_dir)
+        titles = data_dir / 'titles.csv'
+        lines = titles.read_text().splitlines()
+        lines[-1] = 'x,y,z,q'
+        titles.write_text('\n'.join(lines) + '\n')
+
+        with pytest.raises(CommandError, match='titles.csv'):
+            call_command('load_data', str(data_dir), batch_size=5,
+                         workers=2, stdout=StringIO())
+        assert Title.objects.count() == 30, (
+            'Проверьте, что `load_data` с пулом процессов вставляет пачки '
+            'по мере разбора и сообщает об ошибке разбора.'
+        )
+
+    def test_07_dump_skips_hidden(self, tmp_path):
+        import csv
+
+        from reviews.models import Category, Comment, Review, Title
+
+        call_command('load_data', workers=1, stdout=StringIO())
+        comment = Comment.objects.select_related('review').first()
+        Review.objects.filter(pk=comment.review_id).update(is_hidden=True)
+        hidden_title = Title.objects.exclude(
+            pk=comment.review.title_id
+        ).filter(reviews__isnull=False).first()
+        Title.objects.filter(pk=hidden_title.pk).update(is_hidden=True)
+        category = Title.objects.filter(
+            category__isnull=False, is_hidden=False
+        ).first().category
+        Category.objects.filter(pk=category.pk).update(is_hidden=True)
+
+        call_command('dump_data', str(tmp_path), stdout=StringIO())
+
+        def read(file_name):
+            with open(tmp_path / file_name, encoding='utf-8') as file:
+                return list(csv.DictReader(file))
+
+        reviews = {row['id'] for row in read('review.csv')}
+        assert str(comment.review_id) not in reviews, (
+            'Проверьте, что `dump_data` не выгружает скрытые отзывы.'
+        )
+        assert not reviews & {
+            str(pk) for pk in hidden_title.reviews.values_list('pk',
+                                                               flat=True)
+        }, (
+            'Проверьте, что `dump_data` не выгружает отзывы скрытых '
+            'произведений.'
+        )
+        assert str(comment.pk) not in {
+            row['id'] for row in read('comments.csv')
+        }
+        titles = read('titles.csv')
+        assert str(hidden_title.pk) not in {row['id'] for row in titles}
+        assert str(category.pk) not in {
+            row['id'] for row in read('category.csv')
+        }
+        assert str(category.pk) not in {row['category'] for row in titles}
+        assert str(hidden_title.pk) not in {
+            row['title_id'] for row in read('genre_title.csv')
+        }
+
+    def test_08_tar_sources(self, settings, tmp_path, monkeypatch):
+        import io
+        import tarfile
+
+        from django.core.management.base import CommandError
+
+        from reviews import sources
+
+        data_dir = settings.BASE_DIR / 'static' / 'data'
+        archive_path = tmp_path / 'data.tar.gz'
+        with tarfile.open(archive_path, 'w:gz') as archive:
+            archive.add(data_dir / 'titles.csv', arcname='dump/titles.csv')
+        found = sources.find_sources(str(archive_path), {'titles.csv'})
+        assert found == {
+            'titles.csv': ('tar', str(archive_path), 'dump/titles.csv')
+        }, (
+            'Проверьте, что файлы из архива tar на диске читаются по '
+            'ссылке на архив, а не в память.'
+        )
+        with sources.open_text(found['titles.csv']) as lines:
+            assert next(iter(lines)).startswith('id,')
+
+        monkeypatch.setattr(sources, 'STDIN_LIMIT', 10)
+        with pytest.raises(CommandError):
+            sources.read_tar_stream(
+                io.BytesIO(archive_path.read_bytes()), {'titles.csv'}
+            )
@@ -0,0 +1,50 @@
+from io import StringIO
+
+import pytest
+from django.core.management import call_command
+
+SIZES = {'categories': 3, 'genres': 5, 'users': 20, 'titles': 30,
+         'reviews': 200, 'comments': 300}
+
+
+@pytest.mark.django_db(transaction=True)
+class Test19GenerateData:
+
+    def test_01_generate_into_db(self, user):
+        from django.db.models import Count
+
+        from reviews.models import Comment, Review, Title
+
+        call_command('generate_data', stdout=StringIO(), **SIZES)
+        assert Title.objects.count() == 30
+        assert Review.objects.count() == 200, (
+            'Проверьте, что `generate_data` создаёт заданное число отзывов.'
+        )
+        assert Comment.objects.count() == 300
+        popular = Title.objects.order_by('-review_count').first()
+        assert popular.review_count == popular.reviews.count()
+        assert popular.review_count > 200 / 30 * 2, (
+            'Проверьте, что популярность произведений в `generate_data` '
+            'неравномерна.'
+        )
+        assert not Review.objects.values('title', 'author').annotate(
+            total=Count('pk')
+        ).filter(total__gt=1).exists()
+        assert len(set(Review.objects.values_list('pub_date', flat=True))) > 1
+
+    def test_02_reproducible_csv(self, tmp_path):
+        for name in ('a', 'b'):
+            call_command('generate_data', output=str(tmp_path / name),
+                         seed=7, stdout=StringIO(), **SIZES)
+        for name in ('titles.csv', 'review.csv', 'comments.csv'):
+            assert (tmp_path / 'a' / name).read_bytes() == (
+                tmp_path / 'b' / name
+            ).read_bytes(), (
+                'Проверьте, что `generate_data` с одним `--seed` выдаёт '
+                'одинаковые данные.'
+            )
+        call_command('generate_data', output=str(tmp_path / 'c'), seed=8,
+                     stdout=StringIO(), **SIZES)
+        assert (tmp_path / 'a' / 'review.csv').read_bytes() != (
+            tmp_path / 'c' / 'review.csv'
+        ).read_bytes()
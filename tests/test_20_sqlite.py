@@ -0,0 +1,49 @@
+from io import StringIO
+
+import pytest
+from django.core.exceptions import ImproperlyConfigured
+from django.core.management import call_command
+from django.db import connection
+
+
+def new_connection():
+    return connection.get_new_connection(connection.get_connection_params())
+
+
+@pytest.mark.django_db(transaction=True)
+class Test20SQLite:
+
+    def test_01_pragmas_applied(self, settings):
+        settings.SQLITE_PRAGMAS = {
+            'busy_timeout': 1234, 'synchronous': 'NORMAL',
+            'temp_store': 'MEMORY', 'cache_size': -2048,
+        }
+        raw = new_connection()
+        try:
+            values = [
+                raw.execute(f'PRAGMA {name}').fetchone()[0]
+                for name in ('busy_timeout', 'synchronous', 'temp_store',
+                             'cache_size')
+            ]
+        finally:
+            raw.close()
+        assert values == [1234, 1, 2, -2048], (
+            'Проверьте, что прагмы из `SQLITE_PRAGMAS` применяются к каждому '
+            'новому соединению.'
+        )
+
+    def test_02_invalid_pragma(self, settings):
+        settings.SQLITE_PRAGMAS = {'cache_size; DROP TABLE x': 1}
+        with pytest.raises(ImproperlyConfigured):
+            new_connection()
+
+    def test_03_benchmark(self):
+        from reviews.models import Title
+
+        out = StringIO()
+        with pytest.raises(Exception):
+            call_command('db_benchmark', duration=0.1, stdout=out)
+        Title.objects.create(name='Title', year=2000)
+        call_command('db_benchmark', readers=2, writers=1, duration=0.3,
+                     stdout=out)
+        assert 'чтение:' in out.getvalue() and 'запись:' in out.getvalue()
@@ -0,0 +1,103 @@
+import sqlite3
+import time
+
+import pytest
+from django.db import connections
+from django.test.utils import CaptureQueriesContext
+
+from api import replica
+
+
+@pytest.fixture
+def snapshot(monkeypatch):
+    """Делает вид, что реплика снята в момент, записанный в snapshot.at."""
+    class Snapshot:
+        at = time.time()
+
+    monkeypatch.setattr(replica, 'snapshot_time', lambda: Snapshot.at)
+    return Snapshot
+
+
+def replica_queries(client, url):
+    with CaptureQueriesContext(connections['default']) as primary, \
+            CaptureQueriesContext(connections['replica']) as copy:
+        response = client.get(url)
+    assert response.status_code == 200
+    return len(copy), len(primary)
+
+
+@pytest.mark.django_db(transaction=True, databases=['default', 'replica'])
+class Test21Replica:
+
+    def test_01_refresh_replica(self, tmp_path):
+        from reviews.models import Title
+
+        Title.objects.create(name='Title', year=2000)
+        path = tmp_path / 'replica.sqlite3'
+        replica.refresh_replica(path)
+        copy = sqlite3.connect(path)
+        try:
+            names = copy.execute('SELECT name FROM reviews_title').fetchall()
+            journal_mode = copy.execute('PRAGMA journal_mode').fetchone()[0]
+        finally:
+            copy.close()
+        assert names == [('Title',)], (
+            'Проверьте, что refresh_replica копирует данные основной базы.'
+        )
+        assert journal_mode == 'delete'
+        assert not (tmp_path / 'replica.sqlite3.tmp').exists()
+
+    def test_02_reads_go_to_replica(self, client, snapshot):
+        url = '/api/v1/titles/'
+        assert replica_queries(client, url)[0] > 0, (
+            f'Проверьте, что GET-запрос к `{url}` читает из реплики.'
+        )
+        snapshot.at = time.time() - 1000
+        assert replica_queries(client, url)[0] == 0, (
+            'Проверьте, что устаревшая реплика не используется.'
+        )
+
+    def test_03_sticky_after_write(self, admin_client, user_client,
+                                   snapshot):
+        from reviews.models import Title
+
+        title = Title.objects.create(name='Title', year=2000)
+        url = f'/api/v1/titles/{title.pk}/reviews/'
+        snapshot.at = time.time()
+        assert replica_queries(user_client, url)[0] > 0
+        response = user_client.post(url, data={'text': 'Отзыв', 'score': 5})
+        assert response.status_code == 201
+        assert replica_queries(user_client, url)[0] == 0, (
+            'Проверьте, что после записи пользователь читает из основной '
+            'базы, пока реплика не обновится.'
+        )
+        assert replica_queries(admin_client, url)[0] > 0, (
+            'Проверьте, что запись одного пользователя не отключает '
+            'реплику для остальных.'
+        )
+        snapshot.at = time.time() + 1
+        assert replica_queries(user_client, url)[0] > 0, (
+            'Проверьте, что после обновления реплики пользователь снова '
+            'читает из неё.'
+        )
+
+    def test_04_last_write_returned_to_client(self, user_client, snapshot):
+        from rest_framework.test import APIClient
+
+        from reviews.models import Title
+
+        title = Title.objects.create(name='Title', year=2000)
+        url = f'/api/v1/titles/{title.pk}/reviews/'
+        snapshot.at = time.time()
+        response = user_client.post(url, data={'text': 'Отзыв', 'score': 5})
+        written = response[replica.LAST_WRITE_HEADER]
+        assert response.cookies[replica.LAST_WRITE_COOKIE].value == written, (
+            'Проверьте, что время записи возвращается клиенту, а не '
+            'хранится в памяти процесса.'
+        )
+        client = APIClient()
+        client.credentials(HTTP_X_REPLICA_LAST_WRITE=written)
+        assert replica_queries(client, url)[0] == 0, (
+            'Проверьте, что время записи из заголовка запроса направляет '
+            'чтение в основную базу.'
+        )
@@ -0,0 +1,61 @@
+import pytest
+from django.db import IntegrityError
+
+
+@pytest.mark.django_db(transaction=True)
+class Test22GroupCommit:
+
+    def test_01_batch_with_failed_insert(self, user, admin):
+        from reviews.group_commit import GroupCommitQueue
+        from reviews.models import Comment, Review, Title
+
+        title = Title.objects.create(name='Title', year=2000)
+        review = Review.objects.create(
+            title=title, author=user, text='Отзыв', score=5
+        )
+        write_queue = GroupCommitQueue(delay=0.2, max_batch=100)
+        comments = [
+            write_queue.submit(Comment(review=review, author=admin,
+                                       text=f'Комментарий {number}'))
+            for number in range(20)
+        ]
+        duplicate = write_queue.submit(
+            Review(title=title, author=user, text='Повтор', score=1)
+        )
+        second = write_queue.submit(
+            Review(title=title, author=admin, text='Отзыв', score=9)
+        )
+        saved = [future.result(timeout=10) for future in comments]
+        assert all(comment.pk for comment in saved)
+        with pytest.raises(IntegrityError):
+            duplicate.result(timeout=10)
+        assert second.result(timeout=10).pk, (
+            'Проверьте, что ошибка одной вставки не отменяет остальные '
+            'вставки той же транзакции.'
+        )
+        review.refresh_from_db()
+        title.refresh_from_db()
+        assert review.comment_count == 20
+        assert (title.review_count, title.rating) == (2, 7)
+
+    def test_02_api(self, settings, user_client, admin_client):
+        from reviews.models import Comment, Review, Title
+
+        settings.GROUP_COMMIT_ENABLED = True
+        title = Title.objects.create(name='Title', year=2000)
+        url = f'/api/v1/titles/{title.pk}/reviews/'
+        response = user_client.post(url, data={'text': 'Отзыв', 'score': 8})
+        assert response.status_code == 201, (
+            'Проверьте, что с GROUP_COMMIT_ENABLED POST-запрос к '
+            f'`{url}` создаёт отзыв.'
+        )
+        review = response.json()
+        assert review['id'] == Review.objects.get().pk
+        assert review['score'] == 8
+        response = user_client.post(url, data={'text': 'Отзыв', 'score': 8})
+        assert response.status_code == 400
+        url = f'{url}{review["id"]}/comments/'
+        response = admin_client.post(url, data={'text': 'Комментарий'})
+        assert response.status_code == 201
+        assert response.json()['id'] == Comment.objects.get().pk
+        assert response.json()['author'] == 'TestAdmin'
@@ -0,0 +1,189 @@
+from http import HTTPStatus
+
+import pytest
+from django.core.management import call_command
+from django.core.management.base import CommandError
+from django.db import connections
+
+SHARDS = ['reviews_0', 'reviews_1']
+
+
+@pytest.fixture
+def review_shards(settings, tmp_path, transactional_db):
+    settings.REVIEW_SHARDS = SHARDS
+    for alias in SHARDS:
+        connections.databases[alias] = {
+            'ENGINE': 'api_yamdb.sqlite_backend',
+            'NAME': str(tmp_path / f'{alias}.sqlite3'),
+            # Модели загружены без шардов, и таблицы шарда создаются
+            # с внешними ключами на таблицы, которых в нём нет.
+            'PRAGMAS': {'foreign_keys': 'OFF'},
+        }
+        connections.ensure_defaults(alias)
+        connections.prepare_test_settings(alias)
+        call_command('migrate', database=alias, verbosity=0)
+        # Миграции снова включают проверку ключей в своём соединении.
+        connections[alias].close()
+    yield SHARDS
+    for alias in SHARDS:
+        connections[alias].close()
+        del connections[alias]
+        del connections.databases[alias]
+
+
+def titles_on_each_shard():
+    """По произведению в каждом шарде: {шард: произведение}."""
+    from reviews.models import Title
+    from reviews.sharding import shard_for_title
+
+    titles = {}
+    while len(titles) < len(SHARDS):
+        title = Title.objects.create(name='Title', year=2000)
+        titles.setdefault(shard_for_title(title.pk), title)
+    return titles
+
+
+@pytest.mark.django_db(transaction=True)
+class Test23Sharding:
+
+    def test_01_nested_routes(self, review_shards, user_client, admin_client,
+                              admin, user):
+        from reviews.models import Comment, Review, Title, Tombstone
+
+        titles = titles_on_each_shard()
+        for alias, title in titles.items():
+            url = f'/api/v1/titles/{title.pk}/reviews/'
+            response = user_client.post(url, data={'text': 'Отзыв',
+                                                   'score': 4})
+            assert response.status_code == HTTPStatus.CREATED
+            review_id = response.json()['id']
+            admin_client.post(url, data={'text': 'Отзыв', 'score': 8})
+            assert user_client.post(
+                url, data={'text': 'Отзыв', 'score': 4}
+            ).status_code == HTTPStatus.BAD_REQUEST
+            assert Review.objects.using(alias).filter(
+                title_id=title.pk
+            ).count() == 2, (
+                'Проверьте, что отзывы произведения хранятся в его шарде.'
+            )
+            comments_url = f'{url}{review_id}/comments/'
+            response = admin_client.post(comments_url, data={'text': 'Ок'})
+            assert response.status_code == HTTPStatus.CREATED
+            assert Comment.objects.using(alias).filter(
+                pk=response.json()['id']
+            ).exists()
+
+            response = user_client.get(url, {'embed_comments': 1})
+            assert response.status_code == HTTPStatus.OK
+            results = {
+                review['id']: review for review in response.json()['results']
+            }
+            assert results[review_id]['author'] == user.username
+            assert results[review_id]['title'] == title.name
+            assert results[review_id]['comment_count'] == 1
+            assert results[review_id]['latest_comments'][0]['author'] == (
+                admin.username
+            )
+            response = user_client.get(comments_url)
+            assert [
+                comment['author'] for comment in response.json()['results']
+            ] == [admin.username]
+            title.refresh_from_db()
+            assert (title.review_count, title.rating) == (2, 6)
+
+            response = user_client.delete(f'{url}{review_id}/')
+            assert response.status_code == HTTPStatus.NO_CONTENT
+            assert Tombstone.objects.using(alias).filter(
+                title_id=title.pk
+            ).count() == 2
+            response = user_client.get(f'/api/v1/titles/{title.pk}/changes/')
+            assert len(response.json()['deleted']) == 2
+            title.refresh_from_db()
+            assert (title.review_count, title.rating) == (1, 8)
+        assert not Review.objects.using('default').exists(), (
+            'С шардированием отзывы не должны попадать в default.'
+        )
+        assert Title.objects.count() >= len(SHARDS)
+
+    def test_02_cross_shard_jobs(self, review_shards, user_client,
+                                 admin_client, user):
+        from reviews.models import Review, Title
+
+        titles = titles_on_each_shard()
+        for title in titles.values():
+            url = f'/api/v1/titles/{title.pk}/reviews/'
+            user_client.post(url, data={'text': 'Отзыв', 'score': 3})
+            admin_client.post(url, data={'text': 'Отзыв', 'score': 7})
+        Title.objects.update(review_count=0, rating=None)
+        for alias in review_shards:
+            Review.objects.using(alias).update(comment_count=5)
+
+        call_command('reconcile_counters', chunk_size=1)
+        for title in Title.objects.filter(pk__in=[
+            title.pk for title in titles.values()
+        ]):
+            assert (title.review_count, title.rating) == (2, 5), (
+                'Проверьте, что reconcile_counters собирает счётчики '
+                'и рейтинги произведений из всех шардов.'
+            )
+        for alias in review_shards:
+            assert set(Review.objects.using(alias).values_list(
+                'comment_count', flat=True
+            )) == {0}
+
+        response = admin_client.delete(f'/api/v1/users/{user.username}/')
+        assert response.status_code == HTTPStatus.NO_CONTENT
+        call_command('purge_hidden')
+        for alias, title in titles.items():
+            assert list(Review.objects.using(alias).values_list(
+                'score', flat=True
+            )) == [7]
+            title.refresh_from_db()
+            assert (title.review_count, title.rating) == (1, 7)
+
+    def test_03_ids_unique_across_shards(self, review_shards, user_client,
+                                         moderator_client):
+        from reviews.models import Review
+        from reviews.sharding import SHARD_ID_SPAN
+
+        titles = titles_on_each_shard()
+        ids = {}
+        for alias, title in titles.items():
+            response = user_client.post(
+                f'/api/v1/titles/{title.pk}/reviews/',
+                data={'text': 'Отзыв', 'score': 5}
+            )
+            ids[alias] = response.json()['id']
+        assert ids['reviews_1'] >= SHARD_ID_SPAN > ids['reviews_0'], (
+            'Проверьте, что каждый шард выдаёт идентификаторы из своего '
+            'диапазона.'
+        )
+        response = moderator_client.post(
+            '/api/v1/moderation/',
+            data={'action': 'delete', 'reviews': [ids['reviews_0']]},
+            format='json'
+        )
+        assert response.status_code == HTTPStatus.OK
+        assert response.json()['reviews'] == 1, (
+            'Проверьте, что модерация по id удаляет отзыв только '
+            'в одном шарде.'
+        )
+        assert not Review.objects.using('reviews_0').exists()
+        assert Review.objects.using('reviews_1').filter(
+            pk=ids['reviews_1']
+        ).exists()
+
+    def test_04_key_constraints_without_shards(self, user):
+        from django.db import IntegrityError
+        from reviews.models import Review
+        from reviews.upsert import upsert
+
+        with pytest.raises(IntegrityError):
+            upsert(Review, [{
+                'id': 1, 'title_id': 999, 'author_id': user.pk,
+                'text': 'Отзыв', 'score': 5,
+            }], ('id',))
+
+    def test_05_bulk_commands_refuse(self, review_shards):
+        with pytest.raises(CommandError):
+            call_command('load_data', workers=1)